@@ -0,0 +1,60 @@
+"""
+Measures the per-request overhead of EventHandlerASGIMiddleware
+
+Usage:
+    python benchmarks/middleware_overhead.py [--requests N]
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi_events.dispatcher import dispatch
+from fastapi_events.handlers.null import NullHandler
+from fastapi_events.middleware import EventHandlerASGIMiddleware
+
+SCOPE = {"type": "http", "method": "GET", "path": "/"}
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def app_without_events(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def app_with_event(scope, receive, send):
+    dispatch("benchmark_event", payload={"id": 1}, validate_payload=False)
+    await app_without_events(scope, receive, send)
+
+
+async def _time_requests(app, requests: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(requests):
+        await app(SCOPE, _receive, _send)
+    return (time.perf_counter() - started_at) / requests
+
+
+async def main(requests: int) -> None:
+    handlers = [NullHandler(), NullHandler()]
+    baseline = await _time_requests(app_without_events, requests)
+    without_events = await _time_requests(EventHandlerASGIMiddleware(app_without_events, handlers=handlers),
+                                          requests)
+    with_event = await _time_requests(EventHandlerASGIMiddleware(app_with_event, handlers=handlers), requests)
+
+    print(f"bare app:                       {baseline * 1e6:8.2f} us/request")
+    print(f"middleware, no events:          {without_events * 1e6:8.2f} us/request "
+          f"(overhead {(without_events - baseline) * 1e6:.2f} us)")
+    print(f"middleware, 1 event dispatched: {with_event * 1e6:8.2f} us/request "
+          f"(overhead {(with_event - baseline) * 1e6:.2f} us)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100000)
+    asyncio.run(main(parser.parse_args().requests))
@@ -1,20 +1,44 @@
+import warnings
 from collections import defaultdict
 from contextvars import ContextVar
-from typing import Dict, Iterable
+from typing import Any, Dict, Iterable
 
+from fastapi_events.batching import MicroBatcher
+from fastapi_events.context import DeprecatedContextVar
 from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.timers import DelayedDispatcher
 
 __version__ = "0.11.0"
 
 # handlers keeps track of all handlers registered via EventHandlerASGIMiddleware
 handler_store: Dict[int, Iterable[BaseEventHandler]] = defaultdict(list)
 
-# event_store keeps track of all events dispatched in a request-response cycle
-event_store: ContextVar = ContextVar("fastapi_event_store")
+# batchers collect events dispatched outside of a request-response cycle, when a batch window is
+# configured on EventHandlerASGIMiddleware. See `fastapi_events.batching.MicroBatcher`
+batcher_store: Dict[int, MicroBatcher] = {}
 
-# in_req_res_cycle is set to allow dispatch() to work in event handlers
-in_req_res_cycle: ContextVar = ContextVar("fastapi_in_req_res_cycle", default=None)
+# timers hold the events dispatched with a delay, per EventHandlerASGIMiddleware,
+# until they are due. See `fastapi_events.timers.DelayedDispatcher`
+timer_store: Dict[int, DelayedDispatcher] = {}
 
-# middleware_identifier is to allow dispatch() to retrieve a list of handlers that
-# are associated with the middleware instance that processed the events
-middleware_identifier: ContextVar = ContextVar("fastapi_middleware_identifier")
+# event_context keeps track of the middleware instance, the request-response cycle and
+# the events dispatched in it. See `fastapi_events.context.EventContext`
+event_context: ContextVar = ContextVar("fastapi_event_context")
+
+# the ContextVars replaced by event_context remain importable, read-only, until the next minor release
+_deprecated_context_vars = {
+    "event_store": DeprecatedContextVar("fastapi_event_store", event_context, lambda ctx: ctx.events),
+    "in_req_res_cycle": DeprecatedContextVar("fastapi_in_req_res_cycle", event_context,
+                                             lambda ctx: ctx.in_req_res_cycle, default=None),
+    "middleware_identifier": DeprecatedContextVar("fastapi_middleware_identifier", event_context,
+                                                  lambda ctx: ctx.middleware_id),
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _deprecated_context_vars:
+        warnings.warn(f"fastapi_events.{name} is deprecated, and will be removed in 0.12.0. "
+                      "Use fastapi_events.event_context instead.", DeprecationWarning, stacklevel=2)
+        return _deprecated_context_vars[name]
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
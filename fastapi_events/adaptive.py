@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import (Awaitable, Callable, Deque, Dict, Iterable, List, Optional,
+                    Tuple)
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.typing import Event
+from fastapi_events.workers import BackgroundWorkers, Ticket
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveBatchController:
+    """
+    Adaptive Batch Controller
+    - observes the latency and the errors of the batches sent, and the arrival rate of events
+    - tunes the batch size with AIMD: it is halved when the send latency exceeds `latency_target`, or when a batch
+      fails with the error rate above `max_error_rate`. It grows step by step while batches are full and there is
+      latency headroom.
+    - tunes the linger time, i.e. how long a batch waits to fill up: just long enough to fill a batch at the current
+      arrival rate, within what is left of `latency_target` once a batch is sent. When events are too sparse to
+      share a batch, they are sent without lingering.
+    - decisions are visible in `metrics`
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int,
+        min_batch_size: int = 1,
+        max_linger: float = 0.05,
+        min_linger: float = 0.0,
+        latency_target: float = 0.25,
+        max_error_rate: float = 0.1,
+        smoothing: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param max_batch_size: Maximum number of events sent at once.
+        :param min_batch_size: Minimum batch size the controller may shrink to.
+        :param max_linger: Maximum time a batch waits to fill up, in seconds.
+        :param min_linger: Minimum time a batch waits to fill up, in seconds.
+        :param latency_target: Target for the time an event waits to be sent, lingering included, in seconds.
+        :param max_error_rate: Error rate above which batches are shrunk.
+        :param smoothing: Weight of the latest observation in the moving averages, between 0 and 1.
+        """
+        if not 1 <= min_batch_size <= max_batch_size:
+            raise ConfigurationError("min_batch_size must be between 1 and max_batch_size")
+        if not 0 <= min_linger <= max_linger:
+            raise ConfigurationError("min_linger must be between 0 and max_linger")
+        if latency_target <= 0:
+            raise ConfigurationError("latency_target must be greater than 0")
+        if not 0 < smoothing <= 1:
+            raise ConfigurationError("smoothing must be between 0 and 1")
+
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.min_linger = min_linger
+        self.max_linger = max_linger
+        self.latency_target = latency_target
+        self.max_error_rate = max_error_rate
+        self._smoothing = smoothing
+        self._step = max(1, max_batch_size // 10)
+        self._clock = clock
+
+        self.batch_size = max_batch_size
+        self.linger = min_linger
+
+        # moving averages of the observations
+        self.send_latency = 0.0
+        self.error_rate = 0.0
+        self.arrival_rate = 0.0
+        self._arrived = 0
+        self._sampled_at = clock()
+
+        self.batches_sent = 0
+        self.batches_failed = 0
+        self.events_sent = 0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "batch_size": self.batch_size,
+            "linger": self.linger,
+            "send_latency": self.send_latency,
+            "error_rate": self.error_rate,
+            "arrival_rate": self.arrival_rate,
+            "batches_sent": self.batches_sent,
+            "batches_failed": self.batches_failed,
+            "events_sent": self.events_sent,
+            "avg_batch_size": self.events_sent / self.batches_sent if self.batches_sent else 0.0,
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+    def record_arrivals(self, count: int) -> None:
+        self._arrived += count
+
+    def record_send(self, size: int, latency: float, failed: bool = False) -> None:
+        """
+        Observe a batch sent, and adjust the batch size and the linger time
+        """
+        self.batches_sent += 1
+        self.events_sent += size
+        if failed:
+            self.batches_failed += 1
+
+        first = self.batches_sent == 1
+        self.send_latency = latency if first else self._average(self.send_latency, latency)
+        self.error_rate = self._average(self.error_rate, 1.0 if failed else 0.0)
+        self._sample_arrival_rate()
+
+        if failed and self.error_rate > self.max_error_rate:
+            self._resize(max(self.min_batch_size, self.batch_size // 2), reason="error rate")
+        elif self.send_latency > self.latency_target:
+            self._resize(max(self.min_batch_size, self.batch_size // 2), reason="send latency")
+        elif size >= self.batch_size and self.send_latency < self.latency_target / 2:
+            self._resize(min(self.max_batch_size, self.batch_size + self._step), reason="full batch")
+
+        self._tune_linger()
+
+    def _average(self, average: float, value: float) -> float:
+        return average + self._smoothing * (value - average)
+
+    def _sample_arrival_rate(self) -> None:
+        now = self._clock()
+        elapsed = now - self._sampled_at
+        if elapsed <= 0:
+            return
+
+        rate = self._arrived / elapsed
+        self.arrival_rate = rate if self.batches_sent == 1 else self._average(self.arrival_rate, rate)
+        self._arrived = 0
+        self._sampled_at = now
+
+    def _resize(self, batch_size: int, reason: str) -> None:
+        if batch_size == self.batch_size:
+            return
+
+        if batch_size > self.batch_size:
+            self.increases += 1
+        else:
+            self.decreases += 1
+
+        logger.debug("Batch size %d -> %d (%s)", self.batch_size, batch_size, reason)
+        self.batch_size = batch_size
+
+    def _tune_linger(self) -> None:
+        budget = min(self.max_linger, max(0.0, self.latency_target - self.send_latency))
+        if self.arrival_rate * budget < 1:
+            # events are too sparse to share a batch within the budget: lingering only adds latency
+            linger = self.min_linger
+        else:
+            linger = min(budget, (self.batch_size - 1) / self.arrival_rate)
+
+        self.linger = max(self.min_linger, linger)
+
+
+class AdaptiveBatcher:
+    """
+    Buffers events, and sends them in batches sized and timed by an `AdaptiveBatchController`.
+    Used by forwarding handlers accepting a `batch_controller`.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[List[Event]], Awaitable[None]],
+        controller: AdaptiveBatchController,
+    ) -> None:
+        """
+        :param send: Sends a batch of events, raising if it fails.
+        """
+        self._send = send
+        self._controller = controller
+
+        self._buffer: Deque[Tuple[Event, Ticket, float]] = deque()
+        self._sender = BackgroundWorkers(self._run, name="AdaptiveBatcher sender")
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def submit(self, events: Iterable[Event]) -> None:
+        """
+        Buffer events, and wait until they are sent
+        """
+        events = list(events)
+        if not events:
+            return
+
+        if self._sender.ensure_started() and self._buffer:
+            # events buffered in another event loop cannot be awaited anymore
+            logger.warning("Discarding %d event(s) buffered in another event loop", len(self._buffer))
+            self._buffer.clear()
+
+        loop = asyncio.get_running_loop()
+        ticket = Ticket(remaining=len(events), future=loop.create_future())
+        now = loop.time()
+        self._buffer.extend((event, ticket, now) for event in events)
+        self._controller.record_arrivals(len(events))
+        self._sender.wake()
+        await ticket.future
+
+    async def close(self) -> None:
+        """
+        Stop lingering, and send the events buffered. A batch being sent is completed first.
+        """
+        await self._sender.drain()
+        while self._buffer:
+            await self._send_next()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._buffer:
+                if self._sender.draining:
+                    return
+
+                await self._sender.wait()
+                continue
+
+            # events are sent without lingering once draining
+            due_at = self._buffer[0][2] + (0 if self._sender.draining else self._controller.linger)
+            if len(self._buffer) < self._controller.batch_size and due_at > loop.time():
+                await self._sender.wait(timeout=due_at - loop.time())
+                continue
+
+            await self._send_next()
+
+    async def _send_next(self) -> None:
+        batch = [self._buffer.popleft() for _ in range(min(len(self._buffer), self._controller.batch_size))]
+
+        exc: Optional[BaseException] = None
+        started_at = time.monotonic()
+        try:
+            await self._send([event for event, _, _ in batch])
+        except asyncio.CancelledError:
+            for _, ticket, _ in batch:
+                ticket.future.cancel()
+            raise
+        except Exception as e:
+            logger.warning("Failed to send a batch of %d event(s)", len(batch), exc_info=e)
+            exc = e
+        self._controller.record_send(len(batch), latency=time.monotonic() - started_at, failed=exc is not None)
+
+        for _, ticket, _ in batch:
+            ticket.done(exc=exc)
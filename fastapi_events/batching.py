@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional
+
+from fastapi_events.typing import Event
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects events dispatched outside of a request-response cycle over a short window,
+    and processes them as a single batch, instead of scheduling a task per event.
+    """
+
+    def __init__(self, process: Callable[[Deque[Event]], Awaitable[None]], window: float) -> None:
+        """
+        :param process: Processes a batch of events, e.g. `EventHandlerASGIMiddleware._process_events`.
+        :param window: Time events are collected for before being processed, in seconds.
+        """
+        self._process = process
+        self._window = window
+        self._events: Deque[Event] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def add(self, event: Event) -> asyncio.Task:
+        """
+        Add an event to the current batch, and return the task processing it
+        """
+        task = self._task
+        loop = asyncio.get_running_loop()
+        if task is None or task.done() or self._loop is not loop:
+            # a new window is opened on the first event, or if the event loop has changed
+            self._loop = loop
+            self._events = deque()
+            task = self._task = asyncio.create_task(self._run(self._events))
+
+        self._events.append(event)
+        return task
+
+    async def _run(self, events: Deque[Event]) -> None:
+        await asyncio.sleep(self._window)
+        if self._events is events:
+            self._task = None  # events dispatched from now on go to the next window
+
+        logger.debug("Processing a batch of %d event(s) dispatched outside of a request-response cycle", len(events))
+        await self._process(events)
@@ -0,0 +1,92 @@
+import time
+from enum import Enum
+from typing import Callable
+
+from fastapi_events.errors import ConfigurationError
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"  # calls go through
+    OPEN = "open"  # calls are rejected
+    HALF_OPEN = "half_open"  # a limited number of trial calls go through
+
+
+class CircuitBreaker:
+    """
+    CircuitBreaker
+    - opens after `failure_threshold` consecutive failures, and rejects calls while open
+    - after `recovery_timeout` seconds, it is half-open: up to `half_open_max_calls` trial calls go through
+    - a successful trial call closes it, a failed one opens it again
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param failure_threshold: Number of consecutive failures opening the circuit.
+        :param recovery_timeout: Time the circuit stays open before trial calls are let through, in seconds.
+        :param half_open_max_calls: Number of concurrent trial calls while half-open.
+        """
+        if failure_threshold < 1 or half_open_max_calls < 1:
+            raise ConfigurationError("failure_threshold and half_open_max_calls must be at least 1")
+
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._half_open_max_calls = half_open_max_calls
+        self._clock = clock
+
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._trial_calls = 0
+
+        self.consecutive_failures = 0
+        self.opened_count = 0
+        self.rejected_count = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state is CircuitState.OPEN and self._clock() - self._opened_at >= self._recovery_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._trial_calls = 0
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        Check if a call may go through. Each allowed call must be followed by `record_success()`, `record_failure()`,
+        or `release()` if it ends without an outcome.
+        """
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+
+        if state is CircuitState.HALF_OPEN and self._trial_calls < self._half_open_max_calls:
+            self._trial_calls += 1
+            return True
+
+        self.rejected_count += 1
+        return False
+
+    def release(self) -> None:
+        """
+        Give back the slot of an allowed call ending without an outcome, e.g. a cancelled call
+        """
+        if self._state is CircuitState.HALF_OPEN and self._trial_calls > 0:
+            self._trial_calls -= 1
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        if self._state is CircuitState.HALF_OPEN:
+            self._state = CircuitState.CLOSED
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._state is CircuitState.HALF_OPEN or (
+            self._state is CircuitState.CLOSED and self.consecutive_failures >= self._failure_threshold
+        ):
+            self._state = CircuitState.OPEN
+            self._opened_at = self._clock()
+            self.opened_count += 1
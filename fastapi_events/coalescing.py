@@ -0,0 +1,108 @@
+import fnmatch
+import logging
+from collections import deque
+from typing import (Any, Callable, Deque, Dict, Hashable, Iterable, List,
+                    Optional, Tuple)
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.priority import PrioritizedEvent
+from fastapi_events.typing import Event, EventName
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingPolicy:
+    """
+    Coalesces events of the same name sharing a key into a single event.
+
+    By default, the last event wins. With `merge`, the payloads are folded in the order they were dispatched,
+    e.g. `merge=lambda old, new: {**old, **new}`. The coalesced event takes the position of the last event,
+    so that it is processed after the other events it was dispatched after. It keeps the highest priority
+    passed to `dispatch(..., priority=...)` among the events coalesced.
+    """
+
+    def __init__(
+        self,
+        key: Callable[[Any], Hashable],
+        merge: Optional[Callable[[Any, Any], Any]] = None,
+    ) -> None:
+        """
+        :param key: Extracts the key from the payload, e.g. `lambda payload: payload["order_id"]`.
+        :param merge: Merges the payload of an event into the payload coalesced so far. Last write wins if omitted.
+        """
+        for fn in (key, merge):
+            if fn is not None and not callable(fn):
+                raise ConfigurationError("key and merge must be of type Callable")
+
+        self.key = key
+        self.merge = merge
+
+
+def _coalesced_event(event_name: EventName, payload: Any, previous: Event, last: Event) -> Event:
+    priorities = [event.priority for event in (previous, last) if isinstance(event, PrioritizedEvent)]
+    if not priorities:
+        return event_name, payload
+
+    return PrioritizedEvent(event_name, payload, priority=max(priorities))
+
+
+class Coalescer:
+    """
+    Applies coalescing policies, keyed by Unix shell-style event name patterns (`fnmatch`), to a batch of events.
+    An event whose key or merge fails is logged, and passed through as is.
+    """
+
+    def __init__(self, policies: Dict[str, CoalescingPolicy]) -> None:
+        self._policies = policies
+        self._policy_cache: Dict[EventName, Optional[CoalescingPolicy]] = {}
+
+        self.coalesced_count = 0
+
+    def get_policy(self, event_name: EventName) -> Optional[CoalescingPolicy]:
+        if event_name not in self._policy_cache:
+            name = event_name if isinstance(event_name, str) else str(event_name)
+            self._policy_cache[event_name] = next((policy for pattern, policy in self._policies.items()
+                                                   if fnmatch.fnmatch(name, pattern)), None)
+
+        return self._policy_cache[event_name]
+
+    def coalesce(self, events: Iterable[Event]) -> Deque[Event]:
+        slots: List[Optional[Event]] = []
+        last_slot: Dict[Tuple[EventName, Hashable], int] = {}
+        coalesced_count = 0
+
+        for event in events:
+            event_name, payload = event
+            policy = self.get_policy(event_name)
+            if policy is None:
+                slots.append(event)
+                continue
+
+            try:
+                key = (event_name, policy.key(payload))
+            except Exception:
+                logger.exception("Failed to get the coalescing key of event %s. Passing it through.", event_name)
+                slots.append(event)
+                continue
+
+            previous_idx = last_slot.get(key)
+            if previous_idx is not None:
+                previous = slots[previous_idx]
+                try:
+                    if policy.merge is not None:
+                        payload = policy.merge(previous[1], payload)  # type: ignore[index]
+                except Exception:
+                    logger.exception("Failed to merge event %s. Passing it through.", event_name)
+                else:
+                    event = _coalesced_event(event_name, payload, previous, event)  # type: ignore[arg-type]
+                    slots[previous_idx] = None
+                    coalesced_count += 1
+
+            last_slot[key] = len(slots)
+            slots.append(event)
+
+        if not coalesced_count and isinstance(events, deque):
+            return events
+
+        self.coalesced_count += coalesced_count
+        return deque(event for event in slots if event is not None)
@@ -0,0 +1,41 @@
+from enum import Enum
+from typing import Callable, Optional
+
+
+class CommitAction(Enum):
+    PROCESS = "process"
+    DROP = "drop"
+    DIVERT = "divert"  # hand the events over to the divert handlers instead
+
+
+# A commit policy decides what to do with the events of a request given its response status.
+# The status is None when the app raised before a response was started.
+CommitPolicy = Callable[[Optional[int]], CommitAction]
+
+
+def is_successful(status: Optional[int]) -> bool:
+    return status is not None and 200 <= status < 300
+
+
+def always_process(status: Optional[int]) -> CommitAction:
+    return CommitAction.PROCESS
+
+
+def commit_on_success(
+    otherwise: CommitAction = CommitAction.DROP,
+    is_success: Callable[[Optional[int]], bool] = is_successful
+) -> CommitPolicy:
+    """
+    Process events only when the response is successful (2xx by default), drop or divert them otherwise.
+
+    ```python
+    app.add_middleware(EventHandlerASGIMiddleware,
+                       handlers=[sqs_handler],
+                       commit_policy=commit_on_success())
+    ```
+    """
+
+    def _policy(status: Optional[int]) -> CommitAction:
+        return CommitAction.PROCESS if is_success(status) else otherwise
+
+    return _policy
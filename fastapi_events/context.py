@@ -0,0 +1,68 @@
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Optional
+
+from fastapi_events.typing import Event
+
+
+class EventContext:
+    """
+    State shared between EventHandlerASGIMiddleware and dispatch() within a request-response cycle
+    - middleware_id: to allow dispatch() to retrieve the handlers registered by the middleware instance
+    - in_req_res_cycle: set to False once the response is sent, to allow dispatch() to work in event handlers
+    - events: events dispatched in the request-response cycle, created lazily on the first dispatch()
+    - flusher: an `EventFlusher` notified on every dispatch() when incremental flushing is enabled
+    - response_status: status of the HTTP response, captured when a commit policy is configured
+    """
+    __slots__ = ("middleware_id", "in_req_res_cycle", "_events", "flusher", "response_status")
+
+    def __init__(self, middleware_id: int, in_req_res_cycle: bool = True) -> None:
+        self.middleware_id = middleware_id
+        self.in_req_res_cycle = in_req_res_cycle
+        self._events: Optional[Deque[Event]] = None
+        self.flusher: Optional[Any] = None
+        self.response_status: Optional[int] = None
+
+    @property
+    def events(self) -> Deque[Event]:
+        if self._events is None:
+            self._events = deque()
+        return self._events
+
+    def has_events(self) -> bool:
+        return bool(self._events)
+
+
+_MISSING = object()
+
+
+class DeprecatedContextVar:
+    """
+    Read-only stand-in for the `event_store`, `in_req_res_cycle` and `middleware_identifier` ContextVars,
+    which were replaced by `fastapi_events.event_context`. Values are read from the current `EventContext`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        event_context: ContextVar,
+        getter: Callable[[EventContext], Any],
+        default: Any = _MISSING,
+    ) -> None:
+        self.name = name
+        self._event_context = event_context
+        self._getter = getter
+        self._default = default
+
+    def get(self, *default: Any) -> Any:
+        ctx: Optional[EventContext] = self._event_context.get(None)
+        if ctx is not None:
+            return self._getter(ctx)
+        if default:
+            return default[0]
+        if self._default is not _MISSING:
+            return self._default
+        raise LookupError(self)
+
+    def __repr__(self) -> str:
+        return f"<DeprecatedContextVar name={self.name!r}>"
@@ -0,0 +1,182 @@
+import abc
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Collection, Hashable, List, Optional
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.typing import EventName
+
+# Derives the idempotency key of an event from its name and payload, e.g.
+# `lambda event_name, payload: (event_name, payload["request_id"])`
+KeyFunc = Callable[[EventName, Any], Hashable]
+
+
+class BaseDeduplicator(abc.ABC):
+    """
+    Deduplicators are passed to `dispatch(..., deduplicator=...)`. Events whose key has been seen
+    within the window are counted and dropped before their payload is validated.
+    The key of an event is only remembered once the event is dispatched, so an event failing validation
+    can be dispatched again.
+    """
+
+    def __init__(self, key: KeyFunc) -> None:
+        if not callable(key):
+            raise ConfigurationError("key must be of type Callable")
+
+        self._key = key
+        self._lock = threading.Lock()  # dispatch() can be called from threads
+        self.duplicate_count = 0
+
+    def key_of(self, event_name: EventName, payload: Any) -> Hashable:
+        return self._key(event_name, payload)
+
+    def is_duplicate(self, event_name: EventName, payload: Any) -> bool:
+        """
+        Check if an event has been seen, and remember it otherwise
+        """
+        return self.check(self.key_of(event_name, payload))
+
+    def check(self, key: Hashable, remember: bool = True, pending: Collection[Hashable] = ()) -> bool:
+        """
+        Check if a key has been seen, and count it as a duplicate if so
+
+        :param remember: Remember the key if it has not been seen. Otherwise, call `remember()` later on.
+        :param pending: Keys seen but not remembered yet, e.g. the keys of the other events of a batch.
+        """
+        with self._lock:
+            is_duplicate = key in pending or self._contains(key)
+            if is_duplicate:
+                self.duplicate_count += 1
+            if is_duplicate or remember:
+                self._add(key)
+
+        return is_duplicate
+
+    def remember(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._add(key)
+
+    @abc.abstractmethod
+    def _contains(self, key: Hashable) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _add(self, key: Hashable) -> None:
+        """
+        Add a key, or refresh it if it is already known
+        """
+        raise NotImplementedError
+
+
+class WindowDeduplicator(BaseDeduplicator):
+    """
+    Exact deduplication over the last `max_size` keys (LRU), optionally expiring keys after `ttl` seconds
+    """
+
+    def __init__(
+        self,
+        key: KeyFunc,
+        max_size: int = 10_000,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param key: Derives the idempotency key of an event from its name and payload.
+        :param max_size: Maximum number of keys remembered. The least recently seen keys are evicted first.
+        :param ttl: Time after which a key is forgotten, in seconds.
+        """
+        super().__init__(key=key)
+        if max_size < 1:
+            raise ConfigurationError("max_size must be at least 1")
+
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._seen: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def _contains(self, key: Hashable) -> bool:
+        seen = self._seen
+        if self._ttl is not None:
+            # keys are ordered by the time they were last seen, so expired keys are at the front
+            now = self._clock()
+            while seen:
+                oldest_key, last_seen = next(iter(seen.items()))
+                if now - last_seen < self._ttl:
+                    break
+                del seen[oldest_key]
+
+        return key in seen
+
+    def _add(self, key: Hashable) -> None:
+        seen = self._seen
+        seen[key] = self._clock()
+        seen.move_to_end(key)
+        if len(seen) > self._max_size:
+            seen.popitem(last=False)
+
+
+class BloomDeduplicator(BaseDeduplicator):
+    """
+    Probabilistic deduplication in fixed memory, for keys of very high cardinality.
+
+    Keys are added to two Bloom filters of `capacity` keys each. Once the current filter is full, the older one
+    is discarded, so keys are remembered for at least `capacity` and at most `2 * capacity` insertions.
+    Unique events are wrongly dropped as duplicates with a probability of about `error_rate`.
+    """
+
+    def __init__(self, key: KeyFunc, capacity: int = 1_000_000, error_rate: float = 0.001) -> None:
+        """
+        :param key: Derives the idempotency key of an event from its name and payload. \
+            Keys are hashed from their `repr()`.
+        :param capacity: Number of keys per filter.
+        :param error_rate: Target false positive rate of each filter.
+        """
+        super().__init__(key=key)
+        if capacity < 1:
+            raise ConfigurationError("capacity must be at least 1")
+        if not 0 < error_rate < 1:
+            raise ConfigurationError("error_rate must be between 0 and 1")
+
+        # optimal size and number of hash functions, see https://en.wikipedia.org/wiki/Bloom_filter
+        self._num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self._num_hashes = max(1, round(self._num_bits / capacity * math.log(2)))
+        self._capacity = capacity
+
+        self._current = bytearray((self._num_bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._count = 0
+
+    def _positions(self, key: Hashable) -> List[int]:
+        # double hashing: the k positions are derived from two 64-bit hashes
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self._num_bits for i in range(self._num_hashes)]
+
+    @staticmethod
+    def _contains_positions(bits: bytearray, positions: List[int]) -> bool:
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in positions)
+
+    def _contains(self, key: Hashable) -> bool:
+        positions = self._positions(key)
+        return self._contains_positions(self._current, positions) or self._contains_positions(self._previous, positions)
+
+    def _add(self, key: Hashable) -> None:
+        positions = self._positions(key)
+        if self._contains_positions(self._current, positions):
+            return
+
+        if self._count >= self._capacity:
+            self._previous, self._current = self._current, bytearray(len(self._current))
+            self._count = 0
+
+        for pos in positions:
+            self._current[pos >> 3] |= 1 << (pos & 7)
+        self._count += 1
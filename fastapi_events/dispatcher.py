@@ -1,21 +1,29 @@
 import asyncio
-import contextlib
+import functools
 import logging
 import os
-from contextvars import Token
+import time
+from datetime import datetime, timedelta
 from enum import Enum
-from typing import Any, Deque, Dict, Iterable, Iterator, Optional, Union
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple, Union
 
-from fastapi_events import (BaseEventHandler, event_store, handler_store,
-                            in_req_res_cycle, middleware_identifier)
+from fastapi_events import (BaseEventHandler, batcher_store, event_context,
+                            handler_store, timer_store)
 from fastapi_events.constants import FASTAPI_EVENTS_DISABLE_DISPATCH_ENV_VAR
-from fastapi_events.errors import (MissingEventNameDuringDispatch,
-                                   MultiplePayloadsDetectedDuringDispatch)
+from fastapi_events.context import EventContext
+from fastapi_events.dedup import BaseDeduplicator
+from fastapi_events.errors import (ConfigurationError,
+                                   MissingEventNameDuringDispatch,
+                                   MultiplePayloadsDetectedDuringDispatch,
+                                   MultipleSchedulesDetectedDuringDispatch)
 from fastapi_events.otel.utils import (create_span_for_dispatch_fn,
+                                       create_span_for_dispatch_many_fn,
                                        inject_traceparent)
+from fastapi_events.priority import PrioritizedEvent, Priority
 from fastapi_events.registry.base import BaseEventPayloadSchemaRegistry
 from fastapi_events.registry.payload_schema import \
     registry as default_payload_schema_registry
+from fastapi_events.timers import Timer
 from fastapi_events.typing import Event, EventName, Payload, PydanticModel
 from fastapi_events.utils import strtobool
 
@@ -30,34 +38,104 @@ except ImportError:
 
 DEFAULT_PAYLOAD_SCHEMA_CLS_DICT_ARGS = {"exclude_unset": True}
 
+# dump args applying to each item alike when a list of models is dumped at once
+LIST_DUMP_ARGS = {"exclude_unset", "exclude_defaults", "exclude_none", "by_alias", "mode", "round_trip"}
+
 logger = logging.getLogger(__name__)
 
 
-def _list_handlers() -> Iterable[BaseEventHandler]:
+def _list_handlers(middleware_id: Optional[int] = None) -> Iterable[BaseEventHandler]:
     """
-    Get registered handlers from the global handler_store with middleware_identifier
+    Get registered handlers from the global handler_store with middleware_id.
+    The middleware_id is taken from the event context if not provided.
     """
-    middleware_id: int = middleware_identifier.get()
+    if middleware_id is None:
+        middleware_id = event_context.get().middleware_id
     return handler_store[middleware_id]
 
 
-def _dispatch_as_task(event_name: Union[str, Enum], payload: Optional[Any] = None) -> asyncio.Task:
+def _make_event(event_name: EventName, payload: Any, priority: Optional[Priority] = None) -> Event:
+    if priority is None:
+        return event_name, payload
+
+    return PrioritizedEvent(event_name, payload, priority=priority)
+
+
+def _dispatch_as_task(
+    event_name: Union[str, Enum],
+    payload: Optional[Any] = None,
+    middleware_id: Optional[int] = None,
+    priority: Optional[Priority] = None
+) -> asyncio.Task:
     """
     #23 To support event chaining
     - dispatch event and schedule its handling as an asyncio.Task
+    - with a batch window configured on the middleware, the event is added to the current micro-batch instead,
+      and the task processing the batch is returned
     """
-    handlers = _list_handlers()
+    if middleware_id is None:
+        middleware_id = event_context.get().middleware_id
+
+    event = _make_event(event_name, payload, priority=priority)
+    batcher = batcher_store.get(middleware_id)
+    if batcher is not None:
+        return batcher.add(event)
+
+    handlers = _list_handlers(middleware_id=middleware_id)
 
     async def task():
-        await asyncio.gather(*[handler.handle((event_name, payload)) for handler in handlers])
+        await asyncio.gather(*[handler.handle(event) for handler in handlers])
 
     return asyncio.create_task(task())
 
 
-def _dispatch(event_name: Union[str, Enum], payload: Optional[Any] = None) -> None:
+def _dispatch_later(
+    event_name: Union[str, Enum],
+    payload: Optional[Any] = None,
+    due_at: float = 0.0,
+    middleware_id: Optional[int] = None,
+    priority: Optional[Priority] = None
+) -> Optional[Timer]:
     """
-    The main dispatcher function.
-    - Setting FASTAPI_EVENTS_DISABLE_DISPATCH to any truthy value essentially disables event dispatching of all sorts
+    Hold the event in the timer wheel of the middleware until `due_at`, in UNIX time.
+    - it is then processed like an event dispatched outside of a request-response cycle, even if dispatched within one
+    """
+    if _is_dispatch_disabled():
+        return None
+
+    if middleware_id is None:
+        middleware_id = event_context.get().middleware_id
+
+    dispatcher = timer_store.get(middleware_id)
+    if dispatcher is None:
+        raise ConfigurationError(f"No middleware of id {middleware_id} is registered to dispatch delayed events.")
+
+    logger.debug("Event is dispatched with a delay. Scheduling event...")
+    return dispatcher.schedule(_make_event(event_name, payload, priority=priority), due_at=due_at)
+
+
+def _due_at(
+    delay: Optional[Union[float, timedelta]] = None,
+    at: Optional[Union[datetime, float]] = None
+) -> Optional[float]:
+    """
+    Derive the UNIX time a delayed event is due at, if any
+    """
+    if delay is not None and at is not None:
+        raise MultipleSchedulesDetectedDuringDispatch
+
+    if at is not None:
+        return at.timestamp() if isinstance(at, datetime) else float(at)
+
+    if delay is not None:
+        return time.time() + (delay.total_seconds() if isinstance(delay, timedelta) else delay)
+
+    return None
+
+
+def _is_dispatch_disabled() -> bool:
+    """
+    Setting FASTAPI_EVENTS_DISABLE_DISPATCH to any truthy value essentially disables event dispatching of all sorts
     """
     DISABLE_DISPATCH_GLOBALLY = strtobool(os.environ.get(FASTAPI_EVENTS_DISABLE_DISPATCH_ENV_VAR, "0"))
 
@@ -66,28 +144,84 @@ def _dispatch(event_name: Union[str, Enum], payload: Optional[Any] = None) -> No
                      "If you believe this is a mistake, "
                      "please make sure the environment variable '%s' is not set.",
                      FASTAPI_EVENTS_DISABLE_DISPATCH_ENV_VAR)
+
+    return bool(DISABLE_DISPATCH_GLOBALLY)
+
+
+def _dispatch(
+    event_name: Union[str, Enum],
+    payload: Optional[Any] = None,
+    middleware_id: Optional[int] = None,
+    priority: Optional[Priority] = None
+) -> None:
+    """
+    The main dispatcher function.
+    - Setting FASTAPI_EVENTS_DISABLE_DISPATCH to any truthy value essentially disables event dispatching of all sorts
+    """
+    if _is_dispatch_disabled():
         return
 
-    is_handling_request: bool = in_req_res_cycle.get()
-    if is_handling_request:
+    ctx: Optional[EventContext] = event_context.get(None)
+    if ctx is not None and ctx.in_req_res_cycle:
         logger.debug("Event dispatched within a request-response cycle. "
                      "Enqueing event to event store...")
-        q: Deque[Event] = event_store.get()
-        q.append((event_name, payload))
+        ctx.events.append(_make_event(event_name, payload, priority=priority))
+        if ctx.flusher is not None:
+            ctx.flusher.notify()
 
     else:
         logger.debug("Event is dispatched outside of a request-response cycle."
                      "Dispatching event as an asyncio.Task...")
-        _dispatch_as_task(event_name, payload)
+        _dispatch_as_task(event_name, payload, middleware_id=middleware_id, priority=priority)
+
+
+def _dispatch_many_as_task(
+    events: List[Event],
+    middleware_id: Optional[int] = None
+) -> Optional[asyncio.Task]:
+    """
+    Bulk counterpart of `_dispatch_as_task`: the events are handled in a single task
+    """
+    if middleware_id is None:
+        middleware_id = event_context.get().middleware_id
+
+    batcher = batcher_store.get(middleware_id)
+    if batcher is not None:
+        batch_task = None
+        for event in events:
+            batch_task = batcher.add(event)
+        return batch_task
+
+    handlers = _list_handlers(middleware_id=middleware_id)
+
+    async def handle_events():
+        await asyncio.gather(*[handler.handle(event) for event in events for handler in handlers])
+
+    return asyncio.create_task(handle_events())
+
+
+def _dispatch_many(
+    events: List[Event],
+    middleware_id: Optional[int] = None
+) -> None:
+    """
+    Bulk counterpart of `_dispatch`: the events are appended to the event store at once
+    """
+    if _is_dispatch_disabled():
+        return
 
+    ctx: Optional[EventContext] = event_context.get(None)
+    if ctx is not None and ctx.in_req_res_cycle:
+        logger.debug("%d events dispatched within a request-response cycle. "
+                     "Enqueing events to event store...", len(events))
+        ctx.events.extend(events)
+        if ctx.flusher is not None:
+            ctx.flusher.notify()
 
-@contextlib.contextmanager
-def _set_middleware_identifier(middleware_id: int) -> Iterator[None]:
-    token_middleware_id: Token = middleware_identifier.set(middleware_id)
-    try:
-        yield
-    finally:
-        middleware_identifier.reset(token_middleware_id)
+    else:
+        logger.debug("%d events are dispatched outside of a request-response cycle."
+                     "Dispatching events as an asyncio.Task...", len(events))
+        _dispatch_many_as_task(events, middleware_id=middleware_id)
 
 
 def _check_for_multiple_payloads(
@@ -108,9 +242,9 @@ def _check_for_multiple_payloads(
 
 def _derive_event_name_and_payload_from_pydantic_model(
     event_name_or_model: Union[EventName, PydanticModel],
-    event_name: EventName,
+    event_name: Optional[EventName],
     payload: Payload,
-    payload_schema_cls_dict_args: Dict[str, Any],
+    payload_schema_cls_dict_args: Optional[Dict[str, Any]],
     payload_schema_dump: bool
 ):
     """
@@ -138,8 +272,8 @@ def _derive_event_name_and_payload_from_pydantic_model(
 def _validate_payload(
     event_name: EventName,
     payload: Payload,
-    payload_schema_registry: BaseEventPayloadSchemaRegistry,
-    payload_schema_cls_dict_args: Dict[str, Any],
+    payload_schema_registry: Optional[BaseEventPayloadSchemaRegistry],
+    payload_schema_cls_dict_args: Optional[Dict[str, Any]],
     payload_schema_dump: bool = True
 ):
     """
@@ -165,6 +299,66 @@ def _validate_payload(
     return payload
 
 
+@functools.lru_cache(maxsize=None)
+def _list_adapter(payload_schema_cls: Any) -> Any:
+    return pydantic.TypeAdapter(List[payload_schema_cls])  # type: ignore[attr-defined]  # pydantic v2 only
+
+
+def _validate_payloads(
+    event_name: EventName,
+    payloads: List[Payload],
+    payload_schema_registry: Optional[BaseEventPayloadSchemaRegistry],
+    payload_schema_cls_dict_args: Optional[Dict[str, Any]],
+    payload_schema_dump: bool = True
+) -> List[Payload]:
+    """
+    Validate payloads of the same event name in one pass if a corresponding payload schema is registered
+    """
+    if not payload_schema_registry:
+        payload_schema_registry = default_payload_schema_registry
+
+    payload_schema_cls = payload_schema_registry.get(event_name)
+    if not payload_schema_cls:
+        logger.debug("Payload schema for event %s not found. Skipping validation...", event_name)
+        return payloads
+
+    payload_schema_cls_dict_args = payload_schema_cls_dict_args or DEFAULT_PAYLOAD_SCHEMA_CLS_DICT_ARGS
+    payloads = [payload or {} for payload in payloads]
+
+    if IS_PYDANTIC_V1:
+        deserialized_payloads = [payload_schema_cls(**payload) for payload in payloads]
+        if payload_schema_dump:
+            return [payload.dict(**payload_schema_cls_dict_args) for payload in deserialized_payloads]
+        return deserialized_payloads
+
+    adapter = _list_adapter(payload_schema_cls)
+    deserialized_payloads = adapter.validate_python(payloads)
+    if not payload_schema_dump:
+        return deserialized_payloads
+    if payload_schema_cls_dict_args.keys() <= LIST_DUMP_ARGS:
+        return adapter.dump_python(deserialized_payloads, **payload_schema_cls_dict_args)
+    return [payload.model_dump(**payload_schema_cls_dict_args) for payload in deserialized_payloads]
+
+
+def _dedup_key(
+    deduplicator: BaseDeduplicator,
+    event_name_or_model: Union[EventName, PydanticModel],
+    event_name: Optional[EventName],
+    payload: Payload
+) -> Hashable:
+    """
+    Derive the idempotency key of the event as dispatched, before its payload is validated or dumped
+    """
+    if not isinstance(event_name_or_model, (str, Enum)) and event_name_or_model is not None:
+        event_name = event_name or getattr(event_name_or_model, "__event_name__", None)
+        payload = payload or event_name_or_model
+
+    if event_name is None:
+        raise MissingEventNameDuringDispatch
+
+    return deduplicator.key_of(event_name, payload)
+
+
 def dispatch(
     event_name_or_model: Union[EventName, Any] = None,
     payload: Optional[Any] = None,
@@ -173,8 +367,12 @@ def dispatch(
     payload_schema_cls_dict_args: Optional[Dict[str, Any]] = None,
     payload_schema_registry: Optional[BaseEventPayloadSchemaRegistry] = None,
     middleware_id: Optional[int] = None,
-    payload_schema_dump: bool = True
-) -> None:
+    payload_schema_dump: bool = True,
+    deduplicator: Optional[BaseDeduplicator] = None,
+    priority: Optional[Priority] = None,
+    delay: Optional[Union[float, timedelta]] = None,
+    at: Optional[Union[datetime, float]] = None
+) -> Optional[Timer]:
     """
     Dispatches an event. This is a wrapper of the main dispatcher function with additional checks.
 
@@ -196,6 +394,14 @@ def dispatch(
     :param middleware_id: Optional custom middleware identifier.
     :param payload_schema_dump: Dump pydantic model payloads and validated payloads to dict before \
         calling event handlers.
+    :param deduplicator: Optional deduplicator (see `fastapi_events.dedup`). Events already seen within its \
+        window are dropped before their payload is validated.
+    :param priority: Optional priority class of the event (see `fastapi_events.priority.Priority`), \
+        overriding the priority assigned to the event name by `PriorityHandler`.
+    :param delay: Optional delay, in seconds or as a `timedelta`, before the event is processed. Returns the \
+        `fastapi_events.timers.Timer` of the event, which can be cancelled until it is due.
+    :param at: Optional time the event is processed at, as a `datetime` or in UNIX time. Timezone-naive \
+        datetimes are taken as local time.
 
     ### Exceptions
 
@@ -203,6 +409,7 @@ def dispatch(
         `payload` is provided.
     :raises MissingEventNameDuringDispatch: If `event_name` is not provided and the event model does \
         not have an `__event_name__` attribute.
+    :raises MultipleSchedulesDetectedDuringDispatch: If both `delay` and `at` are provided.
 
     ### Examples
 
@@ -257,14 +464,45 @@ def dispatch(
     # `__event_name__` will be overridden, and only handlers for "user_updated" will be called.
     dispatch(UserCreated(user_id=1), event_name="user_updated")
     ```
+
+    Retried requests can be deduplicated with an idempotency key.
+    ```python
+    from fastapi_events.dedup import WindowDeduplicator
+
+    deduplicator = WindowDeduplicator(key=lambda event_name, payload: (event_name, payload["order_id"]), ttl=60)
+
+    dispatch("order_placed", {"order_id": 1}, deduplicator=deduplicator)
+    dispatch("order_placed", {"order_id": 1}, deduplicator=deduplicator)  # dropped
+    ```
+
+    Events can be delayed, or scheduled at a given time. Delayed events are held by the middleware until they are \
+        due, and can be cancelled until then.
+    ```python
+    timer = dispatch("cart_abandoned", {"cart_id": 1}, delay=timedelta(minutes=15))
+    timer.cancel()  # e.g. once the order is placed
+
+    dispatch("reminder_due", {"user_id": 1}, at=datetime(2030, 1, 1, tzinfo=timezone.utc))
+    ```
     """
     # Handle invalid arguments
     _check_for_multiple_payloads(event_name_or_model=event_name_or_model, payload=payload)
+    due_at = _due_at(delay=delay, at=at)
 
     # Handle dispatch without event_name specified
     if not event_name and isinstance(event_name_or_model, (str, Enum)):
         event_name = event_name_or_model
 
+    dedup_key = None
+    if deduplicator is not None:
+        # the key is only remembered once the event is dispatched, so that an event failing validation can be retried
+        dedup_key = _dedup_key(deduplicator=deduplicator,
+                               event_name_or_model=event_name_or_model,
+                               event_name=event_name,
+                               payload=payload)
+        if deduplicator.check(dedup_key, remember=False):
+            logger.debug("Duplicate event %s dropped", event_name)
+            return None
+
     with create_span_for_dispatch_fn(event_name=event_name):
         if HAS_PYDANTIC:
             # Handle dispatch of pydantic Model
@@ -294,10 +532,125 @@ def dispatch(
             logger.debug("Injecting traceparent to event payload...")
             inject_traceparent(payload=payload)
 
+        timer = None
         # Environment-specific handling
-        if middleware_id:
+        if due_at is not None:
+            timer = _dispatch_later(event_name=event_name, payload=payload, due_at=due_at,
+                                    middleware_id=middleware_id or None, priority=priority)
+        elif middleware_id:
             logger.debug("Custom middleware_id provided...")
-            with _set_middleware_identifier(middleware_id):
-                return _dispatch(event_name=event_name, payload=payload)
+            _dispatch(event_name=event_name, payload=payload, middleware_id=middleware_id, priority=priority)
         else:
-            return _dispatch(event_name=event_name, payload=payload)
+            _dispatch(event_name=event_name, payload=payload, priority=priority)
+
+        if deduplicator is not None:
+            deduplicator.remember(dedup_key)
+
+        return timer
+
+
+def dispatch_many(
+    events: Iterable[Union[Tuple[Union[EventName, Any], Optional[Any]], Any]],
+    validate_payload: bool = True,
+    payload_schema_cls_dict_args: Optional[Dict[str, Any]] = None,
+    payload_schema_registry: Optional[BaseEventPayloadSchemaRegistry] = None,
+    middleware_id: Optional[int] = None,
+    payload_schema_dump: bool = True,
+    deduplicator: Optional[BaseDeduplicator] = None,
+    priority: Optional[Priority] = None
+) -> None:
+    """
+    Dispatches many events at once, with the same semantics as calling `dispatch()` once per event, except that:
+    - payloads of the same event name are validated in one pass
+    - a single span is created for all events
+    - events are appended to the event store (or handled in a single task outside of a request-response cycle) at once
+    - payloads are all validated before any event is dispatched. If one fails validation, no event is dispatched, \
+      whereas calling `dispatch()` in a loop dispatches the events preceding the invalid one.
+
+    ### Args
+
+    :param events: Events, either as `(event_name_or_model, payload)` tuples, or as pydantic models \
+        with an `__event_name__` attribute.
+
+    See `dispatch()` for the other arguments, applied to all events.
+
+    ### Examples
+
+    ```python
+    from fastapi_events.dispatcher import dispatch_many
+
+    dispatch_many([("user_created", {"user_id": 1}),
+                   ("user_created", {"user_id": 2}),
+                   UserActivated(user_id=1)])
+    ```
+    """
+    items: List[Tuple[Any, Optional[EventName], Payload]] = []
+    dedup_keys: Dict[Hashable, None] = {}  # in dispatch order
+    for item in events:
+        event_name_or_model, payload = item if isinstance(item, tuple) else (item, None)
+        _check_for_multiple_payloads(event_name_or_model=event_name_or_model, payload=payload)
+
+        event_name = event_name_or_model if isinstance(event_name_or_model, (str, Enum)) else None
+        if deduplicator is not None:
+            # keys are only remembered once the batch is dispatched, duplicates within the batch are dropped too
+            dedup_key = _dedup_key(deduplicator=deduplicator,
+                                   event_name_or_model=event_name_or_model,
+                                   event_name=event_name,
+                                   payload=payload)
+            if deduplicator.check(dedup_key, remember=False, pending=dedup_keys):
+                logger.debug("Duplicate event %s dropped", event_name)
+                continue
+            dedup_keys[dedup_key] = None
+
+        items.append((event_name_or_model, event_name, payload))
+
+    if not items:
+        return
+
+    with create_span_for_dispatch_many_fn(event_count=len(items)):
+        event_names: List[EventName] = []
+        payloads: List[Payload] = []
+        payloads_to_validate: Dict[EventName, List[int]] = {}
+        for idx, (event_name_or_model, event_name, payload) in enumerate(items):
+            is_model = HAS_PYDANTIC and isinstance(event_name_or_model, pydantic.BaseModel)
+            if is_model:
+                event_name, payload = _derive_event_name_and_payload_from_pydantic_model(
+                    event_name_or_model=event_name_or_model,
+                    event_name=event_name,
+                    payload=payload,
+                    payload_schema_cls_dict_args=payload_schema_cls_dict_args,
+                    payload_schema_dump=payload_schema_dump,
+                )
+
+            if event_name is None:
+                raise MissingEventNameDuringDispatch
+
+            if HAS_PYDANTIC and not is_model and (isinstance(payload, dict) or not payload) and validate_payload:
+                payloads_to_validate.setdefault(event_name, []).append(idx)
+
+            event_names.append(event_name)
+            payloads.append(payload)
+
+        # Validate event payloads with schema registered, grouped by event name
+        for event_name, indexes in payloads_to_validate.items():
+            validated_payloads = _validate_payloads(
+                event_name=event_name,
+                payloads=[payloads[idx] for idx in indexes],
+                payload_schema_registry=payload_schema_registry,
+                payload_schema_cls_dict_args=payload_schema_cls_dict_args,
+                payload_schema_dump=payload_schema_dump
+            )
+            for idx, payload in zip(indexes, validated_payloads):
+                payloads[idx] = payload
+
+        # OTEL
+        for payload in payloads:
+            if payload and isinstance(payload, dict):
+                inject_traceparent(payload=payload)
+
+        _dispatch_many([_make_event(event_name, payload, priority=priority)
+                        for event_name, payload in zip(event_names, payloads)],
+                       middleware_id=middleware_id or None)
+
+        if deduplicator is not None:
+            deduplicator.remember(*dedup_keys)
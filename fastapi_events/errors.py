@@ -34,3 +34,19 @@ class MultiplePayloadsDetectedDuringDispatch(FastapiEventError, ValueError):
             "Multiple payloads detected during dispatch. "
             "Please ensure you're not providing both dict and pydantic.Model at the same time."
         )
+
+
+class MultipleSchedulesDetectedDuringDispatch(FastapiEventError, ValueError):
+    def __init__(self):
+        super().__init__(
+            "Both delay and at provided during dispatch. "
+            "Please ensure you're providing only one of them."
+        )
+
+
+class CircuitOpenError(FastapiEventError, RuntimeError):
+    def __init__(self, handler_name: str):
+        super().__init__(
+            f"Circuit breaker of {handler_name} is open. "
+            "Events are rejected until the recovery timeout has elapsed."
+        )
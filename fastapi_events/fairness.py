@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from collections import deque
+from typing import (Awaitable, Callable, Deque, Dict, Hashable, Iterable, List,
+                    Optional, Tuple)
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.typing import Event
+from fastapi_events.workers import BackgroundWorkers, Ticket
+
+logger = logging.getLogger(__name__)
+
+
+class TenantStats:
+    """
+    Metrics of a tenant, see `FairScheduler.stats`
+    """
+    __slots__ = ("queued", "processed", "shed", "failed", "max_queued")
+
+    def __init__(self) -> None:
+        self.queued = 0
+        self.processed = 0
+        self.shed = 0
+        self.failed = 0
+        self.max_queued = 0
+
+    def __repr__(self) -> str:
+        return "TenantStats(" + ", ".join(f"{name}={getattr(self, name)}" for name in self.__slots__) + ")"
+
+
+class FairScheduler:
+    """
+    FairScheduler
+    - queues events per tenant, with the tenant extracted from each event by `tenant_key`
+    - events are handed over in batches built with deficit round-robin (DRR): on every round, each tenant with
+      queued events may add up to `quantum * weight` events to the batch, so a noisy tenant cannot starve the others
+    - events beyond `max_queued_per_tenant` are shed, and only affect the tenant sending them
+    - metrics are kept per tenant in `stats`
+
+    A scheduler is passed to `EventHandlerASGIMiddleware(fair_scheduler=...)`, and shared by all requests
+    and the out-of-request batch window of the middleware.
+    """
+
+    def __init__(
+        self,
+        tenant_key: Callable[[Event], Hashable],
+        quantum: int = 10,
+        weights: Optional[Dict[Hashable, int]] = None,
+        default_weight: int = 1,
+        max_queued_per_tenant: Optional[int] = 1_000,
+        batch_size: int = 100,
+        workers: int = 1,
+    ) -> None:
+        """
+        :param tenant_key: Extracts the tenant from an event, e.g. `lambda event: event[1]["tenant_id"]`.
+        :param quantum: Number of events a tenant of weight 1 may add to a batch per round.
+        :param weights: Weights of specific tenants. Tenants not listed have `default_weight`.
+        :param max_queued_per_tenant: Maximum number of events queued per tenant before its events are shed.
+        :param batch_size: Maximum number of events handed over to the handlers at once.
+        :param workers: Number of batches processed concurrently.
+        """
+        if not callable(tenant_key):
+            raise ConfigurationError("tenant_key must be of type Callable")
+        if quantum < 1 or default_weight < 1 or any(weight < 1 for weight in (weights or {}).values()):
+            raise ConfigurationError("quantum and weights must be at least 1")
+
+        self._tenant_key = tenant_key
+        self._quantum = quantum
+        self._weights = weights or {}
+        self._default_weight = default_weight
+        self._max_queued = max_queued_per_tenant
+        self._batch_size = batch_size
+
+        self._queues: Dict[Hashable, Deque[Tuple[Event, Hashable, Ticket]]] = {}
+        self._deficits: Dict[Hashable, int] = {}
+        self._active: Deque[Hashable] = deque()  # tenants with queued events, in round-robin order
+
+        self._process: Optional[Callable[[Deque[Event]], Awaitable[None]]] = None
+        self._workers = BackgroundWorkers(self._run, count=workers, name="FairScheduler worker")
+
+        self.stats: Dict[Hashable, TenantStats] = {}
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def bind(self, process: Callable[[Deque[Event]], Awaitable[None]]) -> None:
+        """
+        Set the function processing the scheduled batches. Called by EventHandlerASGIMiddleware.
+        """
+        self._process = process
+
+    async def submit(self, events: Iterable[Event]) -> None:
+        """
+        Queue events, and wait until they are processed (or shed)
+        """
+        events = list(events)
+        if not events:
+            return
+
+        self._ensure_started()
+        ticket = Ticket(remaining=len(events), future=asyncio.get_running_loop().create_future())
+
+        shed_count = 0
+        for event in events:
+            tenant = self._tenant_key(event)
+            queue = self._queues.get(tenant)
+            if queue is None:
+                queue = self._queues[tenant] = deque()
+                self._deficits[tenant] = 0
+            stats = self.stats.get(tenant)
+            if stats is None:
+                stats = self.stats[tenant] = TenantStats()
+
+            if self._max_queued is not None and len(queue) >= self._max_queued:
+                stats.shed += 1
+                shed_count += 1
+                ticket.done()
+                continue
+
+            if not queue:
+                self._active.append(tenant)
+            queue.append((event, tenant, ticket))
+            stats.queued += 1
+            stats.max_queued = max(stats.max_queued, len(queue))
+
+        if shed_count:
+            logger.warning("%d event(s) shed as their tenant queue is full", shed_count)
+
+        self._workers.wake()
+        await ticket.future
+
+    def next_batch(self) -> List[Tuple[Event, Hashable, Ticket]]:
+        """
+        Build the next batch with deficit round-robin
+        """
+        batch: List[Tuple[Event, Hashable, Ticket]] = []
+        while self._active and len(batch) < self._batch_size:
+            tenant = self._active.popleft()
+            queue = self._queues[tenant]
+
+            deficit = self._deficits[tenant] + self._quantum * self._weights.get(tenant, self._default_weight)
+            while queue and deficit >= 1 and len(batch) < self._batch_size:
+                batch.append(queue.popleft())
+                self.stats[tenant].queued -= 1
+                deficit -= 1
+
+            if queue:
+                self._deficits[tenant] = deficit
+                self._active.append(tenant)
+            else:
+                # idle tenants do not accumulate credit
+                del self._queues[tenant]
+                del self._deficits[tenant]
+
+        return batch
+
+    def _ensure_started(self) -> None:
+        if self._process is None:
+            raise ConfigurationError("FairScheduler is not bound to a middleware")
+
+        if not self._workers.ensure_started():
+            return
+
+        # Events queued in another event loop cannot be awaited anymore
+        if self.pending:
+            logger.warning("Discarding %d event(s) queued in another event loop", self.pending)
+        for tenant, queue in self._queues.items():
+            self.stats[tenant].queued -= len(queue)
+        self._queues.clear()
+        self._deficits.clear()
+        self._active.clear()
+
+    async def _run(self) -> None:
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                await self._workers.wait()
+                continue
+
+            events = deque(event for event, _, _ in batch)
+            exc: Optional[BaseException] = None
+            try:
+                await self._process(events)  # type: ignore[misc]
+            except Exception as e:
+                exc = e
+
+            for _, tenant, ticket in batch:
+                stats = self.stats[tenant]
+                if exc is None:
+                    stats.processed += 1
+                else:
+                    stats.failed += 1
+                ticket.done(exc=exc)
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+
+from fastapi_events.context import EventContext
+from fastapi_events.typing import Event, Message, Receive, Send
+
+logger = logging.getLogger(__name__)
+
+
+class EventFlusher:
+    """
+    EventFlusher
+    - processes events queued in an event context while the connection is still open
+    - flushes are triggered when `threshold` events are queued, every `interval` seconds,
+      or explicitly with `request_flush()` (e.g. at ASGI message boundaries)
+    - flushes are serialised, so events are processed in the order they are dispatched
+
+    Memory per connection is bounded with `threshold`: once reached, the app is held back at the next
+    ASGI message boundary until the queued events are processed.
+    """
+
+    def __init__(
+        self,
+        ctx: EventContext,
+        process: Callable[[Deque[Event]], Awaitable[None]],
+        threshold: Optional[int] = None,
+        interval: Optional[float] = None,
+        hold: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        """
+        :param hold: Events are held back, and not flushed, as long as this returns True.
+        """
+        self._ctx = ctx
+        self._process = process
+        self._threshold = threshold
+        self._interval = interval
+        self._hold = hold
+
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._is_closing = False
+        self._worker: Optional[asyncio.Task] = None
+
+        self.flush_count = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._ctx.events) if self._ctx.has_events() else 0
+
+    def start(self) -> None:
+        self._worker = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        """
+        Stop the background worker once the events queued so far are processed
+        """
+        self._is_closing = True
+        self._wakeup.set()
+        if self._worker is not None:
+            await self._worker
+
+    def notify(self) -> None:
+        """
+        Called by dispatch() after an event is queued
+        """
+        if self._threshold is not None and self.pending >= self._threshold:
+            self.request_flush()
+
+    def request_flush(self) -> None:
+        # dispatch() can be called from a thread when sync endpoints are run in a threadpool
+        if threading.get_ident() == self._thread_id:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    @property
+    def is_held(self) -> bool:
+        return self._hold is not None and self._hold()
+
+    async def flush(self) -> None:
+        if self.is_held:
+            return
+
+        async with self._lock:
+            while self._ctx.has_events():
+                events = self._ctx.events
+                # events are popped one by one, as dispatch() may be appending to the same deque from a thread
+                batch = deque(events.popleft() for _ in range(len(events)))
+                self.flush_count += 1
+                await self._process(batch)
+
+    async def wait_for_capacity(self) -> None:
+        """
+        Hold back the caller until the queue is below the threshold
+        """
+        if self._threshold is not None and self.pending >= self._threshold and not self.is_held:
+            await self.flush()
+
+    def wrap(
+        self,
+        receive: Receive,
+        send: Send,
+        flush_on_message: bool = False,
+        flush_after: Optional[str] = None,
+    ) -> Tuple[Receive, Send]:
+        """
+        Wrap the ASGI receive and send channels to flush and apply backpressure at message boundaries
+
+        :param flush_on_message: Flush at every message boundary.
+        :param flush_after: Flush at every message boundary once a message of this type has been sent, \
+            e.g. `http.response.start`.
+        """
+        is_flushing_on_send = flush_on_message
+
+        async def _receive() -> Message:
+            if flush_on_message and self.pending:
+                self.request_flush()
+            await self.wait_for_capacity()
+            return await receive()
+
+        async def _send(message: Message) -> None:
+            nonlocal is_flushing_on_send
+
+            await send(message)
+            if not is_flushing_on_send and message["type"] == flush_after:
+                is_flushing_on_send = True
+
+            if is_flushing_on_send and self.pending:
+                self.request_flush()
+            await self.wait_for_capacity()
+
+        return _receive, _send
+
+    async def _run(self) -> None:
+        while not self._is_closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush events")
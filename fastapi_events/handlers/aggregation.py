@@ -0,0 +1,261 @@
+import asyncio
+import fnmatch
+import logging
+import math
+import time
+from array import array
+from enum import Enum
+from typing import (Callable, Dict, Hashable, Iterable, List, Optional,
+                    Sequence, Tuple)
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.typing import Event, EventName
+from fastapi_events.workers import BackgroundWorkers
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_KEY = "__other__"  # key events are aggregated under once `max_keys` is reached
+
+# state of a bucket: count, sum, min, max
+_FIELDS = 4
+_EMPTY_BUCKET = (0.0, 0.0, math.inf, -math.inf)
+
+
+class AggregationHandler(BaseEventHandler):
+    """
+    Aggregation Handler
+    - aggregates counter-style events (e.g. page views, API calls) in-process, per event name and key,
+      and hands over one summary event per key and window to the wrapped handler, instead of every event
+    - summaries hold the `count`, `sum`, `min` and `max` of the values of the events
+    - windows are tumbling, or sliding with `slide`: a summary of the last `window` seconds is emitted
+      every `slide` seconds
+    - state is kept in a single `array('d')`, with a slot of `window / slide` buckets per key. Keys are bounded by
+      `max_keys`, including the `OVERFLOW_KEY` of each event name: events of new keys past that limit are aggregated
+      under `OVERFLOW_KEY`, or dropped (see `dropped_count`) if its slot cannot be created either. Keys without
+      events for a whole window are released.
+    - summaries of the current windows are emitted on shutdown
+
+    Events not matching `event_names` are handed over as is, right away.
+    """
+
+    def __init__(
+        self,
+        handler: BaseEventHandler,
+        event_names: Sequence[str] = ("*",),
+        key: Optional[Callable[[Event], Hashable]] = None,
+        value: Optional[Callable[[Event], float]] = None,
+        window: float = 60.0,
+        slide: Optional[float] = None,
+        max_keys: int = 10_000,
+        summary_suffix: str = "_summary",
+    ) -> None:
+        """
+        :param handler: The handler summaries are handed over to.
+        :param event_names: Unix shell-style patterns of the event names aggregated, e.g. `["page_viewed"]`.
+        :param key: Extracts the key events are aggregated by, besides their name, e.g. `lambda event: event[1]["path"]`.
+        :param value: Extracts the value aggregated, e.g. `lambda event: event[1]["duration"]`. \
+            Defaults to 1 per event.
+        :param window: Duration of a window, in seconds.
+        :param slide: Interval between the summaries of sliding windows, in seconds. `window` must be a multiple \
+            of it. Windows are tumbling if omitted.
+        :param max_keys: Maximum number of keys aggregated at once.
+        :param summary_suffix: Suffix appended to the event name of the events summarized, to name summaries.
+        """
+        for fn in (key, value):
+            if fn is not None and not callable(fn):
+                raise ConfigurationError("key and value must be of type Callable")
+        if window <= 0 or (slide is not None and slide <= 0):
+            raise ConfigurationError("window and slide must be greater than 0")
+
+        slide = slide or window
+        bucket_count = round(window / slide)
+        if bucket_count < 1 or not math.isclose(bucket_count * slide, window):
+            raise ConfigurationError("window must be a multiple of slide")
+        if max_keys < 1:
+            raise ConfigurationError("max_keys must be at least 1")
+
+        self._handler = handler
+        self._event_names = list(event_names)
+        self._key = key
+        self._value = value
+        self._window = window
+        self._slide = slide
+        self._max_keys = max_keys
+        self._summary_suffix = summary_suffix
+        self._aggregated_cache: Dict[EventName, bool] = {}
+
+        self._bucket_count = bucket_count
+        self._slot_size = bucket_count * _FIELDS
+        self._state = array("d")
+        self._slots: Dict[Tuple[EventName, Hashable], int] = {}
+        self._free_slots: List[int] = []
+        self._bucket = 0  # bucket of the current slide, in every slot
+        self._next_tick_at: Optional[float] = None
+        self._ticker = BackgroundWorkers(self._run_ticker, name="AggregationHandler ticker")
+
+        self.aggregated_count = 0
+        self.overflow_count = 0
+        self.dropped_count = 0  # events of new keys past `max_keys`, whose overflow slot could not be created
+        self.summary_count = 0
+
+    @property
+    def key_count(self) -> int:
+        return len(self._slots)
+
+    async def startup(self) -> None:
+        await self._handler.startup()
+
+    async def shutdown(self) -> None:
+        await self._ticker.drain()
+        await self._emit(self._summarize())
+        self._slots.clear()
+        self._free_slots.clear()
+        self._state = array("d")
+        self._next_tick_at = None
+        await self._handler.shutdown()
+
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        passed_through: List[Event] = []
+        for event in events:
+            event_name = event[0]
+            if not self._is_aggregated(event_name):
+                passed_through.append(event)
+                continue
+
+            key = self._key(event) if self._key is not None else None
+            value = float(self._value(event)) if self._value is not None else 1.0
+            slot = self._get_slot(event_name, key)
+            if slot is None:
+                self.dropped_count += 1
+                continue
+
+            self._record(slot, value)
+            self.aggregated_count += 1
+
+        if self._next_tick_at is None and self._slots:
+            self._ticker.ensure_started()
+            self._next_tick_at = asyncio.get_running_loop().time() + self._slide
+            self._ticker.wake()
+
+        if passed_through:
+            await self._handler.handle_many(events=passed_through)
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+    def _is_aggregated(self, event_name: EventName) -> bool:
+        aggregated = self._aggregated_cache.get(event_name)
+        if aggregated is None:
+            name = event_name if isinstance(event_name, str) else str(event_name)
+            aggregated = self._aggregated_cache[event_name] = any(fnmatch.fnmatch(name, pattern)
+                                                                  for pattern in self._event_names)
+        return aggregated
+
+    def _get_slot(self, event_name: EventName, key: Hashable) -> Optional[int]:
+        slot = self._slots.get((event_name, key))
+        if slot is not None:
+            return slot
+
+        # room is kept for the overflow slot of the event name, checked before any slot is inserted
+        has_overflow_slot = (event_name, OVERFLOW_KEY) in self._slots
+        if len(self._slots) + (not has_overflow_slot) >= self._max_keys:
+            self.overflow_count += 1
+            key = OVERFLOW_KEY
+            slot = self._slots.get((event_name, key))
+            if slot is not None:
+                return slot
+            if len(self._slots) >= self._max_keys:  # taken by the keys of other event names
+                return None
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._state) // self._slot_size
+            self._state.extend(_EMPTY_BUCKET * self._bucket_count)
+
+        self._slots[(event_name, key)] = slot
+        return slot
+
+    def _record(self, slot: int, value: float) -> None:
+        state = self._state
+        offset = slot * self._slot_size + self._bucket * _FIELDS
+        state[offset] += 1
+        state[offset + 1] += value
+        if value < state[offset + 2]:
+            state[offset + 2] = value
+        if value > state[offset + 3]:
+            state[offset + 3] = value
+
+    def _summarize(self) -> List[Event]:
+        """
+        Build the summaries of the current windows, and release the keys without events in them
+        """
+        state = self._state
+        window_end = time.time()
+        summaries: List[Event] = []
+        for (event_name, key), slot in list(self._slots.items()):
+            count, total, minimum, maximum = 0.0, 0.0, math.inf, -math.inf
+            for offset in range(slot * self._slot_size, (slot + 1) * self._slot_size, _FIELDS):
+                count += state[offset]
+                total += state[offset + 1]
+                minimum = min(minimum, state[offset + 2])
+                maximum = max(maximum, state[offset + 3])
+
+            if not count:
+                del self._slots[(event_name, key)]
+                self._free_slots.append(slot)
+                continue
+
+            name = event_name.value if isinstance(event_name, Enum) else event_name
+            summaries.append((f"{name}{self._summary_suffix}", {
+                "event_name": name,
+                "key": key,
+                "window_start": window_end - self._window,
+                "window_end": window_end,
+                "count": int(count),
+                "sum": total,
+                "min": minimum,
+                "max": maximum,
+            }))
+
+        return summaries
+
+    def _advance(self) -> None:
+        """
+        Move on to the next bucket, dropping the events of the oldest slide out of the windows
+        """
+        self._bucket = (self._bucket + 1) % self._bucket_count
+        for slot in self._slots.values():
+            offset = slot * self._slot_size + self._bucket * _FIELDS
+            self._state[offset:offset + _FIELDS] = array("d", _EMPTY_BUCKET)
+
+    async def _tick(self) -> None:
+        summaries = self._summarize()
+        self._advance()
+        await self._emit(summaries)
+
+    async def _emit(self, summaries: List[Event]) -> None:
+        if not summaries:
+            return
+
+        self.summary_count += len(summaries)
+        try:
+            await self._handler.handle_many(events=summaries)
+        except Exception:
+            logger.exception("Failed to hand over %d summary event(s)", len(summaries))
+
+    async def _run_ticker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self._ticker.draining:
+            if self._next_tick_at is None:
+                await self._ticker.wait()
+                continue
+
+            if self._next_tick_at > loop.time():
+                await self._ticker.wait(timeout=self._next_tick_at - loop.time())
+                continue
+
+            await self._tick()
+            # windows start again with the next event once all keys are released
+            self._next_tick_at = max(self._next_tick_at + self._slide, loop.time()) if self._slots else None
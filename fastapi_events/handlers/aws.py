@@ -1,9 +1,10 @@
 import json
 import uuid
-from typing import Callable, Iterable, Optional
+from typing import Callable, Iterable, List, Optional
 
 import boto3
 
+from fastapi_events.adaptive import AdaptiveBatchController, AdaptiveBatcher
 from fastapi_events.errors import ConfigurationError
 from fastapi_events.handlers.base import BaseEventHandler
 from fastapi_events.typing import Event
@@ -22,6 +23,7 @@ class SQSForwardHandler(BaseEventHandler):
     """
     AWS SQS Forward Handler
     - forwards all events to an SQS queue
+    - with a `batch_controller`, batches are sized and timed adaptively (see `AdaptiveBatchController`)
     """
 
     def __init__(
@@ -31,13 +33,14 @@ class SQSForwardHandler(BaseEventHandler):
         serializer: Optional[Callable[[Event], str]] = None,
         id_generator: Optional[Callable[[Event], str]] = None,
         max_batch_size: int = 10,  # AWS supports up to 10 messages at once
+        batch_controller: Optional[AdaptiveBatchController] = None,
         **boto_client_kwargs
     ):
         for fn in (serializer, id_generator):
             if fn is not None and not callable(fn):
                 raise ConfigurationError("serializer and id_generator must be of type Callable")
 
-        if max_batch_size > 10:
+        if max_batch_size > 10 or (batch_controller is not None and batch_controller.max_batch_size > 10):
             raise ConfigurationError("SQS doesn't support batch size larger than 10")
 
         self._queue_url = queue_url
@@ -47,19 +50,36 @@ class SQSForwardHandler(BaseEventHandler):
         self._client = boto3.client('sqs', region_name=self._region_name, **boto_client_kwargs)
         self._serializer = serializer or _json_serializer
         self._id_generator = id_generator or _uuid4_generator
+        self._batcher = AdaptiveBatcher(send=self._send_batch, controller=batch_controller) \
+            if batch_controller is not None else None
+
+    async def shutdown(self) -> None:
+        if self._batcher is not None:
+            await self._batcher.close()
 
     async def handle_many(self, events: Iterable[Event]) -> None:
+        if self._batcher is not None:
+            await self._batcher.submit(events)
+            return
+
         for batch in chunk(events, self._max_batch_size):
-            messages = [{"Id": self.generate_id(event),
-                         "MessageBody": self.format_message(event=event)}
-                        for event in batch]
-            self._client.send_message_batch(QueueUrl=self._queue_url,
-                                            Entries=messages)
+            await self._send_batch(batch)
 
     async def handle(self, event: Event) -> None:
+        if self._batcher is not None:
+            await self._batcher.submit([event])
+            return
+
         self._client.send_message(QueueUrl=self._queue_url,
                                   MessageBody=self.format_message(event=event))
 
+    async def _send_batch(self, batch: List[Event]) -> None:
+        messages = [{"Id": self.generate_id(event),
+                     "MessageBody": self.format_message(event=event)}
+                    for event in batch]
+        self._client.send_message_batch(QueueUrl=self._queue_url,
+                                        Entries=messages)
+
     def format_message(self, event: Event) -> str:
         return self._serializer(event)
 
@@ -13,3 +13,14 @@ class BaseEventHandler(ABC):
     @abc.abstractmethod
     async def handle(self, event: Event) -> None:
         raise NotImplementedError
+
+    async def startup(self) -> None:
+        """
+        Called by EventHandlerASGIMiddleware on ASGI lifespan startup, before the app's startup handlers
+        """
+
+    async def shutdown(self) -> None:
+        """
+        Called by EventHandlerASGIMiddleware on ASGI lifespan shutdown, after the app's shutdown handlers.
+        Handlers holding events in the background should process or persist them here.
+        """
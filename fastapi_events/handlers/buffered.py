@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import Callable, Iterable, List, Optional
+
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.spill import SpilloverQueue
+from fastapi_events.typing import Event
+from fastapi_events.workers import BackgroundWorkers, log_discarded
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedHandler(BaseEventHandler):
+    """
+    Buffered Handler
+    - acknowledges events as soon as they are queued, and hands them over to the wrapped handler in the background
+    - the queue holds up to `memory_limit` events in memory, and spills to disk past that limit
+      (see `fastapi_events.spill.SpilloverQueue`), so a slow remote handler neither blocks requests
+      nor grows memory without bound
+    - batches failing in the wrapped handler are retried in order
+
+    The drain is started on ASGI lifespan startup, or lazily on the first event.
+    Events still queued once `shutdown_timeout` has elapsed on shutdown are discarded.
+    """
+
+    def __init__(
+        self,
+        handler: BaseEventHandler,
+        memory_limit: int = 10_000,
+        spill_directory: Optional[str] = None,
+        segment_size: int = 16 * 1024 * 1024,
+        serializer: Optional[Callable[[Event], bytes]] = None,
+        deserializer: Optional[Callable[[bytes], Event]] = None,
+        batch_size: int = 100,
+        retry_interval: float = 1.0,
+        shutdown_timeout: Optional[float] = 10.0,
+    ) -> None:
+        """
+        :param handler: The handler events are handed over to, e.g. `SQSForwardHandler`.
+        :param memory_limit: Maximum number of events held in memory before spilling to disk.
+        :param spill_directory: Directory in which segment files are created. \
+            The system temp directory is used if omitted.
+        :param segment_size: Size of a segment file in bytes before a new one is started.
+        :param serializer: Serializes a spilled event into bytes. `pickle` is used by default.
+        :param deserializer: Deserializes bytes back into an event.
+        :param batch_size: Maximum number of events passed to `handler.handle_many()` at once.
+        :param retry_interval: Time to wait before retrying a failed batch, in seconds.
+        :param shutdown_timeout: Time given to drain the queue on shutdown, in seconds.
+        """
+        self._handler = handler
+        self._queue = SpilloverQueue(memory_limit=memory_limit,
+                                     directory=spill_directory,
+                                     segment_size=segment_size,
+                                     serializer=serializer,
+                                     deserializer=deserializer)
+        self._batch_size = batch_size
+        self._retry_interval = retry_interval
+        self._shutdown_timeout = shutdown_timeout
+
+        self._drain = BackgroundWorkers(self._run_drain, name="BufferedHandler drain")
+        self._in_flight: List[Event] = []
+
+        self.handled_count = 0
+
+    @property
+    def queue(self) -> SpilloverQueue:
+        return self._queue
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue) + len(self._in_flight)
+
+    async def startup(self) -> None:
+        await self._handler.startup()
+        self._drain.ensure_started()
+
+    async def shutdown(self) -> None:
+        await self._drain.drain(timeout=self._shutdown_timeout)
+        if self.pending:
+            log_discarded(self.pending, self._shutdown_timeout)
+            self._in_flight = []
+        self._queue.close()
+        await self._handler.shutdown()
+
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        self._queue.extend(events)
+        self._drain.ensure_started()
+        self._drain.wake()
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+    async def _run_drain(self) -> None:
+        while True:
+            if not self._in_flight:
+                self._in_flight = self._queue.get_batch(self._batch_size)
+
+            if not self._in_flight:
+                if self._drain.draining:
+                    return
+
+                await self._drain.wait()
+                continue
+
+            try:
+                await self._handler.handle_many(events=self._in_flight)
+            except Exception:
+                logger.exception("Failed to handle %d event(s). Retrying in %ss...",
+                                 len(self._in_flight), self._retry_interval)
+                await asyncio.sleep(self._retry_interval)
+                continue
+
+            self.handled_count += len(self._in_flight)
+            self._in_flight = []
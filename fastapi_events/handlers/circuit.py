@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+from fastapi_events.circuit import CircuitBreaker, CircuitState
+from fastapi_events.errors import CircuitOpenError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.typing import Event
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreakerHandler(BaseEventHandler):
+    """
+    Circuit Breaker Handler
+    - bounds every call to the wrapped handler with `timeout`, so a hung remote call does not hold back the request
+    - failures (and timeouts) are tracked by a circuit breaker of its own. Once open, events fail fast with
+      `CircuitOpenError`, or are diverted to `fallback_handler` (e.g. `OutboxHandler` or `BufferedHandler`)
+    """
+
+    def __init__(
+        self,
+        handler: BaseEventHandler,
+        timeout: Optional[float] = None,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        fallback_handler: Optional[BaseEventHandler] = None,
+    ) -> None:
+        """
+        :param handler: The handler events are handed over to.
+        :param timeout: Maximum time a call to the wrapped handler may take, in seconds.
+        :param failure_threshold: Number of consecutive failures opening the circuit.
+        :param recovery_timeout: Time the circuit stays open before a trial call is let through, in seconds.
+        :param half_open_max_calls: Number of concurrent trial calls while half-open.
+        :param fallback_handler: Handler receiving the events rejected while the circuit is open, \
+            and the events of failed calls.
+        """
+        self._handler = handler
+        self._timeout = timeout
+        self._fallback_handler = fallback_handler
+        self.breaker = CircuitBreaker(failure_threshold=failure_threshold,
+                                      recovery_timeout=recovery_timeout,
+                                      half_open_max_calls=half_open_max_calls)
+
+    @property
+    def state(self) -> CircuitState:
+        return self.breaker.state
+
+    async def startup(self) -> None:
+        await asyncio.gather(*[handler.startup() for handler in (self._handler, self._fallback_handler) if handler])
+
+    async def shutdown(self) -> None:
+        await asyncio.gather(*[handler.shutdown() for handler in (self._handler, self._fallback_handler) if handler])
+
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        events = list(events)
+        handler_name = type(self._handler).__name__
+
+        if not self.breaker.allow():
+            if self._fallback_handler is None:
+                raise CircuitOpenError(handler_name=handler_name)
+
+            logger.debug("Circuit breaker of %s is open. Diverting %d event(s) to the fallback handler",
+                         handler_name, len(events))
+            await self._fallback_handler.handle_many(events=events)
+            return
+
+        try:
+            if self._timeout is not None:
+                await asyncio.wait_for(self._handler.handle_many(events=events), timeout=self._timeout)
+            else:
+                await self._handler.handle_many(events=events)
+        except asyncio.CancelledError:
+            # a cancelled call tells nothing about the health of the handler, but must not hold a trial slot
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            if self._fallback_handler is None:
+                raise
+
+            logger.exception("%s failed to handle %d event(s). Diverting them to the fallback handler",
+                             handler_name, len(events))
+            await self._fallback_handler.handle_many(events=events)
+        else:
+            self.breaker.record_success()
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
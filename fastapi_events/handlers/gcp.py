@@ -1,8 +1,10 @@
+import asyncio
 import json
-from typing import Any, Callable, Dict, Iterable, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 from google.cloud import pubsub_v1
 
+from fastapi_events.adaptive import AdaptiveBatchController, AdaptiveBatcher
 from fastapi_events.errors import ConfigurationError
 from fastapi_events.handlers.base import BaseEventHandler
 from fastapi_events.typing import Event
@@ -20,10 +22,15 @@ class GoogleCloudSimplePubSubHandler(BaseEventHandler):
         max_batch_size: int = 1000,  # GCP Pubsub's maximum supported batch size
         batch_settings_kwargs: Optional[Dict[str, Any]] = None,
         serializer: Optional[Callable[[Event], str]] = None,
+        batch_controller: Optional[AdaptiveBatchController] = None,
     ) -> None:
-        """Google cloud simple PubSub handler. Publishes events to a single topic."""
+        """Google cloud simple PubSub handler. Publishes events to a single topic.
 
-        if max_batch_size > 1000:
+        With a `batch_controller`, events are published in batches sized and timed adaptively
+        (see `AdaptiveBatchController`), and each batch waits for its messages to be published.
+        """
+
+        if max_batch_size > 1000 or (batch_controller is not None and batch_controller.max_batch_size > 1000):
             raise ConfigurationError("GCP Pubsub batch size limit is 1000.")
 
         if serializer is not None and not callable(serializer):
@@ -34,18 +41,36 @@ class GoogleCloudSimplePubSubHandler(BaseEventHandler):
         # Publish messages as soon as there are max_messages
         # or 1 second is passed
         self._batch_settings = pubsub_v1.types.BatchSettings(
-            max_messages=self._max_batch_size, **batch_settings_kwargs
+            max_messages=self._max_batch_size, **(batch_settings_kwargs or {})
         )
         self._client = pubsub_v1.PublisherClient(self._batch_settings)
         self._serializer = serializer or _json_serializer
         self._topic_path = self._client.topic_path(project_id, topic_id)
+        self._batcher = AdaptiveBatcher(send=self._publish_batch, controller=batch_controller) \
+            if batch_controller is not None else None
+
+    async def shutdown(self) -> None:
+        if self._batcher is not None:
+            await self._batcher.close()
 
     async def handle_many(self, events: Iterable[Event]) -> None:
+        if self._batcher is not None:
+            await self._batcher.submit(events)
+            return
+
         for event in events:
             await self.handle(event)
 
     async def handle(self, event: Event) -> None:
+        if self._batcher is not None:
+            await self._batcher.submit([event])
+            return
+
         self._client.publish(self._topic_path, self.format_message(event))
 
+    async def _publish_batch(self, batch: List[Event]) -> None:
+        futures = [self._client.publish(self._topic_path, self.format_message(event)) for event in batch]
+        await asyncio.gather(*[asyncio.wrap_future(future) for future in futures])
+
     def format_message(self, event: Event) -> bytes:
         return self._serializer(event).encode("utf-8")
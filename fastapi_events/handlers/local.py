@@ -3,14 +3,20 @@ import fnmatch
 import functools
 import inspect
 import sys
-from typing import Any, Callable, Dict, ForwardRef, List, Optional, Tuple, cast
+from typing import (Any, Callable, Dict, ForwardRef, Hashable, Iterable, List,
+                    Optional, Tuple, Union, cast)
 
 from typing_extensions import Protocol, runtime_checkable
 
+from fastapi_events.errors import ConfigurationError
 from fastapi_events.handlers.base import BaseEventHandler
 from fastapi_events.otel.utils import create_span_for_handle_fn
+from fastapi_events.predicates import Conditions, PredicateIndex, compile_where
+from fastapi_events.profiling import HandlerProfiler, profile_handler
 from fastapi_events.typing import Event
 
+HANDLERS_CACHE_SIZE = 1024  # maximum number of event names whose handlers are cached
+
 
 def evaluate_forwardref(type_: ForwardRef, globalns: Any, localns: Any) -> Any:
     """
@@ -120,7 +126,7 @@ def get_dependant(
 
 async def solve_dependencies(
     *,
-    event: Event,
+    event: Union[Event, List[Event]],  # the events of a batch handler
     dependant: Dependant,
 ) -> Tuple[
     Dict[str, Any],
@@ -156,10 +162,42 @@ async def solve_dependencies(
 
 
 class LocalHandler(BaseEventHandler):
-    def __init__(self):
-        self._registry = {}
+    def __init__(
+        self,
+        profiler: Optional[HandlerProfiler] = None,
+        partition_key: Optional[Callable[[Event], Hashable]] = None,
+        partitions: int = 8,
+        partition_queue_size: int = 100,
+    ):
+        """
+        :param profiler: Optional profiler wrapping each registered function call.
+
+        By default, events are handled concurrently. In partitioned mode, events sharing a key are handled
+        in the order they are dispatched, while events of different partitions are handled concurrently:
 
-    def register(self, _func=None, event_name="*"):
+        :param partition_key: Maps an event to its partition key, e.g. `lambda event: event[1]["order_id"]`.
+        :param partitions: Number of lanes. Each lane handles its events one at a time, and all lanes run concurrently.
+        :param partition_queue_size: Maximum number of events queued per lane. \
+            `handle_many()` waits for room once a lane is full.
+        """
+        if partition_key is not None and not callable(partition_key):
+            raise ConfigurationError("partition_key must be of type Callable")
+        if partitions < 1:
+            raise ConfigurationError("partitions must be at least 1")
+
+        self._registry: Dict[str, List[Tuple[Callable, Optional[Conditions]]]] = {}
+        self._batch_registry: Dict[str, List[Tuple[Callable, Optional[Conditions]]]] = {}
+        self._dependants: Dict[Callable, Dependant] = {}
+        self._handlers_cache: Dict[Tuple[str, bool], PredicateIndex[Callable]] = {}
+        self._profiler = profiler
+        self._partition_key = partition_key
+        self._partition_count = partitions
+        self._partition_queue_size = partition_queue_size
+        self._lanes: List[asyncio.Queue] = []
+        self._lane_workers: List[asyncio.Task] = []
+        self._lanes_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def register(self, _func=None, event_name="*", batch=False, where=None):
         """
         Register a handler for an event. The handler will receive a tuple of event name and payload as its only argument.
 
@@ -167,6 +205,16 @@ class LocalHandler(BaseEventHandler):
 
         :param _func: The function to be registered as a handler.  Typically, you would use `register` as a decorator and omit this argument.
         :param event_name: The name of the event to be associated with the handler. Use "*", the default value, to match all events.
+        :param batch: Register a batch handler. It receives the list of events of the same name handled together \
+            (e.g. the events dispatched within a request), in dispatch order, in a single call. \
+            Its dependencies are resolved once per call. In partitioned mode, batch handlers are called \
+            alongside the lanes: events of a batch are in dispatch order, but batch handlers are not ordered \
+            with the handlers of single events sharing the same partition key.
+        :param where: Conditions on the payload, e.g. `{"type": "refund", "currency": ["EUR", "USD"]}`. \
+            The handler is only called for events whose payload has each field equal to the value given, \
+            or to one of the values given as a list, tuple or set. Handlers are indexed on these fields, \
+            so events are matched to the handlers whose conditions pass without calling the others. \
+            Batch handlers receive the events matching their conditions.
 
         ### Examples
 
@@ -179,9 +227,25 @@ class LocalHandler(BaseEventHandler):
         async def my_event_handler(event: Event):
             event_name, payload = event
             print(f"Received event {event_name} with payload {payload}")        ```
+
+        Register a batch handler, e.g. to insert rows in bulk:
+        ```python
+        @local_handler.register(event_name="order_placed", batch=True)
+        async def save_orders(events: List[Event]):
+            await db.insert_many("orders", [payload for _, payload in events])
+        ```
+
+        Register a handler for some payloads only:
+        ```python
+        @local_handler.register(event_name="payment_*", where={"type": "refund", "currency": ["EUR", "USD"]})
+        async def handle_refund(event: Event):
+            ...
+        ```
         """
+        conditions = compile_where(where)
+
         def _wrap(func):
-            self._register_handler(event_name, func)
+            self._register_handler(event_name, func, batch=batch, conditions=conditions)
             return func
 
         if _func is None:
@@ -189,7 +253,79 @@ class LocalHandler(BaseEventHandler):
 
         return _wrap(func=_func)
 
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        if not self._batch_registry:
+            await self._handle_each(events)
+            return
+
+        events = list(events)
+        groups: Dict[Any, List[Event]] = {}
+        for event in events:
+            groups.setdefault(event[0], []).append(event)
+
+        await asyncio.gather(self._handle_each(events),
+                             *[self._handle_group(event_name, group) for event_name, group in groups.items()])
+
     async def handle(self, event: Event) -> None:
+        if self._batch_registry:
+            await asyncio.gather(self._handle_each([event]), self._handle_group(event[0], [event]))
+        elif self._partition_key is not None:
+            await self._handle_each([event])
+        else:
+            await self._handle_event(event)
+
+    async def _handle_each(self, events: Iterable[Event]) -> None:
+        """
+        Hand over events to the handlers registered for single events
+        """
+        if self._partition_key is None:
+            await asyncio.gather(*[self._handle_event(event) for event in events])
+            return
+
+        lanes = self._get_lanes()
+        futures = []
+        for event in events:
+            future = asyncio.get_running_loop().create_future()
+            lane = lanes[hash(self._partition_key(event)) % self._partition_count]
+            await lane.put((event, future))  # backpressure once the lane is full
+            futures.append(future)
+
+        await asyncio.gather(*futures)
+
+    async def shutdown(self) -> None:
+        if not self._lane_workers:
+            return
+
+        await asyncio.gather(*[lane.join() for lane in self._lanes])
+        for worker in self._lane_workers:
+            worker.cancel()
+        self._lanes, self._lane_workers = [], []
+
+    def _get_lanes(self) -> List[asyncio.Queue]:
+        loop = asyncio.get_running_loop()
+        if self._lanes_loop is not loop:
+            # lanes are bound to the running event loop, and recreated if the loop changes
+            self._lanes_loop = loop
+            self._lanes = [asyncio.Queue(maxsize=self._partition_queue_size) for _ in range(self._partition_count)]
+            self._lane_workers = [asyncio.create_task(self._run_lane(lane)) for lane in self._lanes]
+
+        return self._lanes
+
+    async def _run_lane(self, lane: asyncio.Queue) -> None:
+        while True:
+            event, future = await lane.get()
+            try:
+                await self._handle_event(event)
+            except Exception as exc:
+                if not future.done():
+                    future.set_exception(exc)
+            else:
+                if not future.done():
+                    future.set_result(None)
+            finally:
+                lane.task_done()
+
+    async def _handle_event(self, event: Event) -> None:
         event_name, payload = event
 
         with create_span_for_handle_fn(
@@ -197,38 +333,86 @@ class LocalHandler(BaseEventHandler):
             event_name=event_name,
             payload=payload,
         ):
-            for handler in self._get_handlers_for_event(event_name=event_name):
+            for handler in self._get_handlers_for_event(event_name=event_name, payload=payload):
                 # #41 resolve dependencies
-                dependant = get_dependant(call=handler)
-                values, errors = await solve_dependencies(event=event, dependant=dependant)
+                values, errors = await solve_dependencies(event=event, dependant=self._get_dependant(handler))
 
+                with profile_handler(self._profiler, handler=handler, event_name=event_name):
+                    if inspect.iscoroutinefunction(handler):
+                        await handler(event, **values)
+                    else:
+                        # Making sure sync function will never block the event loop
+                        loop = asyncio.get_event_loop()
+                        await loop.run_in_executor(None, functools.partial(handler, event))
+
+    async def _handle_group(self, event_name, events: List[Event]) -> None:
+        """
+        Hand over events of the same name to the batch handlers registered for them
+        """
+        index = self._get_handler_index(event_name=event_name, batch=True)
+        if index.has_conditions:
+            # each batch handler receives the events matching its conditions
+            groups: Dict[Callable, List[Event]] = {}
+            for event in events:
+                for handler in index.match(event[1]):
+                    groups.setdefault(handler, []).append(event)
+            handler_groups = [(handler, groups.pop(handler)) for handler in index.targets if handler in groups]
+        else:
+            handler_groups = [(handler, events) for handler in index.targets]
+
+        for handler, handler_events in handler_groups:
+            values, errors = await solve_dependencies(event=handler_events, dependant=self._get_dependant(handler))
+
+            with profile_handler(self._profiler, handler=handler, event_name=event_name):
                 if inspect.iscoroutinefunction(handler):
-                    await handler(event, **values)
+                    await handler(handler_events, **values)
                 else:
-                    # Making sure sync function will never block the event loop
                     loop = asyncio.get_event_loop()
-                    await loop.run_in_executor(None, functools.partial(handler, event))
+                    await loop.run_in_executor(None, functools.partial(handler, handler_events))
 
-    def _register_handler(self, event_name, func):
+    def _register_handler(self, event_name, func, batch=False, conditions=None):
         if not isinstance(event_name, str):
             event_name = str(event_name)
 
-        if event_name not in self._registry:
-            self._registry[event_name] = []
+        registry = self._batch_registry if batch else self._registry
+        if event_name not in registry:
+            registry[event_name] = []
 
-        self._registry[event_name].append(func)
+        registry[event_name].append((func, conditions))
+        self._handlers_cache.clear()
 
-    def _get_handlers_for_event(self, event_name):
+    def _get_dependant(self, handler: Callable) -> Dependant:
+        """
+        Dependencies are inspected once, on the first call of the handler rather than on registration,
+        so that annotations can refer to names defined after the handler
+        """
+        dependant = self._dependants.get(handler)
+        if dependant is None:
+            dependant = self._dependants[handler] = get_dependant(call=handler)
+        return dependant
+
+    def _get_handlers_for_event(self, event_name, payload=None, batch=False):
+        return self._get_handler_index(event_name=event_name, batch=batch).match(payload)
+
+    def _get_handler_index(self, event_name, batch=False) -> PredicateIndex[Callable]:
         if not isinstance(event_name, str):
             event_name = str(event_name)
 
-        # TODO consider adding a cache
-        handlers = []
-        for event_name_pattern, registered_handlers in self._registry.items():
+        index = self._handlers_cache.get((event_name, batch))
+        if index is not None:
+            return index
+
+        index = PredicateIndex()
+        registry = self._batch_registry if batch else self._registry
+        for event_name_pattern, registered_handlers in registry.items():
             if fnmatch.fnmatch(event_name, event_name_pattern):
-                handlers.extend(registered_handlers)
+                for handler, conditions in registered_handlers:
+                    index.add(handler, conditions)
 
-        return handlers
+        if len(self._handlers_cache) >= HANDLERS_CACHE_SIZE:
+            self._handlers_cache.clear()
+        self._handlers_cache[(event_name, batch)] = index
+        return index
 
 
 local_handler = LocalHandler()
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.typing import Event
+from fastapi_events.workers import BackgroundWorkers
+
+logger = logging.getLogger(__name__)
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def _json_serializer(event: Event) -> str:
+    event_name, payload = event
+    if isinstance(event_name, Enum):
+        event_name = event_name.value
+    return json.dumps([event_name, payload], default=str)
+
+
+def _json_deserializer(data: str) -> Event:
+    event_name, payload = json.loads(data)
+    return event_name, payload
+
+
+class OutboxHandler(BaseEventHandler):
+    """
+    Durable Outbox Handler
+    - appends events to a local SQLite log (in WAL mode) before acknowledging them
+    - concurrent writes are group-committed, so the cost of a commit (and its fsync) is shared by
+      all events written while the previous commit was in progress
+    - a background relay drains the log to the wrapped handler in order, and records the offset of
+      the last event relayed
+    - on startup, events not yet relayed are replayed from the last committed offset
+
+    The relay is started on ASGI lifespan startup, or lazily on the first event.
+    """
+
+    def __init__(
+        self,
+        handler: BaseEventHandler,
+        path: str,
+        serializer: Optional[Callable[[Event], str]] = None,
+        deserializer: Optional[Callable[[str], Event]] = None,
+        relay_batch_size: int = 100,
+        commit_delay: float = 0.0,
+        retry_interval: float = 1.0,
+        shutdown_timeout: Optional[float] = 10.0,
+        synchronous: str = "FULL",
+    ) -> None:
+        """
+        :param handler: The handler events are relayed to, e.g. `SQSForwardHandler`.
+        :param path: Path of the SQLite database.
+        :param relay_batch_size: Maximum number of events passed to `handler.handle_many()` at once.
+        :param commit_delay: Time to wait for more events before committing a group, in seconds. \
+            Trades latency for fewer commits under load.
+        :param retry_interval: Time to wait before relaying again after the wrapped handler fails, in seconds.
+        :param shutdown_timeout: Time given to the relay to drain the log on shutdown, in seconds. \
+            Events left are replayed on the next startup.
+        :param synchronous: SQLite `synchronous` pragma. `FULL` fsyncs on every commit.
+        """
+        for fn in (serializer, deserializer):
+            if fn is not None and not callable(fn):
+                raise ConfigurationError("serializer and deserializer must be of type Callable")
+
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ConfigurationError(f"synchronous must be one of {SYNCHRONOUS_MODES}")
+
+        self._handler = handler
+        self._path = path
+        self._serializer = serializer or _json_serializer
+        self._deserializer = deserializer or _json_deserializer
+        self._relay_batch_size = relay_batch_size
+        self._commit_delay = commit_delay
+        self._retry_interval = retry_interval
+        self._shutdown_timeout = shutdown_timeout
+        self._synchronous = synchronous.upper()
+
+        # all database operations are run in a single thread owning the connection
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fastapi-events-outbox")
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self._pending_writes: List[Tuple[List[str], asyncio.Future]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._relay = BackgroundWorkers(self._run_relay, name="Outbox relay")
+
+        self.commit_count = 0
+        self.relayed_count = 0
+
+    async def startup(self) -> None:
+        await self._handler.startup()
+        self._ensure_started()
+
+    async def shutdown(self) -> None:
+        if self._relay.started:
+            if not await self._relay.drain(timeout=self._shutdown_timeout):
+                logger.warning("Outbox was not drained within %ss. "
+                               "Remaining events will be replayed on next startup.", self._shutdown_timeout)
+            await self._run_in_executor(self._close)
+        await self._handler.shutdown()
+
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        records = [self._serializer(event) for event in events]
+        if not records:
+            return
+
+        self._ensure_started()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending_writes.append((records, future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write())
+
+        # events are acknowledged once they are committed to the log
+        await future
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+    async def pending_count(self) -> int:
+        self._ensure_started()
+        return await self._run_in_executor(self._count_pending)
+
+    def _ensure_started(self) -> None:
+        if self._relay.ensure_started():
+            # writes queued in another event loop cannot be awaited anymore
+            self._pending_writes = []
+            self._writer = None
+
+    async def _run_in_executor(self, fn: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _write(self) -> None:
+        """
+        Group commit: writes all events queued while the previous commit was in progress in a single transaction
+        """
+        while self._pending_writes:
+            if self._commit_delay:
+                await asyncio.sleep(self._commit_delay)
+
+            group, self._pending_writes = self._pending_writes, []
+            try:
+                await self._run_in_executor(self._insert, [record for records, _ in group for record in records])
+            except Exception as exc:
+                for _, future in group:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            self.commit_count += 1
+            for _, future in group:
+                if not future.done():
+                    future.set_result(None)
+            self._relay.wake()
+
+    async def _run_relay(self) -> None:
+        while True:
+            rows = await self._run_in_executor(self._fetch, self._relay_batch_size)
+            if not rows:
+                if self._relay.draining and not self._pending_writes and (self._writer is None or self._writer.done()):
+                    return
+
+                await self._relay.wait()
+                continue
+
+            events = [self._deserializer(record) for _, record in rows]
+            try:
+                await self._handler.handle_many(events=events)
+            except Exception:
+                logger.exception("Failed to relay %d event(s) from outbox. Retrying in %ss...",
+                                 len(events), self._retry_interval)
+                if self._relay.draining:
+                    return
+                await asyncio.sleep(self._retry_interval)
+                continue
+
+            await self._run_in_executor(self._commit_offset, rows[-1][0])
+            self.relayed_count += len(events)
+
+    # The methods below are run in the executor thread
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+
+        conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self._synchronous}")
+        conn.execute("CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, event TEXT NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS outbox_offset "
+                     "(id INTEGER PRIMARY KEY CHECK (id = 0), last_relayed_id INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO outbox_offset (id, last_relayed_id) VALUES (0, 0)")
+        self._conn = conn
+        return conn
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _insert(self, records: List[str]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany("INSERT INTO outbox (event) VALUES (?)", [(record,) for record in records])
+
+    def _fetch(self, limit: int) -> List[Tuple[int, str]]:
+        return self._connect().execute("SELECT id, event FROM outbox "
+                                       "WHERE id > (SELECT last_relayed_id FROM outbox_offset WHERE id = 0) "
+                                       "ORDER BY id LIMIT ?", (limit,)).fetchall()
+
+    def _count_pending(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM outbox "
+                                       "WHERE id > (SELECT last_relayed_id FROM outbox_offset WHERE id = 0)").fetchone()[0]
+
+    def _commit_offset(self, last_relayed_id: int) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute("UPDATE outbox_offset SET last_relayed_id = ? WHERE id = 0", (last_relayed_id,))
+            conn.execute("DELETE FROM outbox WHERE id <= ?", (last_relayed_id,))
@@ -0,0 +1,115 @@
+import logging
+from typing import Dict, Iterable, Optional
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.priority import Priority, PriorityLanes
+from fastapi_events.typing import Event
+from fastapi_events.workers import BackgroundWorkers, log_discarded
+
+logger = logging.getLogger(__name__)
+
+
+class PriorityHandler(BaseEventHandler):
+    """
+    Priority Handler
+    - queues events in a lane per priority class (see `fastapi_events.priority.PriorityLanes`),
+      and hands them over to the wrapped handler with `workers` background workers
+    - workers serve the lanes with weighted scheduling, so critical events are not held back
+      by low-value events during a traffic spike
+    - once `max_pending` events are queued, the lowest-priority events are shed first
+
+    The workers are started on ASGI lifespan startup, or lazily on the first event.
+    """
+
+    def __init__(
+        self,
+        handler: BaseEventHandler,
+        priorities: Optional[Dict[str, Priority]] = None,
+        default_priority: Priority = Priority.NORMAL,
+        weights: Optional[Dict[Priority, int]] = None,
+        max_pending: Optional[int] = 10_000,
+        batch_size: int = 100,
+        workers: int = 1,
+        shutdown_timeout: Optional[float] = 10.0,
+    ) -> None:
+        """
+        :param handler: The handler events are handed over to.
+        :param priorities: Priorities keyed by Unix shell-style event name patterns, \
+            e.g. `{"billing_*": Priority.CRITICAL, "analytics_*": Priority.LOW}`. \
+            A priority passed to `dispatch()` takes precedence.
+        :param default_priority: Priority of events not matching any pattern.
+        :param weights: Share of a batch given to each priority. See `fastapi_events.priority.DEFAULT_WEIGHTS`.
+        :param max_pending: Maximum number of events queued before events are shed.
+        :param batch_size: Maximum number of events passed to `handler.handle_many()` at once.
+        :param workers: Number of concurrent workers.
+        :param shutdown_timeout: Time given to the workers to drain the queue on shutdown, in seconds.
+        """
+        if workers < 1:
+            raise ConfigurationError("workers must be at least 1")
+
+        self._handler = handler
+        self._lanes = PriorityLanes(priorities=priorities,
+                                    default_priority=default_priority,
+                                    weights=weights,
+                                    max_size=max_pending)
+        self._batch_size = batch_size
+        self._shutdown_timeout = shutdown_timeout
+
+        self._workers = BackgroundWorkers(self._run_worker, count=workers, name="PriorityHandler worker")
+
+        self.handled_counts: Dict[Priority, int] = {priority: 0 for priority in Priority}
+
+    @property
+    def shed_counts(self) -> Dict[Priority, int]:
+        return self._lanes.shed_counts
+
+    @property
+    def pending(self) -> int:
+        return len(self._lanes)
+
+    async def startup(self) -> None:
+        await self._handler.startup()
+        self._workers.ensure_started()
+
+    async def shutdown(self) -> None:
+        await self._workers.drain(timeout=self._shutdown_timeout)
+        if self.pending:
+            log_discarded(self.pending, self._shutdown_timeout)
+            self._lanes.get_batch(self.pending)
+        await self._handler.shutdown()
+
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        shed_count = 0
+        for event in events:
+            if self._lanes.put(event) is not None:
+                shed_count += 1
+
+        if shed_count:
+            logger.warning("Queue is overloaded. %d event(s) shed. Total shed so far: %s",
+                           shed_count, {priority.name: count for priority, count in self.shed_counts.items()})
+
+        self._workers.ensure_started()
+        self._workers.wake()
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+    async def _run_worker(self) -> None:
+        while True:
+            batch = self._lanes.get_batch(self._batch_size)
+            if not batch:
+                if self._workers.draining:
+                    return
+
+                await self._workers.wait()
+                continue
+
+            try:
+                await self._handler.handle_many(events=batch)
+            except Exception:
+                logger.exception("Failed to handle %d event(s)", len(batch))
+                continue
+
+            for event in batch:
+                self.handled_counts[self._lanes.get_priority(event)] += 1
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.ratelimit import TokenBucket
+from fastapi_events.typing import Event
+
+logger = logging.getLogger(__name__)
+
+ON_LIMIT_ACTIONS = ("wait", "shed")
+
+
+def _json_size(event: Event) -> int:
+    return len(json.dumps(event[1], default=str))
+
+
+class RateLimitedHandler(BaseEventHandler):
+    """
+    Rate Limited Handler
+    - limits the events handed over to the wrapped handler, in events per second and/or bytes per second,
+      with token buckets allowing bursts
+    - whole batches are paced: a batch waits once for the tokens it needs, instead of once per event.
+      Batches larger than the burst allowance are split into chunks fitting it.
+    - with `on_limit="shed"`, events beyond the tokens available are shed instead of waiting
+    """
+
+    def __init__(
+        self,
+        handler: BaseEventHandler,
+        events_per_second: Optional[float] = None,
+        bytes_per_second: Optional[float] = None,
+        burst_events: Optional[int] = None,
+        burst_bytes: Optional[int] = None,
+        on_limit: str = "wait",
+        size_of: Optional[Callable[[Event], int]] = None,
+    ) -> None:
+        """
+        :param handler: The handler events are handed over to.
+        :param events_per_second: Maximum sustained rate of events.
+        :param bytes_per_second: Maximum sustained rate of bytes, as measured by `size_of`.
+        :param burst_events: Maximum number of events handed over at once after an idle period. \
+            Defaults to `events_per_second`.
+        :param burst_bytes: Maximum number of bytes handed over at once after an idle period. \
+            Defaults to `bytes_per_second`.
+        :param on_limit: `wait` for tokens, or `shed` the events beyond the tokens available.
+        :param size_of: Size of an event in bytes. Defaults to the length of its payload serialized to JSON.
+        """
+        if events_per_second is None and bytes_per_second is None:
+            raise ConfigurationError("At least one of events_per_second and bytes_per_second must be set")
+
+        if on_limit not in ON_LIMIT_ACTIONS:
+            raise ConfigurationError(f"on_limit must be one of {ON_LIMIT_ACTIONS}")
+
+        self._handler = handler
+        self._event_bucket = TokenBucket(rate=events_per_second, capacity=burst_events) \
+            if events_per_second is not None else None
+        self._byte_bucket = TokenBucket(rate=bytes_per_second, capacity=burst_bytes) \
+            if bytes_per_second is not None else None
+        self._on_limit = on_limit
+        self._size_of = size_of or _json_size
+
+        self.forwarded_count = 0
+        self.shed_count = 0
+        self.throttled_time = 0.0
+
+    async def startup(self) -> None:
+        await self._handler.startup()
+
+    async def shutdown(self) -> None:
+        await self._handler.shutdown()
+
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        events = list(events)
+        if not events:
+            return
+
+        sizes = [self._size_of(event) for event in events] if self._byte_bucket is not None else None
+
+        if self._on_limit == "shed":
+            await self._shed(events, sizes)
+            return
+
+        for chunk, size in self._chunk(events, sizes):
+            delay = 0.0
+            if self._event_bucket is not None:
+                delay = self._event_bucket.reserve(len(chunk))
+            if self._byte_bucket is not None:
+                delay = max(delay, self._byte_bucket.reserve(size))
+
+            if delay:
+                self.throttled_time += delay
+                await asyncio.sleep(delay)
+
+            await self._handler.handle_many(events=chunk)
+            self.forwarded_count += len(chunk)
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+    def _chunk(self, events: List[Event], sizes: Optional[List[int]]) -> Iterable[Tuple[List[Event], int]]:
+        """
+        Split events into chunks fitting the burst allowance of the buckets
+        """
+        max_events = int(self._event_bucket.capacity) if self._event_bucket is not None else len(events)
+        max_bytes = self._byte_bucket.capacity if self._byte_bucket is not None else None
+
+        chunk: List[Event] = []
+        chunk_size = 0
+        for idx, event in enumerate(events):
+            size = sizes[idx] if sizes is not None else 0
+            if chunk and (len(chunk) >= max(1, max_events) or (max_bytes is not None and chunk_size + size > max_bytes)):
+                yield chunk, chunk_size
+                chunk, chunk_size = [], 0
+
+            chunk.append(event)
+            chunk_size += size
+
+        if chunk:
+            yield chunk, chunk_size
+
+    async def _shed(self, events: List[Event], sizes: Optional[List[int]]) -> None:
+        accepted = events
+        if self._event_bucket is not None:
+            accepted = accepted[:int(self._event_bucket.tokens)]
+
+        total_size = 0
+        if self._byte_bucket is not None:
+            available_bytes = self._byte_bucket.tokens
+            for idx in range(len(accepted)):
+                if total_size + sizes[idx] > available_bytes:  # type: ignore[index]
+                    accepted = accepted[:idx]
+                    break
+                total_size += sizes[idx]  # type: ignore[index]
+
+        if self._event_bucket is not None:
+            self._event_bucket.try_acquire(len(accepted))
+        if self._byte_bucket is not None:
+            self._byte_bucket.try_acquire(total_size)
+
+        shed_count = len(events) - len(accepted)
+        if shed_count:
+            self.shed_count += shed_count
+            logger.warning("Rate limit exceeded. %d event(s) shed.", shed_count)
+
+        if accepted:
+            await self._handler.handle_many(events=accepted)
+            self.forwarded_count += len(accepted)
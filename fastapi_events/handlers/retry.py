@@ -0,0 +1,168 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.retry import RetryPolicy
+from fastapi_events.typing import Event
+from fastapi_events.workers import BackgroundWorkers
+
+logger = logging.getLogger(__name__)
+
+
+class RetryHandler(BaseEventHandler):
+    """
+    Retry Handler
+    - the first attempt is made inline. Retryable failures are retried in the background,
+      with exponential backoff and jitter (see `fastapi_events.retry.RetryPolicy`), off the request path
+    - events exhausting their attempts, or failing with an exception that is not retryable,
+      are handed over to `dead_letter_handler`
+    - on shutdown, events still awaiting a retry are handed over to `dead_letter_handler` too
+
+    Batches are retried as a whole.
+    """
+
+    def __init__(
+        self,
+        handler: BaseEventHandler,
+        policy: Optional[RetryPolicy] = None,
+        dead_letter_handler: Optional[BaseEventHandler] = None,
+    ) -> None:
+        """
+        :param handler: The handler events are handed over to.
+        :param policy: Retry policy. See `RetryPolicy` for the defaults.
+        :param dead_letter_handler: Handler receiving the events that cannot be handled, e.g. `FileDeadLetterHandler`, \
+            `OutboxHandler`, or any other handler. Such events are logged and dropped if omitted.
+        """
+        self._handler = handler
+        self._policy = policy or RetryPolicy()
+        self._dead_letter_handler = dead_letter_handler
+
+        # retries scheduled in the background, ordered by due time
+        self._scheduled: List[Tuple[float, int, int, List[Event]]] = []
+        self._sequence = itertools.count()
+        self._scheduler = BackgroundWorkers(self._run_scheduler, name="RetryHandler scheduler")
+        self._in_flight = 0
+
+        self.retried_count = 0
+        self.dead_lettered_count = 0
+
+    @property
+    def pending(self) -> int:
+        return sum(len(events) for _, _, _, events in self._scheduled) + self._in_flight
+
+    async def startup(self) -> None:
+        await asyncio.gather(*[handler.startup() for handler in (self._handler, self._dead_letter_handler) if handler])
+
+    async def shutdown(self) -> None:
+        # a retry in flight is completed first. If it fails again, it is dead-lettered with the other scheduled retries.
+        await self._scheduler.drain()
+
+        scheduled, self._scheduled = self._scheduled, []
+        for _, _, _, events in scheduled:
+            await self._dead_letter(events, reason="shutdown")
+
+        await asyncio.gather(*[handler.shutdown() for handler in (self._handler, self._dead_letter_handler) if handler])
+
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        events = list(events)
+        if events:
+            await self._attempt(events, attempt=1)
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+    async def _attempt(self, events: List[Event], attempt: int) -> None:
+        try:
+            await self._handler.handle_many(events=events)
+        except Exception as exc:
+            if not self._policy.is_retryable(exc, attempt=attempt):
+                logger.error("Failed to handle %d event(s) after %d attempt(s)", len(events), attempt, exc_info=exc)
+                await self._dead_letter(events, reason=repr(exc))
+                return
+
+            delay = self._policy.backoff(attempt)
+            logger.warning("Failed to handle %d event(s) (attempt %d of %d). Retrying in %.2fs...",
+                           len(events), attempt, self._policy.max_attempts, delay)
+            self._schedule(events, attempt=attempt + 1, delay=delay)
+
+    async def _dead_letter(self, events: List[Event], reason: str) -> None:
+        self.dead_lettered_count += len(events)
+        if self._dead_letter_handler is None:
+            logger.error("Dropping %d event(s) (%s). No dead-letter handler is configured.", len(events), reason)
+            return
+
+        try:
+            await self._dead_letter_handler.handle_many(events=events)
+        except Exception:
+            logger.exception("Dead-letter handler failed. %d event(s) dropped.", len(events))
+
+    def _schedule(self, events: List[Event], attempt: int, delay: float) -> None:
+        self._scheduler.ensure_started()
+        heapq.heappush(self._scheduled, (asyncio.get_running_loop().time() + delay, next(self._sequence), attempt, events))
+        self._scheduler.wake()
+
+    async def _run_scheduler(self) -> None:
+        loop = asyncio.get_running_loop()
+        while not self._scheduler.draining:
+            if not self._scheduled:
+                await self._scheduler.wait()
+                continue
+
+            due_at = self._scheduled[0][0]
+            if due_at > loop.time():
+                await self._scheduler.wait(timeout=due_at - loop.time())
+                continue
+
+            _, _, attempt, events = heapq.heappop(self._scheduled)
+            self.retried_count += len(events)
+            self._in_flight += len(events)
+            try:
+                await self._attempt(events, attempt=attempt)
+            finally:
+                self._in_flight -= len(events)
+
+
+def _json_record(event: Event) -> str:
+    event_name, payload = event
+    if isinstance(event_name, Enum):
+        event_name = event_name.value
+    return json.dumps({"event_name": event_name, "payload": payload}, default=str)
+
+
+class FileDeadLetterHandler(BaseEventHandler):
+    """
+    Appends events to a local file, one JSON record per line, e.g. as the dead-letter handler of `RetryHandler`.
+    The file can be replayed with `fastapi-events-loadgen --replay <path>`.
+    """
+
+    def __init__(self, path: str, serializer: Optional[Callable[[Event], str]] = None) -> None:
+        """
+        :param path: Path of the file.
+        :param serializer: Serializes an event into a single line. Defaults to a JSON record \
+            with `event_name` and `payload`.
+        """
+        self._path = path
+        self._serializer = serializer or _json_record
+        # appends are run in a single thread, so that they are not interleaved
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fastapi-events-dead-letter")
+
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        lines = "".join(self._serializer(event) + "\n" for event in events)
+        if not lines:
+            return
+
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._append, lines)
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+    def _append(self, lines: str) -> None:
+        with open(self._path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
@@ -0,0 +1,194 @@
+import asyncio
+import fnmatch
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.predicates import PredicateIndex, compile_where
+from fastapi_events.typing import Event
+
+logger = logging.getLogger(__name__)
+
+ROUTES_CACHE_SIZE = 1024  # maximum number of event names whose routes are cached
+
+# events routed to each handler, with the routes they were routed through
+_Batches = Dict[int, Tuple[BaseEventHandler, List[Event], List["Route"]]]
+
+
+class Route:
+    """
+    A route of `RouterHandler`, handing over the events matching it to `handler`
+    """
+
+    def __init__(
+        self,
+        handler: BaseEventHandler,
+        event_name: str = "*",
+        where: Optional[Dict[str, Any]] = None,
+        predicate: Optional[Callable[[Event], bool]] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        """
+        :param handler: The handler events are handed over to, e.g. `SQSForwardHandler`.
+        :param event_name: Unix shell-style pattern of the event names routed, e.g. `order_*`.
+        :param where: Conditions on the payload, e.g. `{"visibility": "public"}`. See `LocalHandler.register()`.
+        :param predicate: Called with the events matching `event_name` and `where`, to route them or not.
+        :param name: Name of the route in `RouterHandler.stats`. Defaults to `event_name`.
+        """
+        if predicate is not None and not callable(predicate):
+            raise ConfigurationError("predicate must be of type Callable")
+
+        self.handler = handler
+        self.event_name = str(event_name)
+        self.conditions = compile_where(where)
+        self.predicate = predicate
+        self.name = name or self.event_name
+
+
+class RouteStats:
+    """
+    Metrics of a route, see `RouterHandler.stats`
+    """
+    __slots__ = ("routed", "failed")
+
+    def __init__(self) -> None:
+        self.routed = 0
+        self.failed = 0
+
+    def __repr__(self) -> str:
+        return "RouteStats(" + ", ".join(f"{name}={getattr(self, name)}" for name in self.__slots__) + ")"
+
+
+class RouterHandler(BaseEventHandler):
+    """
+    Router Handler
+    - hands over each event to the handlers of the routes it matches, on its name, its payload, and a predicate
+    - so forwarding handlers only serialize and send the events their consumers need
+    - routes are compiled into an index per event name, see `fastapi_events.predicates.PredicateIndex`
+    - events are handed over in batches, one per handler, concurrently
+    - metrics are kept per route in `stats`
+    """
+
+    def __init__(
+        self,
+        routes: List[Route],
+        default_handler: Optional[BaseEventHandler] = None,
+        first_match: bool = False,
+    ) -> None:
+        """
+        :param routes: Routes, in order of precedence.
+        :param default_handler: Handler receiving the events matching no route. Such events are dropped if omitted.
+        :param first_match: Route events to the first route they match only, instead of all of them.
+        """
+        names = [route.name for route in routes]
+        if len(set(names)) != len(names):
+            raise ConfigurationError("Route names must be unique. Set the name of routes sharing an event_name.")
+
+        self._routes = routes
+        self._default_handler = default_handler
+        self._first_match = first_match
+        self._routes_cache: Dict[str, PredicateIndex[Route]] = {}
+
+        self.stats: Dict[str, RouteStats] = {route.name: RouteStats() for route in routes}
+        self.unrouted_count = 0
+
+    @property
+    def handlers(self) -> List[BaseEventHandler]:
+        handlers = [route.handler for route in self._routes]
+        if self._default_handler is not None:
+            handlers.append(self._default_handler)
+        return list({id(handler): handler for handler in handlers}.values())
+
+    async def startup(self) -> None:
+        await asyncio.gather(*[handler.startup() for handler in self.handlers])
+
+    async def shutdown(self) -> None:
+        await asyncio.gather(*[handler.shutdown() for handler in self.handlers])
+
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        batches: _Batches = {}
+
+        for event in events:
+            routes = self._match(event)
+            if not routes:
+                self.unrouted_count += 1
+                if self._default_handler is not None:
+                    self._add(batches, self._default_handler, event, route=None)
+                continue
+
+            handled_by = set()
+            for route in routes:
+                self.stats[route.name].routed += 1
+                # an event matching several routes to the same handler is only handed over once,
+                # but counted as failed on each of them if the handler fails
+                if id(route.handler) in handled_by:
+                    batches[id(route.handler)][2].append(route)
+                    continue
+
+                handled_by.add(id(route.handler))
+                self._add(batches, route.handler, event, route=route)
+
+        if not batches:
+            return
+
+        results = await asyncio.gather(*[handler.handle_many(events=handler_events)
+                                         for handler, handler_events, _ in batches.values()],
+                                       return_exceptions=True)
+
+        exc: Optional[BaseException] = None
+        for (handler, handler_events, routes), result in zip(batches.values(), results):
+            if not isinstance(result, BaseException):
+                continue
+
+            logger.error("Failed to hand over %d event(s) to %s", len(handler_events), type(handler).__name__,
+                         exc_info=result)
+            for route in routes:
+                self.stats[route.name].failed += 1
+            exc = exc or result
+
+        if exc is not None:
+            raise exc
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+    @staticmethod
+    def _add(batches: _Batches, handler: BaseEventHandler, event: Event, route: Optional[Route]) -> None:
+        batch = batches.get(id(handler))
+        if batch is None:
+            batch = batches[id(handler)] = (handler, [], [])
+        batch[1].append(event)
+        if route is not None:
+            batch[2].append(route)
+
+    def _match(self, event: Event) -> List[Route]:
+        event_name, payload = event
+        routes = []
+        for route in self._get_route_index(event_name).match(payload):
+            if route.predicate is not None and not route.predicate(event):
+                continue
+
+            routes.append(route)
+            if self._first_match:
+                break
+
+        return routes
+
+    def _get_route_index(self, event_name) -> PredicateIndex[Route]:
+        if not isinstance(event_name, str):
+            event_name = str(event_name)
+
+        index = self._routes_cache.get(event_name)
+        if index is not None:
+            return index
+
+        index = PredicateIndex()
+        for route in self._routes:
+            if fnmatch.fnmatch(event_name, route.event_name):
+                index.add(route, route.conditions)
+
+        if len(self._routes_cache) >= ROUTES_CACHE_SIZE:
+            self._routes_cache.clear()
+        self._routes_cache[event_name] = index
+        return index
@@ -0,0 +1,209 @@
+import asyncio
+import fnmatch
+import hashlib
+import logging
+import random
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.priority import PrioritizedEvent
+from fastapi_events.typing import Event, EventName
+from fastapi_events.workers import BackgroundWorkers
+
+logger = logging.getLogger(__name__)
+
+RATES_CACHE_SIZE = 1024  # maximum number of event names whose sampling rate is cached
+
+_HASH_RANGE = float(2 ** 64)
+
+
+def _keyed_fraction(key: Any) -> float:
+    """
+    Map a key to [0, 1), consistently across processes, unlike `hash()`
+    """
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / _HASH_RANGE
+
+
+class _Reservoir:
+    """
+    A uniform sample of at most `size` of the events seen in a window (Algorithm R)
+    """
+    __slots__ = ("events", "seen", "rate")
+
+    def __init__(self, rate: float) -> None:
+        self.events: List[Event] = []
+        self.seen = 0
+        self.rate = rate  # rate at which events were sampled before entering the reservoir
+
+    def add(self, event: Event, size: int) -> None:
+        self.seen += 1
+        if len(self.events) < size:
+            self.events.append(event)
+            return
+
+        idx = random.randrange(self.seen)
+        if idx < size:
+            self.events[idx] = event
+
+
+class SamplingHandler(BaseEventHandler):
+    """
+    Sampling Handler
+    - hands over a sample of the events to the wrapped handler, e.g. for high-volume telemetry events
+    - events are kept with the probability `rate`, or the rate of the first pattern in `rates` matching their name
+    - with `key`, sampling is deterministic: an event is kept if the hash of its key falls within the rate,
+      so the events of e.g. a user are either all kept or all dropped, in every process
+    - with `reservoir_size`, at most `reservoir_size` of the events kept are handed over per event name and `window`,
+      as a uniform sample handed over at the end of each window
+    - the rate at which an event was kept is attached to dict payloads as `rate_field`, so consumers can re-weight
+
+    Events of a rate of 1 are handed over as is, right away.
+    """
+
+    def __init__(
+        self,
+        handler: BaseEventHandler,
+        rate: float = 1.0,
+        rates: Optional[Dict[str, float]] = None,
+        key: Optional[Callable[[Event], Any]] = None,
+        reservoir_size: Optional[int] = None,
+        window: float = 1.0,
+        rate_field: Optional[str] = "sample_rate",
+    ) -> None:
+        """
+        :param handler: The handler the sample is handed over to.
+        :param rate: Fraction of the events kept, between 0 and 1.
+        :param rates: Rates keyed by Unix shell-style event name patterns, e.g. `{"page_viewed": 0.01}`. \
+            Events not matching any pattern are sampled at `rate`.
+        :param key: Extracts the sampling key of an event, e.g. `lambda event: event[1]["user_id"]`.
+        :param reservoir_size: Maximum number of events handed over per event name and window.
+        :param window: Duration of a reservoir window, in seconds.
+        :param rate_field: Payload field the sampling rate is attached to. Set to `None` to leave payloads as is.
+        """
+        if any(not 0 <= value <= 1 for value in (rate, *(rates or {}).values())):
+            raise ConfigurationError("Sampling rates must be between 0 and 1")
+        if key is not None and not callable(key):
+            raise ConfigurationError("key must be of type Callable")
+        if reservoir_size is not None and reservoir_size < 1:
+            raise ConfigurationError("reservoir_size must be at least 1")
+        if window <= 0:
+            raise ConfigurationError("window must be greater than 0")
+
+        self._handler = handler
+        self._rate = rate
+        self._rates = rates or {}
+        self._key = key
+        self._reservoir_size = reservoir_size
+        self._window = window
+        self._rate_field = rate_field
+        self._rate_cache: Dict[EventName, float] = {}
+
+        self._reservoirs: Dict[EventName, _Reservoir] = {}
+        self._window_ends_at = 0.0
+        self._flusher = BackgroundWorkers(self._run_flusher, name="SamplingHandler flusher")
+
+        self.seen_count = 0
+        self.dropped_count = 0
+
+    async def startup(self) -> None:
+        await self._handler.startup()
+
+    async def shutdown(self) -> None:
+        # the current window is cut short, and its sample handed over
+        await self._flusher.drain()
+        await self._flush()
+        await self._handler.shutdown()
+
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        kept: List[Event] = []
+        for event in events:
+            self.seen_count += 1
+            rate = self.get_rate(event[0])
+            if rate < 1 and not self._sample(event, rate):
+                self.dropped_count += 1
+                continue
+
+            if self._reservoir_size is None:
+                kept.append(self._with_rate(event, rate))
+            else:
+                self._add_to_reservoir(event, rate)
+
+        if kept:
+            await self._handler.handle_many(events=kept)
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+    def get_rate(self, event_name: EventName) -> float:
+        rate = self._rate_cache.get(event_name)
+        if rate is None:
+            name = event_name if isinstance(event_name, str) else str(event_name)
+            rate = next((rate for pattern, rate in self._rates.items() if fnmatch.fnmatch(name, pattern)), self._rate)
+
+            if len(self._rate_cache) >= RATES_CACHE_SIZE:
+                self._rate_cache.clear()
+            self._rate_cache[event_name] = rate
+
+        return rate
+
+    def _sample(self, event: Event, rate: float) -> bool:
+        if self._key is None:
+            return random.random() < rate
+        return _keyed_fraction(self._key(event)) < rate
+
+    def _with_rate(self, event: Event, rate: float) -> Event:
+        event_name, payload = event
+        if self._rate_field is None or rate >= 1 or not isinstance(payload, dict):
+            return event
+
+        # payloads are shared with the other handlers, so they are copied rather than updated
+        payload = {**payload, self._rate_field: rate}
+        if isinstance(event, PrioritizedEvent):
+            return PrioritizedEvent(event_name, payload, priority=event.priority)
+        return event_name, payload
+
+    def _add_to_reservoir(self, event: Event, rate: float) -> None:
+        if not self._reservoirs:
+            self._flusher.ensure_started()
+            self._window_ends_at = asyncio.get_running_loop().time() + self._window
+            self._flusher.wake()
+
+        reservoir = self._reservoirs.get(event[0])
+        if reservoir is None:
+            reservoir = self._reservoirs[event[0]] = _Reservoir(rate=rate)
+        reservoir.add(event, size=self._reservoir_size)  # type: ignore[arg-type]
+
+    async def _flush(self) -> None:
+        reservoirs, self._reservoirs = self._reservoirs, {}
+        sample: List[Tuple[Event, float]] = []
+        for reservoir in reservoirs.values():
+            self.dropped_count += reservoir.seen - len(reservoir.events)
+            # the rate of the events handed over accounts for both sampling steps
+            rate = reservoir.rate * len(reservoir.events) / reservoir.seen
+            sample.extend((event, rate) for event in reservoir.events)
+
+        if not sample:
+            return
+
+        try:
+            await self._handler.handle_many(events=[self._with_rate(event, rate) for event, rate in sample])
+        except Exception:
+            logger.exception("Failed to hand over a sample of %d event(s)", len(sample))
+
+    async def _run_flusher(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._reservoirs:
+                if self._flusher.draining:
+                    return
+
+                await self._flusher.wait()
+                continue
+
+            if not self._flusher.draining and self._window_ends_at > loop.time():
+                await self._flusher.wait(timeout=self._window_ends_at - loop.time())
+                continue
+
+            await self._flush()
@@ -0,0 +1,441 @@
+"""
+Load generator for fastapi-events
+
+Generates synthetic events, or replays events from a JSONL file, and pushes them through `dispatch()`
+into a configured set of handlers at a target rate (or as fast as possible). Reports achieved throughput,
+latency percentiles and memory usage.
+
+Usage:
+    fastapi-events-loadgen --handler fastapi_events.handlers.null:NullHandler --events 10000 --rate 2000
+    python -m fastapi_events.loadgen --replay events.jsonl --mode task --json
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import sys
+import time
+import tracemalloc
+from contextvars import ContextVar
+from typing import (Any, Dict, Iterable, Iterator, List, NamedTuple, Optional,
+                    Sequence)
+
+from fastapi_events.dispatcher import dispatch
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.middleware import EventHandlerASGIMiddleware
+from fastapi_events.typing import Event, Message, Receive, Scope, Send
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore[assignment]
+
+MODES = ("request", "task")
+SCOPE_EVENTS_KEY = "fastapi_events.loadgen.events"
+
+# _pending_event is inherited by the task scheduled by dispatch() outside of a request-response cycle
+_pending_event: ContextVar = ContextVar("fastapi_events_loadgen_pending_event", default=None)
+
+
+class LoadReport(NamedTuple):
+    mode: str
+    events: int
+    errors: int
+    duration: float
+    throughput: float
+    latency: Dict[str, float]
+    peak_traced_memory: Optional[int]
+    max_rss: Optional[int]
+
+
+class _PendingEvent:
+    __slots__ = ("dispatched_at", "remaining")
+
+    def __init__(self, dispatched_at: float, remaining: int) -> None:
+        self.dispatched_at = dispatched_at
+        self.remaining = remaining
+
+
+class _Recorder:
+    """
+    Collects latency samples and keeps track of in-flight events
+    """
+
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def start(self, count: int = 1) -> None:
+        self.in_flight += count
+        self._idle.clear()
+
+    def finish(self, started_at: float, count: int = 1) -> None:
+        latency = time.perf_counter() - started_at
+        self.latencies.extend([latency] * count)
+        self.in_flight -= count
+        if self.in_flight <= 0:
+            self._idle.set()
+
+    async def wait_idle(self) -> None:
+        await self._idle.wait()
+
+
+class _TimedHandler(BaseEventHandler):
+    """
+    Wraps a handler to record the latency of events dispatched outside of a request-response cycle
+    """
+
+    def __init__(self, handler: BaseEventHandler, recorder: _Recorder) -> None:
+        self._handler = handler
+        self._recorder = recorder
+
+    async def handle(self, event: Event) -> None:
+        try:
+            await self._handler.handle(event)
+        except Exception:
+            self._recorder.errors += 1
+
+        pending: Optional[_PendingEvent] = _pending_event.get()
+        if pending is not None:
+            pending.remaining -= 1
+            if pending.remaining == 0:
+                self._recorder.finish(started_at=pending.dispatched_at)
+
+
+class _ErrorCountingHandler(BaseEventHandler):
+    """
+    Wraps a handler to count the events it fails to handle within requests, as the middleware isolates
+    (and only logs) handler failures
+    """
+
+    def __init__(self, handler: BaseEventHandler, recorder: _Recorder) -> None:
+        self._handler = handler
+        self._recorder = recorder
+
+    async def handle_many(self, events: Iterable[Event]) -> None:
+        events = list(events)
+        try:
+            await self._handler.handle_many(events=events)
+        except Exception:
+            self._recorder.errors += len(events)
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+
+def _import_object(path: str) -> Any:
+    module_name, _, attr = path.partition(":")
+    module = importlib.import_module(module_name)
+    if not attr:
+        return module
+
+    obj: Any = module
+    for part in attr.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def load_handler(path: str) -> BaseEventHandler:
+    """
+    Load a handler from an import path like `package.module:attribute`.
+    The attribute can be a handler instance, a handler class or a factory function.
+    """
+    obj = _import_object(path)
+    if not isinstance(obj, BaseEventHandler) and callable(obj):
+        obj = obj()
+
+    if not isinstance(obj, BaseEventHandler):
+        raise ConfigurationError(f"{path} is not an instance of BaseEventHandler")
+
+    return obj
+
+
+def generate_events(count: int, event_name: str = "loadgen_event", payload_size: int = 64) -> Iterator[Event]:
+    for idx in range(count):
+        yield event_name, {"id": idx, "data": "x" * payload_size}
+
+
+def read_events(path: str, limit: Optional[int] = None) -> Iterator[Event]:
+    """
+    Read events from a JSONL file. Each line is either `["event name", {...}]`, which is the format
+    produced by the built-in forwarding handlers, or `{"event_name": "...", "payload": {...}}`.
+    """
+    with open(path, "r") as f:
+        count = 0
+        for line in f:
+            if limit is not None and count >= limit:
+                return
+
+            line = line.strip()
+            if not line:
+                continue
+
+            record = json.loads(line)
+            if isinstance(record, dict):
+                yield record["event_name"], record.get("payload")
+            else:
+                event_name, payload = record
+                yield event_name, payload
+            count += 1
+
+
+def _percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+
+    ordered = sorted(samples)
+
+    def _nearest_rank(percentile: float) -> float:
+        rank = max(int(round(percentile / 100 * len(ordered))) - 1, 0)
+        return ordered[min(rank, len(ordered) - 1)]
+
+    return {"p50": _nearest_rank(50),
+            "p90": _nearest_rank(90),
+            "p99": _nearest_rank(99),
+            "max": ordered[-1]}
+
+
+def _get_max_rss() -> Optional[int]:
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS, and in kilobytes elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+async def _dispatching_app(scope: Scope, receive: Receive, send: Send) -> None:
+    """
+    A minimal ASGI app dispatching the events attached to the scope
+    """
+    for event_name, payload in scope[SCOPE_EVENTS_KEY]:
+        dispatch(event_name, payload=payload)
+
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _receive() -> Message:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message: Message) -> None:
+    pass
+
+
+async def _pace(started_at: float, sent: int, rate: Optional[float]) -> None:
+    if not rate:
+        return
+
+    delay = started_at + sent / rate - time.perf_counter()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def _run_requests(
+    events: Iterable[Event],
+    handlers: List[BaseEventHandler],
+    recorder: _Recorder,
+    rate: Optional[float],
+    events_per_request: int,
+    concurrency: int,
+) -> int:
+    counting_handlers = [_ErrorCountingHandler(handler=handler, recorder=recorder) for handler in handlers]
+    middleware = EventHandlerASGIMiddleware(app=_dispatching_app, handlers=counting_handlers)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _request(batch: List[Event]) -> None:
+        scope: Scope = {"type": "http", "method": "POST", "path": "/", SCOPE_EVENTS_KEY: batch}
+        started_at = time.perf_counter()
+        try:
+            await middleware(scope, _receive, _send)
+        except Exception:
+            recorder.errors += len(batch)
+        finally:
+            recorder.finish(started_at=started_at, count=len(batch))
+            semaphore.release()
+
+    sent, started_at, batch = 0, time.perf_counter(), []
+    for event in events:
+        batch.append(event)
+        if len(batch) < events_per_request:
+            continue
+
+        await _pace(started_at, sent, rate)
+        await semaphore.acquire()
+        recorder.start(count=len(batch))
+        asyncio.create_task(_request(batch))
+        sent, batch = sent + len(batch), []
+
+    if batch:
+        await _pace(started_at, sent, rate)
+        await semaphore.acquire()
+        recorder.start(count=len(batch))
+        asyncio.create_task(_request(batch))
+        sent += len(batch)
+
+    await recorder.wait_idle()
+    return sent
+
+
+async def _run_tasks(
+    events: Iterable[Event],
+    handlers: List[BaseEventHandler],
+    recorder: _Recorder,
+    rate: Optional[float],
+) -> int:
+    timed_handlers = [_TimedHandler(handler=handler, recorder=recorder) for handler in handlers]
+    middleware = EventHandlerASGIMiddleware(app=_dispatching_app, handlers=timed_handlers)
+    middleware_id = id(middleware)
+
+    sent, started_at = 0, time.perf_counter()
+    for event_name, payload in events:
+        await _pace(started_at, sent, rate)
+
+        recorder.start()
+        token = _pending_event.set(_PendingEvent(dispatched_at=time.perf_counter(), remaining=len(handlers)))
+        try:
+            dispatch(event_name, payload=payload, middleware_id=middleware_id)
+        finally:
+            _pending_event.reset(token)
+        sent += 1
+
+        # let the scheduled tasks run when dispatching as fast as possible
+        if not rate:
+            await asyncio.sleep(0)
+
+    await recorder.wait_idle()
+    return sent
+
+
+async def run(
+    events: Iterable[Event],
+    handlers: List[BaseEventHandler],
+    rate: Optional[float] = None,
+    mode: str = "request",
+    events_per_request: int = 1,
+    concurrency: int = 100,
+    trace_memory: bool = False,
+) -> LoadReport:
+    """
+    Push events through `dispatch()` into `handlers` and measure the outcome.
+
+    :param rate: Target rate in events per second. Events are dispatched as fast as possible if omitted.
+    :param mode: `request` dispatches events within requests processed by `EventHandlerASGIMiddleware`. \
+        `task` dispatches events outside of a request-response cycle.
+    :param events_per_request: Number of events dispatched per request in `request` mode.
+    :param concurrency: Maximum number of in-flight requests in `request` mode.
+    :param trace_memory: Report peak memory allocated by Python with `tracemalloc`. This slows down the run.
+    """
+    if mode not in MODES:
+        raise ConfigurationError(f"mode must be one of {MODES}")
+
+    if not handlers:
+        raise ConfigurationError("At least one handler is required")
+
+    if trace_memory:
+        tracemalloc.start()
+
+    recorder = _Recorder()
+    started_at = time.perf_counter()
+    if mode == "request":
+        sent = await _run_requests(events=events,
+                                   handlers=handlers,
+                                   recorder=recorder,
+                                   rate=rate,
+                                   events_per_request=max(events_per_request, 1),
+                                   concurrency=max(concurrency, 1))
+    else:
+        sent = await _run_tasks(events=events, handlers=handlers, recorder=recorder, rate=rate)
+    duration = time.perf_counter() - started_at
+
+    peak_traced_memory = None
+    if trace_memory:
+        _, peak_traced_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return LoadReport(mode=mode,
+                      events=sent,
+                      errors=recorder.errors,
+                      duration=duration,
+                      throughput=sent / duration if duration else 0.0,
+                      latency=_percentiles(recorder.latencies),
+                      peak_traced_memory=peak_traced_memory,
+                      max_rss=_get_max_rss())
+
+
+def format_report(report: LoadReport) -> str:
+    def _mib(value: Optional[int]) -> str:
+        return "n/a" if value is None else f"{value / 1024 / 1024:.1f} MiB"
+
+    latency = " ".join(f"{name}={value * 1000:.3f}ms" for name, value in report.latency.items()) or "n/a"
+    return "\n".join((
+        f"mode:        {report.mode}",
+        f"events:      {report.events} ({report.errors} errors)",
+        f"duration:    {report.duration:.3f}s",
+        f"throughput:  {report.throughput:.1f} events/s",
+        f"latency:     {latency}",
+        f"memory:      peak traced={_mib(report.peak_traced_memory)} max rss={_mib(report.max_rss)}",
+    ))
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="fastapi-events-loadgen",
+                                     description="Generate or replay events through dispatch() and "
+                                                 "report throughput, latency and memory usage.")
+    parser.add_argument("--handler", dest="handlers", action="append", default=[], metavar="IMPORT_PATH",
+                        help="handler to push events into, e.g. `fastapi_events.handlers.local:local_handler`. "
+                             "Can be repeated. Defaults to NullHandler.")
+    parser.add_argument("--import", dest="imports", action="append", default=[], metavar="MODULE",
+                        help="module to import before the run, e.g. to register local handlers or payload schemas. "
+                             "Can be repeated.")
+    parser.add_argument("--replay", metavar="FILE", help="replay events from a JSONL file")
+    parser.add_argument("--events", type=int, default=None,
+                        help="number of events to generate (default: 10000), or to replay (default: all)")
+    parser.add_argument("--event-name", default="loadgen_event", help="name of generated events")
+    parser.add_argument("--payload-size", type=int, default=64, help="size of generated payloads in bytes")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="target rate in events per second (default: as fast as possible)")
+    parser.add_argument("--mode", choices=MODES, default="request",
+                        help="`request`: dispatch within requests through EventHandlerASGIMiddleware; "
+                             "`task`: dispatch outside of a request-response cycle")
+    parser.add_argument("--events-per-request", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=100, help="maximum in-flight requests")
+    parser.add_argument("--trace-memory", action="store_true", help="report peak memory traced by tracemalloc")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = _build_parser().parse_args(argv)
+
+    for module in args.imports:
+        importlib.import_module(module)
+
+    handlers = [load_handler(path) for path in args.handlers or ["fastapi_events.handlers.null:NullHandler"]]
+
+    if args.replay:
+        events: Iterable[Event] = read_events(args.replay, limit=args.events)
+    else:
+        events = generate_events(count=10000 if args.events is None else args.events,
+                                 event_name=args.event_name,
+                                 payload_size=args.payload_size)
+
+    report = asyncio.run(run(events=events,
+                             handlers=handlers,
+                             rate=args.rate,
+                             mode=args.mode,
+                             events_per_request=args.events_per_request,
+                             concurrency=args.concurrency,
+                             trace_memory=args.trace_memory))
+
+    print(json.dumps(report._asdict()) if args.json else format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,76 +1,409 @@
 import asyncio
-import contextlib
+import fnmatch
+import functools
 import logging
+import re
+import weakref
 from collections import deque
 from contextvars import Token
-from typing import Deque, Iterable, Iterator, Optional
+from typing import Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple
 
-from fastapi_events import (event_store, handler_store, in_req_res_cycle,
-                            middleware_identifier)
+from fastapi_events import (batcher_store, event_context, handler_store,
+                            timer_store)
+from fastapi_events.batching import MicroBatcher
+from fastapi_events.coalescing import Coalescer, CoalescingPolicy
+from fastapi_events.commit import CommitAction, CommitPolicy, always_process
+from fastapi_events.context import EventContext
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.fairness import FairScheduler
+from fastapi_events.flushing import EventFlusher
 from fastapi_events.handlers.base import BaseEventHandler
-from fastapi_events.typing import ASGIApp, Event, Receive, Scope, Send
+from fastapi_events.profiling import HandlerProfiler, profile_handler
+from fastapi_events.timers import DelayedDispatcher
+from fastapi_events.typing import (ASGIApp, Event, EventName, Message, Receive,
+                                   Scope, Send)
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SCOPE_TYPES = ("http", "websocket")
+EARLY_FLUSH_MESSAGE_TYPES = ("http.response.start", "http.response.body")
+
+ScopeMatcher = Callable[[Scope], bool]
+
+
+def _compile_path_patterns(patterns: Optional[Iterable[str]]) -> Optional[Callable]:
+    """
+    Compile Unix shell-style path patterns (`fnmatch`) into a single regex
+    """
+    if not patterns:
+        return None
+
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns)).match
+
+
+def _compile_scope_matcher(
+    include_paths: Optional[Iterable[str]] = None,
+    exclude_paths: Optional[Iterable[str]] = None,
+    include_methods: Optional[Iterable[str]] = None,
+    exclude_methods: Optional[Iterable[str]] = None,
+) -> Optional[ScopeMatcher]:
+    """
+    Compile the include/exclude rules once into a matcher deciding whether a scope is handled by the middleware.
+    Returns None when no rules are given, so that the matcher can be skipped entirely.
+    """
+    match_included_path = _compile_path_patterns(include_paths)
+    match_excluded_path = _compile_path_patterns(exclude_paths)
+    included_methods = frozenset(method.upper() for method in include_methods) if include_methods else None
+    excluded_methods = frozenset(method.upper() for method in exclude_methods) if exclude_methods else frozenset()
+
+    if not any((match_included_path, match_excluded_path, included_methods, excluded_methods)):
+        return None
+
+    def _matcher(scope: Scope) -> bool:
+        path = scope.get("path", "")
+        if match_excluded_path and match_excluded_path(path):
+            return False
+
+        if match_included_path and not match_included_path(path):
+            return False
+
+        method = scope.get("method")
+        if method is None:  # websocket scopes have no method
+            return True
+
+        if method in excluded_methods:
+            return False
+
+        return included_methods is None or method in included_methods
+
+    return _matcher
+
 
 class EventHandlerASGIMiddleware:
-    def __init__(self, app: ASGIApp, handlers: Iterable[BaseEventHandler], middleware_id: Optional[int] = None) -> None:
+    def __init__(
+        self,
+        app: ASGIApp,
+        handlers: Iterable[BaseEventHandler],
+        middleware_id: Optional[int] = None,
+        profiler: Optional[HandlerProfiler] = None,
+        include_paths: Optional[Iterable[str]] = None,
+        exclude_paths: Optional[Iterable[str]] = None,
+        include_methods: Optional[Iterable[str]] = None,
+        exclude_methods: Optional[Iterable[str]] = None,
+        scope_types: Iterable[str] = DEFAULT_SCOPE_TYPES,
+        flush_threshold: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        flush_on_message: bool = False,
+        early_flush_on: Optional[str] = None,
+        commit_policy: Optional[CommitPolicy] = None,
+        commit_policies: Optional[Dict[str, CommitPolicy]] = None,
+        divert_handlers: Optional[Iterable[BaseEventHandler]] = None,
+        coalescing_policies: Optional[Dict[str, CoalescingPolicy]] = None,
+        batch_window: Optional[float] = None,
+        fair_scheduler: Optional[FairScheduler] = None,
+        timer_tick: float = 0.1,
+        delayed_events_path: Optional[str] = None,
+        delayed_events_serializer: Optional[Callable[[Event], bytes]] = None,
+        delayed_events_deserializer: Optional[Callable[[bytes], Event]] = None,
+    ) -> None:
+        """
+        :param include_paths: Unix shell-style path patterns (`fnmatch`) to be handled by the middleware. \
+            All paths are handled if omitted.
+        :param exclude_paths: Path patterns to be skipped by the middleware, e.g. `["/health", "/static/*"]`.
+        :param include_methods: HTTP methods to be handled by the middleware. All methods are handled if omitted.
+        :param exclude_methods: HTTP methods to be skipped by the middleware.
+        :param scope_types: ASGI scope types to be handled by the middleware.
+
+        Events dispatched from skipped requests are handled as if they were dispatched outside
+        of a request-response cycle.
+
+        By default, events are processed once the app returns. For WebSockets and long streaming responses,
+        events can be processed incrementally while the connection is still open:
+
+        :param flush_threshold: Process queued events once this many are queued. The app is held back at \
+            the next ASGI message boundary until they are processed, which bounds memory per connection.
+        :param flush_interval: Process queued events every `flush_interval` seconds.
+        :param flush_on_message: Process queued events at every ASGI message boundary (`receive()` and `send()`).
+        :param early_flush_on: Start processing queued events once the response has started to go out, i.e. \
+            once a message of this type is sent: `http.response.start` or `http.response.body` (the first \
+            body chunk). Events dispatched later are processed as further chunks are sent. Useful for \
+            `StreamingResponse`.
+
+        By default, events are processed regardless of the response status. For HTTP requests, the response status \
+        can decide whether events are processed, dropped or diverted:
+
+        :param commit_policy: A policy applied to all events, e.g. `commit_on_success()` (see `fastapi_events.commit`).
+        :param commit_policies: Policies for specific events, keyed by Unix shell-style event name patterns \
+            (`fnmatch`). They take precedence over `commit_policy`.
+        :param divert_handlers: Handlers receiving the events diverted by the policies, e.g. a local spool.
+
+        With a commit policy, incrementally flushed events are held back until the response has started.
+
+        :param coalescing_policies: Coalesce events of the same name sharing a key into a single event before \
+            they are processed, keyed by Unix shell-style event name patterns (`fnmatch`). \
+            See `fastapi_events.coalescing.CoalescingPolicy`.
+        :param batch_window: Collect events dispatched outside of a request-response cycle for `batch_window` \
+            seconds, and process them as a single batch (coalesced too), instead of scheduling a task per event.
+        :param fair_scheduler: Schedule events fairly across tenants before they are handed over to the handlers. \
+            See `fastapi_events.fairness.FairScheduler`.
+
+        Events dispatched with `dispatch(..., delay=...)` or `dispatch(..., at=...)` are held in a timer wheel \
+        until they are due (see `fastapi_events.timers.DelayedDispatcher`):
+
+        :param timer_tick: Resolution of the timer wheel, in seconds.
+        :param delayed_events_path: Path the events not yet due are saved to on shutdown, and restored from \
+            on startup. They are discarded on shutdown if omitted. It can be shared by several processes, \
+            each of them saving a file of its own.
+        :param delayed_events_serializer: Serializes a delayed event into bytes. `pickle` is used by default.
+        :param delayed_events_deserializer: Deserializes bytes back into a delayed event.
+        """
+        if early_flush_on is not None and early_flush_on not in EARLY_FLUSH_MESSAGE_TYPES:
+            raise ConfigurationError(f"early_flush_on must be one of {EARLY_FLUSH_MESSAGE_TYPES}")
+
         self.app = app
         self._id = id(self) if middleware_id is None else middleware_id
+        self._profiler = profiler
+        self._scope_types = frozenset(scope_types)
+        self._scope_matcher = _compile_scope_matcher(include_paths=include_paths,
+                                                     exclude_paths=exclude_paths,
+                                                     include_methods=include_methods,
+                                                     exclude_methods=exclude_methods)
+        self._flush_threshold = flush_threshold
+        self._flush_interval = flush_interval
+        self._flush_on_message = flush_on_message
+        self._early_flush_on = early_flush_on
+        self._is_incremental = any((flush_threshold, flush_interval, flush_on_message, early_flush_on))
+        self._commit_policy = commit_policy or always_process
+        self._commit_policies = commit_policies or {}
+        self._is_committing = bool(commit_policy or commit_policies)
+        self._divert_handlers = list(divert_handlers or [])
+        self._coalescer = Coalescer(policies=coalescing_policies) if coalescing_policies else None
+        self._batch_window = batch_window
+        self._fair_scheduler = fair_scheduler
+        self._timer_tick = timer_tick
+        self._delayed_events_path = delayed_events_path
+        self._delayed_events_serializer = delayed_events_serializer
+        self._delayed_events_deserializer = delayed_events_deserializer
+        if fair_scheduler is not None:
+            fair_scheduler.bind(process=self._get_processor(self._handle_events))
+        # shared by all skipped requests, so that dispatch() falls back to the out-of-request path
+        self._out_of_scope_ctx = EventContext(middleware_id=self._id, in_req_res_cycle=False)
         self.register_handlers(handlers=handlers)
 
     def __del__(self):
         """
         Removing handlers after middleware is necessary when `self._id` == `id(self)`
         """
-        if self._id == id(self):
+        if getattr(self, "_id", None) == id(self):  # not set if __init__ raised
             self.deregister_handlers()
 
     def register_handlers(self, handlers: Iterable[BaseEventHandler]) -> None:
         handler_store[self._id] = handlers
+        if self._batch_window is not None:
+            batcher_store[self._id] = MicroBatcher(process=self._get_processor(self._coalesce_and_process),
+                                                   window=self._batch_window)
+        timer_store[self._id] = DelayedDispatcher(process=self._get_processor(self._coalesce_and_process),
+                                                  tick=self._timer_tick,
+                                                  path=self._delayed_events_path,
+                                                  serializer=self._delayed_events_serializer,
+                                                  deserializer=self._delayed_events_deserializer)
 
     def deregister_handlers(self) -> None:
         del handler_store[self._id]
+        batcher_store.pop(self._id, None)
+        timer_store.pop(self._id, None)
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
-        if scope["type"] not in ["http", "websocket"]:
+        if scope["type"] == "lifespan":
+            await self.app(scope, *self._wrap_lifespan(receive, send))
+            return
+
+        if scope["type"] not in self._scope_types:
             await self.app(scope, receive, send)
             return
 
-        with self.event_store_ctx():
+        if self._scope_matcher is not None and not self._scope_matcher(scope):
+            token_out_of_scope: Token = event_context.set(self._out_of_scope_ctx)
             try:
-                with self.res_req_cycle_ctx():
-                    await self.app(scope, receive, send)
+                await self.app(scope, receive, send)
             finally:
-                await self._process_events()
+                event_context.reset(token_out_of_scope)
+            return
 
-    @contextlib.contextmanager
-    def event_store_ctx(self) -> Iterator[None]:
-        logger.debug("Setting event_store ctx")
+        # A single context object is set per request. The event store is only created on the
+        # first dispatch(), and events are only processed if there is any.
+        ctx = EventContext(middleware_id=self._id)
+        token: Token = event_context.set(ctx)
+        try:
+            process_events = self._process_events
+            is_committing = self._is_committing and scope["type"] == "http"
+            if is_committing:
+                send = self._capture_response_status(ctx, send)
+                process_events = functools.partial(self._commit_events, ctx)
+            if self._coalescer is not None:
+                process_events = functools.partial(self._coalesce_and_process, process=process_events)
 
-        token_middleware_id: Token = middleware_identifier.set(self._id)
-        token_event_store: Token = event_store.set(deque())
+            flusher = None
+            if self._is_incremental:
+                flusher = self._create_flusher(ctx, process=process_events, is_committing=is_committing)
+                receive, send = flusher.wrap(receive, send,
+                                             flush_on_message=self._flush_on_message,
+                                             flush_after=self._early_flush_on)
 
-        try:
-            yield
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                ctx.in_req_res_cycle = False
+                if flusher is not None:
+                    await flusher.aclose()
+                if ctx.has_events():
+                    await process_events(events=ctx.events)
         finally:
-            logger.debug("Resetting event_store ctx")
-            event_store.reset(token_event_store)
-            middleware_identifier.reset(token_middleware_id)
+            event_context.reset(token)
 
-    @contextlib.contextmanager
-    def res_req_cycle_ctx(self) -> Iterator[None]:
-        token_is_res_req_cycle: Token = in_req_res_cycle.set(True)
+    def _list_all_handlers(self) -> Iterable[BaseEventHandler]:
+        return [*handler_store[self._id], *self._divert_handlers]
 
-        try:
-            yield
-        finally:
-            in_req_res_cycle.reset(token_is_res_req_cycle)
+    def _wrap_lifespan(self, receive: Receive, send: Send) -> Tuple[Receive, Send]:
+        """
+        Start handlers before the app's startup handlers, and shut them down after the app's shutdown handlers.
+        Delayed events are restored once handlers are started, and those due are processed before handlers shut down.
+        """
+
+        async def _receive() -> Message:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                logger.debug("Starting up handlers")
+                await asyncio.gather(*[handler.startup() for handler in self._list_all_handlers()])
+                await timer_store[self._id].startup()
+            return message
+
+        async def _send(message: Message) -> None:
+            if message["type"] == "lifespan.shutdown.complete":
+                logger.debug("Shutting down handlers")
+                await timer_store[self._id].shutdown()
+                await asyncio.gather(*[handler.shutdown() for handler in self._list_all_handlers()])
+            await send(message)
+
+        return _receive, _send
+
+    def _create_flusher(
+        self,
+        ctx: EventContext,
+        process: Callable[..., Awaitable[None]],
+        is_committing: bool = False
+    ) -> EventFlusher:
+        flusher = EventFlusher(ctx=ctx,
+                               process=process,
+                               threshold=self._flush_threshold,
+                               interval=self._flush_interval,
+                               # the response status must be known before events can be committed
+                               hold=(lambda: ctx.response_status is None) if is_committing else None)
+        ctx.flusher = flusher
+        flusher.start()
+        return flusher
+
+    @staticmethod
+    def _capture_response_status(ctx: EventContext, send: Send) -> Send:
+        async def _send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                ctx.response_status = message["status"]
+            await send(message)
+
+        return _send
+
+    def _get_processor(
+        self,
+        method: Callable[..., Awaitable[None]]
+    ) -> Callable[[Deque[Event]], Awaitable[None]]:
+        """
+        Get a processor to be held by an object outliving a request, e.g. a batcher or a scheduler
+        """
+        if self._id != id(self):
+            return method
+
+        # referenced weakly, so that the middleware can be garbage collected (and its handlers deregistered)
+        process = weakref.WeakMethod(method)  # type: ignore[arg-type]
+
+        async def _process(events: Deque[Event]) -> None:
+            await process()(events=events)  # type: ignore[misc]
+
+        return _process
 
-    async def _process_events(self) -> None:
-        handlers = handler_store[self._id]
-        q: Deque[Event] = event_store.get()
+    async def _coalesce_and_process(
+        self,
+        events: Deque[Event],
+        process: Optional[Callable[..., Awaitable[None]]] = None
+    ) -> None:
+        if self._coalescer is not None:
+            events = self._coalescer.coalesce(events)
 
+        await (process or self._process_events)(events=events)
+
+    def _get_commit_policy(self, event_name: EventName) -> CommitPolicy:
+        event_name = event_name if isinstance(event_name, str) else str(event_name)
+        for event_name_pattern, commit_policy in self._commit_policies.items():
+            if fnmatch.fnmatch(event_name, event_name_pattern):
+                return commit_policy
+
+        return self._commit_policy
+
+    async def _commit_events(self, ctx: EventContext, events: Deque[Event]) -> None:
+        """
+        Process, drop or divert events according to the commit policies and the response status
+        """
+        actions: Dict[EventName, CommitAction] = {}
+        events_to_process: Deque[Event] = deque()
+        events_to_divert: Deque[Event] = deque()
+
+        for event in events:
+            event_name = event[0]
+            if event_name not in actions:
+                actions[event_name] = self._get_commit_policy(event_name)(ctx.response_status)
+
+            action = actions[event_name]
+            if action is CommitAction.PROCESS:
+                events_to_process.append(event)
+            elif action is CommitAction.DIVERT and self._divert_handlers:
+                events_to_divert.append(event)
+
+        dropped_count = len(events) - len(events_to_process) - len(events_to_divert)
+        if dropped_count:
+            logger.debug("Dropping %d event(s) of a request with response status %s",
+                         dropped_count, ctx.response_status)
+
+        if events_to_process:
+            await self._process_events(events=events_to_process)
+
+        if events_to_divert:
+            logger.debug("Diverting %d event(s) of a request with response status %s",
+                         len(events_to_divert), ctx.response_status)
+            await self._handle_all(handlers=self._divert_handlers, events=events_to_divert)
+
+    async def _process_events(self, events: Deque[Event]) -> None:
+        if self._fair_scheduler is not None:
+            await self._fair_scheduler.submit(events)
+        else:
+            await self._handle_events(events=events)
+
+    async def _handle_events(self, events: Deque[Event]) -> None:
         logger.debug("Processing events")
-        await asyncio.gather(*[handler.handle_many(events=q)
-                               for handler in handlers])
+        await self._handle_all(handlers=handler_store[self._id], events=events)
+
+    async def _handle_all(self, handlers: Iterable[BaseEventHandler], events: Deque[Event]) -> None:
+        """
+        Hand events over to all handlers concurrently. Failures are isolated: a failing handler
+        neither cancels the others nor prevents them from completing, and is logged.
+        """
+        handlers = list(handlers)
+        results = await asyncio.gather(*[self._handle_many(handler=handler, events=events)
+                                         for handler in handlers],
+                                       return_exceptions=True)
+        for handler, result in zip(handlers, results):
+            if isinstance(result, BaseException):
+                logger.error("%s failed to handle %d event(s)", type(handler).__name__, len(events),
+                             exc_info=result)
+
+    async def _handle_many(self, handler: BaseEventHandler, events: Deque[Event]) -> None:
+        with profile_handler(self._profiler, handler=handler, event_count=len(events)):
+            await handler.handle_many(events=events)
@@ -80,6 +80,19 @@ def create_span_for_dispatch_fn(
                                         kind=trace.SpanKind.PRODUCER)
 
 
+def create_span_for_dispatch_many_fn(
+    event_count: int,
+):
+    if not HAS_OTEL_INSTALLED:
+        logger.debug("Unable to create span. OTEL is not installed.")
+        return empty_span()
+
+    tracer = trace.get_tracer("fastapi_events.dispatcher")
+
+    return tracer.start_as_current_span(f"{event_count} events dispatched",
+                                        kind=trace.SpanKind.PRODUCER)
+
+
 def inject_traceparent(payload: Dict):
     if not HAS_OTEL_INSTALLED:
         logger.debug("Unable to inject traceparent. OTEL is not installed.")
@@ -0,0 +1,115 @@
+from collections.abc import Mapping
+from typing import (Any, Dict, FrozenSet, Generic, Hashable, List, Optional,
+                    Tuple, TypeVar)
+
+from fastapi_events.errors import ConfigurationError
+
+T = TypeVar("T")
+
+Conditions = Dict[str, FrozenSet[Hashable]]
+
+MEMBERSHIP_TYPES = (list, tuple, set, frozenset)
+
+_MISSING = object()
+
+
+def compile_where(where: Optional[Dict[str, Any]]) -> Optional[Conditions]:
+    """
+    Compile declarative payload conditions, e.g. `{"type": "refund", "currency": ["EUR", "USD"]}`:
+    a payload matches if each field equals the value given, or is one of the values given as a list, tuple or set
+    """
+    if not where:
+        return None
+
+    if not isinstance(where, Mapping):
+        raise ConfigurationError("where must be a mapping of payload fields to values")
+
+    conditions: Conditions = {}
+    for field, value in where.items():
+        values = value if isinstance(value, MEMBERSHIP_TYPES) else (value,)
+        try:
+            conditions[field] = frozenset(values)
+        except TypeError:
+            raise ConfigurationError(f"Values of where[{field!r}] must be hashable")
+
+        if not conditions[field]:
+            raise ConfigurationError(f"where[{field!r}] must have at least one value")
+
+    return conditions
+
+
+def get_field(payload: Any, field: str) -> Any:
+    if isinstance(payload, Mapping):
+        return payload.get(field, _MISSING)
+    return getattr(payload, field, _MISSING)
+
+
+class PredicateIndex(Generic[T]):
+    """
+    Matches payloads against the conditions of many targets, e.g. handlers, without checking each of them
+    - targets without conditions match every payload
+    - a target with conditions is indexed on the value of its first field, so only the targets indexed on the
+      value a payload holds are candidates. Their other fields are checked once found.
+    - matches are returned in the order targets were added
+    """
+
+    def __init__(self) -> None:
+        self._targets: List[T] = []
+        self._unconditional: List[Tuple[int, T]] = []
+        self._unconditional_targets: List[T] = []
+        self._indexes: Dict[str, Dict[Hashable, List[Tuple[int, T, Conditions]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._targets)
+
+    @property
+    def targets(self) -> List[T]:
+        return self._targets
+
+    @property
+    def has_conditions(self) -> bool:
+        return bool(self._indexes)
+
+    def add(self, target: T, conditions: Optional[Conditions] = None) -> None:
+        order = len(self._targets)
+        self._targets.append(target)
+        if not conditions:
+            self._unconditional.append((order, target))
+            self._unconditional_targets.append(target)
+            return
+
+        field, values = next(iter(conditions.items()))
+        rest = {other_field: other_values for other_field, other_values in conditions.items() if other_field != field}
+        index = self._indexes.setdefault(field, {})
+        for value in values:
+            index.setdefault(value, []).append((order, target, rest))
+
+    def match(self, payload: Any) -> List[T]:
+        if not self._indexes:
+            return self._unconditional_targets
+
+        matches = list(self._unconditional)
+        for field, index in self._indexes.items():
+            value = get_field(payload, field)
+            if value is _MISSING:
+                continue
+
+            try:
+                candidates = index.get(value)
+            except TypeError:  # unhashable values never match
+                continue
+
+            for order, target, rest in candidates or ():
+                if all(self._holds(payload, other_field, values) for other_field, values in rest.items()):
+                    matches.append((order, target))
+
+        if len(matches) > 1:
+            matches.sort(key=lambda match: match[0])
+        return [target for _, target in matches]
+
+    @staticmethod
+    def _holds(payload: Any, field: str, values: FrozenSet[Hashable]) -> bool:
+        try:
+            return get_field(payload, field) in values
+        except TypeError:
+            return False
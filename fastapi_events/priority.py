@@ -0,0 +1,137 @@
+import fnmatch
+from collections import deque
+from enum import IntEnum
+from typing import Any, Deque, Dict, List, Optional
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.typing import Event, EventName
+
+
+class Priority(IntEnum):
+    LOW = 0
+    NORMAL = 1
+    HIGH = 2
+    CRITICAL = 3
+
+
+DEFAULT_WEIGHTS: Dict[Priority, int] = {
+    Priority.CRITICAL: 8,
+    Priority.HIGH: 4,
+    Priority.NORMAL: 2,
+    Priority.LOW: 1,
+}
+
+
+class PrioritizedEvent(tuple):
+    """
+    An `(event_name, payload)` tuple carrying the priority passed to `dispatch(..., priority=...)`.
+    It is unpacked and compared like any other event.
+    """
+
+    priority: Priority
+
+    def __new__(cls, event_name: EventName, payload: Any, priority: Priority) -> "PrioritizedEvent":
+        event = super().__new__(cls, (event_name, payload))
+        event.priority = Priority(priority)
+        return event
+
+    def __reduce__(self):
+        return PrioritizedEvent, (self[0], self[1], self.priority)
+
+
+class PriorityLanes:
+    """
+    A bounded queue of events with a FIFO lane per priority class
+    - events are assigned a priority with `dispatch(..., priority=...)`, or by event name patterns (`fnmatch`)
+    - batches are taken from the lanes with weighted scheduling: each non-empty lane gets a share of the batch
+      proportional to its weight, so that lower priorities are slowed down, but not starved
+    - past `max_size`, the oldest events of the lowest priority are shed first
+    """
+
+    def __init__(
+        self,
+        priorities: Optional[Dict[str, Priority]] = None,
+        default_priority: Priority = Priority.NORMAL,
+        weights: Optional[Dict[Priority, int]] = None,
+        max_size: Optional[int] = 10_000,
+    ) -> None:
+        """
+        :param priorities: Priorities keyed by Unix shell-style event name patterns, e.g. `{"billing_*": Priority.HIGH}`.
+        :param default_priority: Priority of events not matching any pattern.
+        :param weights: Share of a batch given to each priority. See `DEFAULT_WEIGHTS`.
+        :param max_size: Maximum number of events queued across all lanes.
+        """
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        if any(weight < 1 for weight in weights.values()):
+            raise ConfigurationError("weights must be at least 1")
+
+        self._priorities = priorities or {}
+        self._default_priority = Priority(default_priority)
+        self._weights = weights
+        self._max_size = max_size
+        self._priority_cache: Dict[EventName, Priority] = {}
+
+        # highest priority first
+        self._lanes: Dict[Priority, Deque[Event]] = {priority: deque()
+                                                     for priority in sorted(Priority, reverse=True)}
+        self._size = 0
+
+        self.shed_counts: Dict[Priority, int] = {priority: 0 for priority in Priority}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get_priority(self, event: Event) -> Priority:
+        priority = getattr(event, "priority", None)
+        if priority is not None:
+            return priority
+
+        event_name = event[0]
+        if event_name not in self._priority_cache:
+            name = event_name if isinstance(event_name, str) else str(event_name)
+            self._priority_cache[event_name] = next((Priority(priority)
+                                                     for pattern, priority in self._priorities.items()
+                                                     if fnmatch.fnmatch(name, pattern)), self._default_priority)
+
+        return self._priority_cache[event_name]
+
+    def pending(self, priority: Priority) -> int:
+        return len(self._lanes[priority])
+
+    def put(self, event: Event) -> Optional[Event]:
+        """
+        Queue an event, and return the event shed to make room for it, if any
+        """
+        self._lanes[self.get_priority(event)].append(event)
+        self._size += 1
+
+        if self._max_size is not None and self._size > self._max_size:
+            return self._shed()
+
+        return None
+
+    def get_batch(self, max_size: int) -> List[Event]:
+        batch: List[Event] = []
+        while len(batch) < max_size and self._size:
+            lanes = [(priority, lane) for priority, lane in self._lanes.items() if lane]
+            total_weight = sum(self._weights[priority] for priority, _ in lanes)
+            room = max_size - len(batch)
+
+            for priority, lane in lanes:
+                # at least one event per non-empty lane and round, so that no lane is starved
+                share = max(1, room * self._weights[priority] // total_weight)
+                for _ in range(min(share, len(lane), max_size - len(batch))):
+                    batch.append(lane.popleft())
+                    self._size -= 1
+
+        return batch
+
+    def _shed(self) -> Event:
+        for priority in sorted(Priority):
+            lane = self._lanes[priority]
+            if lane:
+                self._size -= 1
+                self.shed_counts[priority] += 1
+                return lane.popleft()
+
+        raise IndexError("shed from an empty queue")  # pragma: no cover
@@ -0,0 +1,249 @@
+import asyncio
+import contextlib
+import cProfile
+import logging
+import pstats
+import threading
+import time
+import traceback
+import tracemalloc
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.typing import EventName
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_MODES = ("cprofile", "tracemalloc")
+
+# tracemalloc is process-wide: it is started by the first active sample, and stopped once the last one is taken
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_samples = 0
+_tracemalloc_started = False
+
+
+def _start_tracemalloc() -> None:
+    global _tracemalloc_samples, _tracemalloc_started
+    with _tracemalloc_lock:
+        if _tracemalloc_samples == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_started = True
+        _tracemalloc_samples += 1
+
+
+def _stop_tracemalloc() -> Any:
+    global _tracemalloc_samples, _tracemalloc_started
+    with _tracemalloc_lock:
+        _tracemalloc_samples -= 1
+        try:
+            return tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        finally:
+            if _tracemalloc_samples == 0 and _tracemalloc_started:
+                tracemalloc.stop()
+                _tracemalloc_started = False
+
+
+class HandlerInvocation(NamedTuple):
+    """
+    Measurements of a single handler invocation, passed to after-hooks
+    """
+    handler: Any
+    event_name: Optional[EventName]
+    event_count: int
+    wall_time: float
+    cpu_time: float
+    snapshot: Optional[Any] = None  # `pstats.Stats` or `tracemalloc.Snapshot` for sampled invocations
+    stack: Optional[str] = None  # stack of the offending task, captured when `capture_stack` is enabled
+
+
+BeforeHook = Callable[[Any, Optional[EventName]], None]
+AfterHook = Callable[[HandlerInvocation], None]
+
+
+def _get_handler_name(handler: Any) -> str:
+    if hasattr(handler, "__qualname__"):
+        return f"{handler.__module__}.{handler.__qualname__}"
+
+    return f"{handler.__class__.__module__}.{handler.__class__.__name__}"
+
+
+def _format_task_stack(task: asyncio.Task) -> str:
+    """
+    Format the await chain of a suspended task, from the outermost coroutine down to
+    the one the task is currently waiting in
+    """
+    frames = []
+    coro: Any = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append((frame, frame.f_lineno))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+
+    return "".join(traceback.StackSummary.extract(frames).format())
+
+
+class HandlerProfiler:
+    """
+    HandlerProfiler
+    - measures wall time and CPU time of every handler invocation
+    - reports handlers exceeding `slow_threshold` (in seconds), optionally with a stack sample
+    - attaches a cProfile or tracemalloc snapshot to one invocation in every `sampling_interval`
+
+    Note that CPU time is measured process-wide, so it includes CPU time spent by other
+    coroutines while the handler awaits.
+    """
+
+    def __init__(
+        self,
+        slow_threshold: Optional[float] = None,
+        capture_stack: bool = False,
+        sampling_interval: Optional[int] = None,
+        sampling_mode: str = "cprofile",
+        before_hooks: Optional[List[BeforeHook]] = None,
+        after_hooks: Optional[List[AfterHook]] = None,
+    ) -> None:
+        if sampling_mode not in SAMPLING_MODES:
+            raise ConfigurationError(f"sampling_mode must be one of {SAMPLING_MODES}")
+
+        if sampling_interval is not None and sampling_interval < 1:
+            raise ConfigurationError("sampling_interval must be a positive integer")
+
+        self._slow_threshold = slow_threshold
+        self._capture_stack = capture_stack
+        self._sampling_interval = sampling_interval
+        self._sampling_mode = sampling_mode
+        self._before_hooks: List[BeforeHook] = list(before_hooks or [])
+        self._after_hooks: List[AfterHook] = list(after_hooks or [])
+        self._invocation_count = 0
+
+    def add_before_hook(self, hook: BeforeHook) -> BeforeHook:
+        self._before_hooks.append(hook)
+        return hook
+
+    def add_after_hook(self, hook: AfterHook) -> AfterHook:
+        self._after_hooks.append(hook)
+        return hook
+
+    @contextlib.contextmanager
+    def profile(
+        self,
+        handler: Any,
+        event_name: Optional[EventName] = None,
+        event_count: int = 1
+    ) -> Iterator[None]:
+        for before_hook in self._before_hooks:
+            before_hook(handler, event_name)
+
+        self._invocation_count += 1
+        is_sampled = bool(self._sampling_interval) and self._invocation_count % self._sampling_interval == 0  # type: ignore[operator]
+
+        captured_stacks: List[str] = []
+        stack_timer = self._arm_stack_capture(captured_stacks)
+        sampler = None
+        if is_sampled:
+            try:
+                sampler = self._start_sampler()
+            except Exception:
+                logger.exception("Failed to start sampling %s", _get_handler_name(handler))
+                is_sampled = False
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - wall_start
+            cpu_time = time.process_time() - cpu_start
+
+            snapshot = None
+            if is_sampled:
+                # sampling errors must not replace the outcome of the handler
+                try:
+                    snapshot = self._stop_sampler(sampler)
+                except Exception:
+                    logger.exception("Failed to take a sample of %s", _get_handler_name(handler))
+            if stack_timer:
+                stack_timer.cancel()
+
+            invocation = HandlerInvocation(handler=handler,
+                                           event_name=event_name,
+                                           event_count=event_count,
+                                           wall_time=wall_time,
+                                           cpu_time=cpu_time,
+                                           snapshot=snapshot,
+                                           stack=captured_stacks[0] if captured_stacks else None)
+
+            if self._slow_threshold is not None and wall_time >= self._slow_threshold:
+                self._report_slow_invocation(invocation)
+
+            for after_hook in self._after_hooks:
+                after_hook(invocation)
+
+    def _arm_stack_capture(self, captured_stacks: List[str]) -> Optional[asyncio.TimerHandle]:
+        """
+        Schedule a stack sample of the current task once `slow_threshold` has elapsed
+        """
+        if self._slow_threshold is None or not self._capture_stack:
+            return None
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+        task = asyncio.current_task()
+        if task is None:
+            return None
+
+        def _capture() -> None:
+            captured_stacks.append(_format_task_stack(task))  # type: ignore[arg-type]
+
+        return loop.call_later(self._slow_threshold, _capture)
+
+    def _start_sampler(self) -> Any:
+        if self._sampling_mode == "cprofile":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                logger.debug("Another profiler is active. Skipping cProfile sampling...")
+                return None
+            return profiler
+
+        _start_tracemalloc()
+        return None
+
+    def _stop_sampler(self, sampler: Any) -> Any:
+        if self._sampling_mode == "cprofile":
+            if sampler is None:
+                return None
+            sampler.disable()
+            return pstats.Stats(sampler)
+
+        return _stop_tracemalloc()
+
+    @staticmethod
+    def _report_slow_invocation(invocation: HandlerInvocation) -> None:
+        logger.warning("Slow handler detected: %s took %.3fs (cpu %.3fs) to handle %s event(s) %s%s",
+                       _get_handler_name(invocation.handler),
+                       invocation.wall_time,
+                       invocation.cpu_time,
+                       invocation.event_count,
+                       invocation.event_name if invocation.event_name is not None else "",
+                       f"\n{invocation.stack}" if invocation.stack else "")
+
+
+def profile_handler(
+    profiler: Optional[HandlerProfiler],
+    handler: Any,
+    event_name: Optional[EventName] = None,
+    event_count: int = 1
+):
+    """
+    Returns a no-op context manager when profiling is not enabled
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+
+    return profiler.profile(handler=handler, event_name=event_name, event_count=event_count)
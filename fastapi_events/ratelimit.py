@@ -0,0 +1,62 @@
+import time
+from typing import Callable, Optional
+
+from fastapi_events.errors import ConfigurationError
+
+
+class TokenBucket:
+    """
+    A token bucket refilled at `rate` tokens per second, holding up to `capacity` tokens (the burst allowance)
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        :param rate: Tokens added per second.
+        :param capacity: Maximum number of tokens. Defaults to `rate`, i.e. a burst of one second.
+        """
+        if rate <= 0:
+            raise ConfigurationError("rate must be greater than 0")
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        if self.capacity <= 0:
+            raise ConfigurationError("capacity must be greater than 0")
+
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated_at = clock()
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def try_acquire(self, tokens: float) -> bool:
+        """
+        Take tokens if available now
+        """
+        self._refill()
+        if self._tokens < tokens:
+            return False
+
+        self._tokens -= tokens
+        return True
+
+    def reserve(self, tokens: float) -> float:
+        """
+        Take tokens, going into debt if needed, and return the time to wait before they may be used, in seconds.
+        Later reservations wait behind earlier ones, so concurrent callers are paced in turn.
+        """
+        self._refill()
+        self._tokens -= tokens
+        return max(0.0, -self._tokens / self.rate)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
@@ -0,0 +1,53 @@
+import random
+from typing import Optional, Tuple, Type
+
+from fastapi_events.errors import ConfigurationError
+
+
+class RetryPolicy:
+    """
+    How failed calls are retried: up to `max_attempts` attempts in total, with exponential backoff and jitter
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        initial_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        multiplier: float = 2.0,
+        jitter: bool = True,
+        retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        """
+        :param max_attempts: Maximum number of attempts, including the first one.
+        :param initial_backoff: Delay before the first retry, in seconds.
+        :param max_backoff: Maximum delay between attempts, in seconds.
+        :param multiplier: Factor by which the delay grows after each attempt.
+        :param jitter: Use "full jitter", i.e. a random delay between 0 and the backoff, so that retries of \
+            events failing together are spread out.
+        :param retry_on: Exception classes that are retried. Other exceptions fail immediately.
+        """
+        if max_attempts < 1:
+            raise ConfigurationError("max_attempts must be at least 1")
+
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.retry_on = retry_on
+        self._rng = rng or random.Random()
+
+    def is_retryable(self, exc: BaseException, attempt: int) -> bool:
+        """
+        :param attempt: Number of attempts made so far.
+        """
+        return attempt < self.max_attempts and isinstance(exc, self.retry_on)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Delay before the next attempt, given the number of attempts made so far
+        """
+        delay = min(self.max_backoff, self.initial_backoff * self.multiplier ** (attempt - 1))
+        return self._rng.uniform(0, delay) if self.jitter else delay
@@ -0,0 +1,205 @@
+import logging
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+from collections import deque
+from typing import BinaryIO, Callable, Deque, Iterable, List, Optional
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.typing import Event
+
+logger = logging.getLogger(__name__)
+
+# records are length-prefixed in segment files
+_RECORD_HEADER = struct.Struct("<I")
+
+
+class _Segment:
+    """
+    An append-only segment file. It is written to until it is sealed, and read back with mmap afterwards.
+    """
+    __slots__ = ("path", "size", "count", "_file", "_mmap", "_offset")
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.size = 0
+        self.count = 0
+        self._file: Optional[BinaryIO] = open(path, "wb")
+        self._mmap: Optional[mmap.mmap] = None
+        self._offset = 0
+
+    @property
+    def is_sealed(self) -> bool:
+        return self._file is None
+
+    def append(self, data: bytes) -> None:
+        self._file.write(_RECORD_HEADER.pack(len(data)))  # type: ignore[union-attr]
+        self._file.write(data)  # type: ignore[union-attr]
+        self.size += _RECORD_HEADER.size + len(data)
+        self.count += 1
+
+    def seal(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def read(self, limit: int) -> List[bytes]:
+        if self._mmap is None:
+            with open(self.path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        records: List[bytes] = []
+        buffer, offset = self._mmap, self._offset
+        while len(records) < limit and self.count:
+            (length,) = _RECORD_HEADER.unpack_from(buffer, offset)
+            offset += _RECORD_HEADER.size
+            records.append(buffer[offset:offset + length])
+            offset += length
+            self.count -= 1
+
+        self._offset = offset
+        return records
+
+    def remove(self) -> None:
+        self.seal()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        os.remove(self.path)
+
+
+class SpilloverQueue:
+    """
+    SpilloverQueue
+    - a FIFO queue of events holding up to `memory_limit` events in memory
+    - past the limit, events are spilled in order to segment files on disk, so memory stays bounded during a burst
+    - once events are spilled, new events are spilled too until the disk is drained, preserving the order
+    - spilled events are read back with mmap, a segment at a time, as the consumer catches up
+
+    Spilled events are not durable: segment files are removed when the queue is closed. See `OutboxHandler` if
+    events must survive a restart.
+    """
+
+    def __init__(
+        self,
+        memory_limit: int = 10_000,
+        directory: Optional[str] = None,
+        segment_size: int = 16 * 1024 * 1024,
+        serializer: Optional[Callable[[Event], bytes]] = None,
+        deserializer: Optional[Callable[[bytes], Event]] = None,
+    ) -> None:
+        """
+        :param memory_limit: Maximum number of events held in memory.
+        :param directory: Directory in which segment files are created. The system temp directory is used if omitted.
+        :param segment_size: Size of a segment file in bytes before a new one is started.
+        :param serializer: Serializes an event into bytes. `pickle` is used by default.
+        :param deserializer: Deserializes bytes back into an event.
+        """
+        if memory_limit < 1:
+            raise ConfigurationError("memory_limit must be at least 1")
+
+        for fn in (serializer, deserializer):
+            if fn is not None and not callable(fn):
+                raise ConfigurationError("serializer and deserializer must be of type Callable")
+
+        self._memory_limit = memory_limit
+        self._directory = directory
+        self._segment_size = segment_size
+        self._serializer = serializer or pickle.dumps
+        self._deserializer = deserializer or pickle.loads
+
+        self._memory: Deque[Event] = deque()
+        self._segments: Deque[_Segment] = deque()
+        self._segment_dir: Optional[str] = None
+        self._segment_index = 0
+        self._disk_count = 0
+
+        self.spilled_count = 0
+
+    def __len__(self) -> int:
+        return len(self._memory) + self._disk_count
+
+    @property
+    def disk_count(self) -> int:
+        return self._disk_count
+
+    def put(self, event: Event) -> None:
+        if not self._disk_count and len(self._memory) < self._memory_limit:
+            self._memory.append(event)
+        else:
+            self._spill(event)
+
+    def extend(self, events: Iterable[Event]) -> None:
+        for event in events:
+            self.put(event)
+
+    def get_batch(self, max_size: int) -> List[Event]:
+        """
+        Remove and return up to `max_size` events, oldest first
+        """
+        batch: List[Event] = []
+        while len(batch) < max_size:
+            if not self._memory:
+                if not self._disk_count:
+                    break
+                # promote spilled events back to memory
+                self._read_from_disk(limit=self._memory_limit)
+
+            memory = self._memory
+            batch.extend(memory.popleft() for _ in range(min(max_size - len(batch), len(memory))))
+
+        return batch
+
+    def close(self) -> None:
+        """
+        Discard all events and remove the segment files
+        """
+        self._memory.clear()
+        while self._segments:
+            self._segments.popleft().remove()
+        self._disk_count = 0
+
+        if self._segment_dir is not None:
+            shutil.rmtree(self._segment_dir, ignore_errors=True)
+            self._segment_dir = None
+
+    def _spill(self, event: Event) -> None:
+        segment = self._segments[-1] if self._segments else None
+        if segment is None or segment.is_sealed or segment.size >= self._segment_size:
+            if segment is not None:
+                segment.seal()
+            segment = self._new_segment()
+
+        segment.append(self._serializer(event))
+        self._disk_count += 1
+        self.spilled_count += 1
+
+    def _new_segment(self) -> _Segment:
+        if self._segment_dir is None:
+            if self._directory is not None:
+                os.makedirs(self._directory, exist_ok=True)
+            self._segment_dir = tempfile.mkdtemp(prefix="fastapi-events-spill-", dir=self._directory)
+            logger.debug("Spilling events to %s", self._segment_dir)
+
+        self._segment_index += 1
+        segment = _Segment(os.path.join(self._segment_dir, f"{self._segment_index:010d}.seg"))
+        self._segments.append(segment)
+        return segment
+
+    def _read_from_disk(self, limit: int) -> None:
+        while limit > 0 and self._segments:
+            segment = self._segments[0]
+            # the segment being written to is sealed once the reader catches up with it
+            segment.seal()
+
+            records = segment.read(limit)
+            self._memory.extend(self._deserializer(record) for record in records)
+            self._disk_count -= len(records)
+            limit -= len(records)
+
+            if not segment.count:
+                self._segments.popleft()
+                segment.remove()
@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import math
+import os
+import pickle
+import re
+import struct
+import time
+import uuid
+from collections import deque
+from typing import (Awaitable, Callable, Deque, Dict, Generic, List, Optional,
+                    Tuple, TypeVar)
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.typing import Event
+from fastapi_events.workers import BackgroundWorkers
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# records of saved files are prefixed with the time they are due at and their length
+_RECORD_HEADER = struct.Struct("<dI")
+
+
+class Timer(Generic[T]):
+    """
+    A timer of a `TimerWheel`, holding `item` until `deadline`. Cancelled in O(1) with `cancel()`.
+    """
+    __slots__ = ("deadline", "item", "_wheel", "_bucket")
+
+    def __init__(self, deadline: float, item: T, wheel: "TimerWheel[T]") -> None:
+        self.deadline = deadline
+        self.item = item
+        self._wheel = wheel
+        self._bucket: Optional[Dict["Timer[T]", None]] = None
+
+    @property
+    def pending(self) -> bool:
+        return self._bucket is not None
+
+    def cancel(self) -> bool:
+        """
+        Cancel the timer. Returns False if it has already expired or been cancelled.
+        """
+        if self._bucket is None:
+            return False
+
+        del self._bucket[self]
+        self._bucket = None
+        self._wheel._count -= 1
+        return True
+
+
+class TimerWheel(Generic[T]):
+    """
+    Hierarchical timer wheel
+    - `levels` wheels of `slots` slots each. A slot of level 0 spans a `tick`, and a slot of level n spans
+      `slots ** n` ticks, so 4 levels of 256 slots of 0.1s span over 13 years
+    - a timer is added to the slot of the lowest level covering its deadline, and is removed from it when cancelled:
+      both are O(1), however many timers are pending
+    - as time advances, the slots of level 0 expire, and the timers of a slot of a higher level are cascaded
+      into the lower levels once its turn comes
+    - timers expire on the first tick at or after their deadline
+    """
+
+    def __init__(
+        self,
+        tick: float = 0.1,
+        slots: int = 256,
+        levels: int = 4,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """
+        :param tick: Resolution of the wheel, in seconds.
+        :param slots: Number of slots per level.
+        :param levels: Number of levels.
+        :param clock: Source of the time deadlines are expressed in. Defaults to the UNIX time.
+        """
+        if tick <= 0:
+            raise ConfigurationError("tick must be greater than 0")
+        if slots < 2 or levels < 2:
+            # deadlines beyond the span of the wheel are held by the top level, which must not be the one expiring
+            raise ConfigurationError("A timer wheel needs at least 2 slots and 2 levels")
+
+        self._tick = tick
+        self._slots = slots
+        self._levels = levels
+        self._clock = clock
+        self._spans = [slots ** level for level in range(levels + 1)]  # ticks spanned by a slot of each level
+        self._wheels: List[List[Dict[Timer[T], None]]] = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._current = self._to_tick(clock())  # last tick expired
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def schedule(self, deadline: float, item: T) -> Timer[T]:
+        if not self._count:
+            # the wheel has been idle: catch up without walking through the elapsed ticks
+            self._current = max(self._current, self._to_tick(self._clock()))
+
+        timer = Timer(deadline, item, self)
+        self._place(timer, earliest_tick=self._current + 1)
+        self._count += 1
+        return timer
+
+    def advance(self, now: Optional[float] = None) -> List[T]:
+        """
+        Expire the ticks elapsed until `now`, and return the items of the timers expired, in deadline order per tick
+        """
+        target = self._to_tick(self._clock() if now is None else now)
+        expired: List[T] = []
+        while self._current < target:
+            if not self._count:
+                self._current = target
+                break
+
+            self._current += 1
+            tick = self._current
+            for level in range(self._levels - 1, 0, -1):
+                if tick % self._spans[level] == 0:
+                    self._cascade(self._wheels[level][(tick // self._spans[level]) % self._slots])
+
+            bucket = self._wheels[0][tick % self._slots]
+            if bucket:
+                timers = sorted(bucket, key=lambda timer: timer.deadline)
+                bucket.clear()
+                self._count -= len(timers)
+                for timer in timers:
+                    timer._bucket = None
+                    expired.append(timer.item)
+
+        return expired
+
+    def next_tick_at(self) -> Optional[float]:
+        """
+        Time of the next tick that may expire timers, or None if no timer is pending
+        """
+        if not self._count:
+            return None
+
+        tick = self._current
+        for _ in range(self._slots):
+            tick += 1
+            if self._wheels[0][tick % self._slots] or tick % self._slots == 0:
+                break
+
+        return tick * self._tick
+
+    def pop_all(self) -> List[Timer[T]]:
+        """
+        Remove all pending timers, and return them in deadline order
+        """
+        timers: List[Timer[T]] = []
+        for wheel in self._wheels:
+            for bucket in wheel:
+                timers.extend(bucket)
+                bucket.clear()
+
+        for timer in timers:
+            timer._bucket = None
+        self._count = 0
+        return sorted(timers, key=lambda timer: timer.deadline)
+
+    def _to_tick(self, at: float) -> int:
+        return int(at // self._tick)
+
+    def _place(self, timer: Timer[T], earliest_tick: int) -> None:
+        tick = max(math.ceil(timer.deadline / self._tick), earliest_tick)
+        level = 0
+        # the lowest level whose current slot of the level above also covers the deadline
+        while level < self._levels - 1 and tick // self._spans[level + 1] != self._current // self._spans[level + 1]:
+            level += 1
+
+        # deadlines beyond the span of the wheel are placed in the top level, and cascaded again in due time
+        bucket = self._wheels[level][(tick // self._spans[level]) % self._slots]
+        bucket[timer] = None
+        timer._bucket = bucket
+
+    def _cascade(self, bucket: Dict[Timer[T], None]) -> None:
+        if not bucket:
+            return
+
+        timers = list(bucket)
+        bucket.clear()
+        for timer in timers:
+            self._place(timer, earliest_tick=self._current)
+
+
+class DelayedDispatcher:
+    """
+    Holds the events dispatched with `dispatch(..., delay=...)` or `dispatch(..., at=...)` in a `TimerWheel`,
+    and processes them once due, in a batch per tick, like events dispatched outside of a request-response cycle.
+    One is created per `EventHandlerASGIMiddleware`, see `fastapi_events.timer_store`.
+
+    On shutdown, events already due are processed. Events still pending are saved next to `path` if set, and
+    scheduled again on the next startup. Otherwise, they are discarded.
+
+    Several processes (e.g. the workers of uvicorn or gunicorn) can share a `path`: each of them saves its events to
+    a file of its own, `<path>.<random hex>`, which is written to a temporary file and renamed into place. On startup,
+    each saved file is claimed by renaming it, so its events are restored by a single process.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[Deque[Event]], Awaitable[None]],
+        tick: float = 0.1,
+        path: Optional[str] = None,
+        serializer: Optional[Callable[[Event], bytes]] = None,
+        deserializer: Optional[Callable[[bytes], Event]] = None,
+    ) -> None:
+        """
+        :param process: Processes a batch of due events, e.g. `EventHandlerASGIMiddleware._process_events`.
+        :param tick: Resolution of the timer wheel, in seconds.
+        :param path: Path pending events are saved to on shutdown, suffixed per process.
+        :param serializer: Serializes an event into bytes. `pickle` is used by default, which keeps the types \
+            of event names and payloads.
+        :param deserializer: Deserializes bytes back into an event.
+        """
+        for fn in (serializer, deserializer):
+            if fn is not None and not callable(fn):
+                raise ConfigurationError("serializer and deserializer must be of type Callable")
+
+        self._process = process
+        self._path = path
+        self._serializer = serializer or pickle.dumps
+        self._deserializer = deserializer or pickle.loads
+        self._wheel: TimerWheel[Event] = TimerWheel(tick=tick)
+        self._ticker = BackgroundWorkers(self._run_ticker, name="DelayedDispatcher ticker")
+
+    @property
+    def pending(self) -> int:
+        return len(self._wheel)
+
+    def schedule(self, event: Event, due_at: float) -> Timer[Event]:
+        """
+        Schedule an event to be processed at `due_at`, in UNIX time
+        """
+        timer = self._wheel.schedule(due_at, event)
+        self._ticker.ensure_started()
+        self._ticker.wake()  # the new timer may be due before the tick the ticker waits for
+        return timer
+
+    async def startup(self) -> None:
+        if self._path is None:
+            return
+
+        records = await asyncio.get_running_loop().run_in_executor(None, self._load, self._path)
+        for due_at, event in records:
+            self.schedule(event, due_at=due_at)
+
+        if records:
+            logger.info("%d delayed event(s) restored from %s", len(records), self._path)
+
+    async def shutdown(self) -> None:
+        await self._ticker.drain()
+
+        # events past their deadline are processed, even if the tick they expire on has not elapsed yet
+        now = time.time()
+        timers = self._wheel.pop_all()
+        await self._process_batch([timer.item for timer in timers if timer.deadline <= now])
+
+        timers = [timer for timer in timers if timer.deadline > now]
+        if not timers:
+            return
+
+        if self._path is None:
+            logger.warning("Discarding %d delayed event(s) not due on shutdown. "
+                           "Set a path on the middleware to save them.", len(timers))
+            return
+
+        records = []
+        for timer in timers:
+            try:
+                records.append(self._pack(timer))
+            except Exception:
+                # not coerced, so that restored events are the ones dispatched
+                logger.exception("Discarding delayed event %s, which cannot be serialized", timer.item[0])
+        if not records:
+            return
+
+        saved_path = await asyncio.get_running_loop().run_in_executor(None, self._save, self._path, b"".join(records))
+        logger.info("%d delayed event(s) saved to %s", len(records), saved_path)
+
+    async def _process_batch(self, events: List[Event]) -> None:
+        if not events:
+            return
+
+        logger.debug("Processing %d delayed event(s)", len(events))
+        try:
+            await self._process(deque(events))
+        except Exception:
+            logger.exception("Failed to process %d delayed event(s)", len(events))
+
+    async def _run_ticker(self) -> None:
+        while not self._ticker.draining:
+            next_tick_at = self._wheel.next_tick_at()
+            if next_tick_at is None:
+                await self._ticker.wait()
+                continue
+
+            delay = next_tick_at - time.time()
+            if delay > 0:
+                await self._ticker.wait(timeout=delay)
+                continue
+
+            await self._process_batch(self._wheel.advance())
+
+    def _pack(self, timer: Timer[Event]) -> bytes:
+        data = self._serializer(timer.item)
+        return _RECORD_HEADER.pack(timer.deadline, len(data)) + data
+
+    @staticmethod
+    def _list_saved_files(path: str) -> List[str]:
+        directory, name = os.path.split(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            return []
+
+        pattern = re.compile(re.escape(name) + r"\.[0-9a-f]{32}")
+        return [os.path.join(directory, file_name) for file_name in sorted(os.listdir(directory))
+                if pattern.fullmatch(file_name)]
+
+    def _load(self, path: str) -> List[Tuple[float, Event]]:
+        records = []
+        for saved_path in self._list_saved_files(path):
+            claimed_path = f"{saved_path}.{uuid.uuid4().hex}.claimed"
+            try:
+                os.rename(saved_path, claimed_path)
+            except FileNotFoundError:  # claimed by another process
+                continue
+
+            with open(claimed_path, "rb") as f:
+                data = f.read()
+            offset = 0
+            while offset < len(data):
+                due_at, length = _RECORD_HEADER.unpack_from(data, offset)
+                offset += _RECORD_HEADER.size
+                records.append((due_at, self._deserializer(data[offset:offset + length])))
+                offset += length
+
+            # the events are pending in memory from now on, and saved again on shutdown
+            os.remove(claimed_path)
+
+        return records
+
+    @staticmethod
+    def _save(path: str, data: bytes) -> str:
+        saved_path = f"{path}.{uuid.uuid4().hex}"
+        tmp_path = f"{saved_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, saved_path)
+        return saved_path
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Ticket:
+    """
+    Tracks the events of a single submission, to resolve it once they are all processed
+    """
+    __slots__ = ("remaining", "future")
+
+    def __init__(self, remaining: int, future: asyncio.Future) -> None:
+        self.remaining = remaining
+        self.future = future
+
+    def done(self, count: int = 1, exc: Optional[BaseException] = None) -> None:
+        self.remaining -= count
+        if self.future.done():
+            return
+
+        if exc is not None:
+            self.future.set_exception(exc)
+        elif self.remaining <= 0:
+            self.future.set_result(None)
+
+
+class BackgroundWorkers:
+    """
+    Background tasks processing the events queued by a handler
+    - started lazily with `ensure_started()`, in the running event loop. They are restarted if the event loop
+      changes, or once they have all stopped, e.g. after a worker died from an exception (which is logged)
+    - woken up with `wake()` when there is work, while workers wait for it with `wait()`
+    - stopped with `drain()`: `draining` is set, and workers are expected to return once they run out of work
+    """
+
+    def __init__(self, target: Callable[[], Awaitable[None]], count: int = 1, name: str = "Worker") -> None:
+        """
+        :param target: Coroutine function run by each worker.
+        :param count: Number of workers.
+        :param name: Name of the workers in logs.
+        """
+        self._target = target
+        self._count = count
+        self._name = name
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.draining = False
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def ensure_started(self) -> bool:
+        """
+        Start the workers, unless they are already running in the running event loop, or being drained.
+        Returns True if the event loop has changed, in which case state tied to the previous loop must be discarded.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and (self.running or self.draining):
+            return False
+
+        loop_changed = self._loop is not None and self._loop is not loop
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self._count)]
+        return loop_changed
+
+    def wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait to be woken up, or for `timeout` seconds. Returns False on timeout.
+
+        The wake-up is only consumed once it is received, so work queued while a worker was busy is never missed.
+        """
+        wakeup: asyncio.Event = self._wakeup  # type: ignore[assignment]
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+
+        wakeup.clear()
+        return True
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ask the workers to return once they run out of work, and wait for them.
+        Workers still running after `timeout` seconds are cancelled. Returns False if any had to be cancelled.
+        """
+        if not self._tasks or self._loop is not asyncio.get_running_loop():
+            self._tasks = []
+            return True
+
+        self.draining = True
+        self.wake()
+        try:
+            _, not_done = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in not_done:
+                task.cancel()
+            await asyncio.gather(*not_done, return_exceptions=True)
+        finally:
+            self._tasks = []
+            self.draining = False
+
+        return not not_done
+
+    async def _run(self) -> None:
+        try:
+            await self._target()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("%s stopped unexpectedly. It is restarted on the next event.", self._name)
+
+
+def log_discarded(count: int, timeout: Optional[float]) -> None:
+    logger.warning("Discarding %d event(s) not handled within %ss of shutdown.", count, timeout)
@@ -44,6 +44,9 @@ setuptools.setup(
         "Programming Language :: Python :: 3.11",
     },
     python_requires=">=3.7",
+    entry_points={
+        "console_scripts": ["fastapi-events-loadgen=fastapi_events.loadgen:main"],
+    },
     keywords=["starlette", "fastapi", "starlite", "pydantic"],
     extras_require={
         "aws": ["boto3>=1.14"],
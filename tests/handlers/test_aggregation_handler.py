@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.handlers.aggregation import (OVERFLOW_KEY,
+                                                 AggregationHandler)
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.typing import Event
+
+
+class DummyHandler(BaseEventHandler):
+    def __init__(self):
+        self.event_processed = []
+
+    async def handle_many(self, events) -> None:
+        self.event_processed.extend(events)
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+
+def summaries_of(handler: DummyHandler):
+    return sorted(((event_name, payload["key"], payload["count"], payload["sum"], payload["min"], payload["max"])
+                   for event_name, payload in handler.event_processed if event_name.endswith("_summary")),
+                  key=str)
+
+
+@pytest.mark.asyncio
+async def test_aggregation_handler_with_tumbling_windows():
+    wrapped_handler = DummyHandler()
+    handler = AggregationHandler(handler=wrapped_handler,
+                                 event_names=["api_called"],
+                                 key=lambda event: event[1]["path"],
+                                 value=lambda event: event[1]["duration"],
+                                 window=0.05)
+
+    await handler.handle_many([("api_called", {"path": "/orders", "duration": duration}) for duration in (3, 1, 2)])
+    await handler.handle_many([("api_called", {"path": "/users", "duration": 5}), ("user_created", {"id": 1})])
+
+    # events not aggregated are handed over right away
+    assert wrapped_handler.event_processed == [("user_created", {"id": 1})]
+
+    await asyncio.sleep(0.08)
+    assert summaries_of(wrapped_handler) == [("api_called_summary", "/orders", 3, 6.0, 1.0, 3.0),
+                                             ("api_called_summary", "/users", 1, 5.0, 5.0, 5.0)]
+
+    # keys without events for a whole window are released
+    await asyncio.sleep(0.05)
+    assert handler.key_count == 0
+    assert handler.summary_count == 2
+
+
+@pytest.mark.asyncio
+async def test_aggregation_handler_with_sliding_windows():
+    wrapped_handler = DummyHandler()
+    handler = AggregationHandler(handler=wrapped_handler, window=30, slide=10)
+
+    for count in (1, 2, 3, 4):
+        await handler.handle_many([("page_viewed", {})] * count)
+        await handler._tick()
+
+    # each summary covers the last 3 slides
+    assert [payload["count"] for _, payload in wrapped_handler.event_processed] == [1, 3, 6, 9]
+
+    # the summaries of the current windows are emitted on shutdown
+    await handler.handle(("page_viewed", {}))
+    await handler.shutdown()
+    assert wrapped_handler.event_processed[-1][1]["count"] == 8
+    assert handler.key_count == 0
+
+
+@pytest.mark.asyncio
+async def test_aggregation_handler_bounds_keys():
+    wrapped_handler = DummyHandler()
+    handler = AggregationHandler(handler=wrapped_handler, key=lambda event: event[1]["user_id"], max_keys=3)
+
+    await handler.handle_many([("page_viewed", {"user_id": idx % 4}) for idx in range(8)])
+    # 2 keys, and the overflow slot
+    assert handler.key_count == 3
+    assert handler.overflow_count == 4
+
+    # no slot is left for the overflow slot of another event name
+    await handler.handle(("page_clicked", {"user_id": 0}))
+    assert handler.key_count == 3
+    assert handler.dropped_count == 1
+
+    await handler.shutdown()
+    assert summaries_of(wrapped_handler) == [("page_viewed_summary", OVERFLOW_KEY, 4, 4.0, 1.0, 1.0),
+                                             ("page_viewed_summary", 0, 2, 2.0, 1.0, 1.0),
+                                             ("page_viewed_summary", 1, 2, 2.0, 1.0, 1.0)]
+
+
+def test_aggregation_handler_invalid_config():
+    with pytest.raises(ConfigurationError):
+        AggregationHandler(handler=DummyHandler(), window=10, slide=3)
+
+    with pytest.raises(ConfigurationError):
+        AggregationHandler(handler=DummyHandler(), window=0)
+
+    with pytest.raises(ConfigurationError):
+        AggregationHandler(handler=DummyHandler(), max_keys=0)
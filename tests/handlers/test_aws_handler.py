@@ -1,4 +1,7 @@
+import asyncio
+
 import boto3
+import pytest
 from moto import mock_sqs
 from starlette.applications import Starlette
 from starlette.middleware import Middleware
@@ -6,7 +9,9 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 from starlette.testclient import TestClient
 
+from fastapi_events.adaptive import AdaptiveBatchController
 from fastapi_events.dispatcher import dispatch
+from fastapi_events.errors import ConfigurationError
 from fastapi_events.handlers.aws import SQSForwardHandler
 from fastapi_events.middleware import EventHandlerASGIMiddleware
 
@@ -39,3 +44,27 @@ def test_aws_sqs_handler():
     for _ in range(5):
         messages = sqs.receive_message(QueueUrl=queue["QueueUrl"], MaxNumberOfMessages=10)["Messages"]
         assert len(messages) == 10
+
+
+@pytest.mark.asyncio
+async def test_aws_sqs_handler_with_batch_controller():
+    with mock_sqs():
+        sqs = boto3.client("sqs", region_name="eu-central-1")
+        queue = sqs.create_queue(QueueName="test-queue")
+
+        controller = AdaptiveBatchController(max_batch_size=10, min_linger=0.01)
+        handler = SQSForwardHandler(queue_url="test-queue", region_name="eu-central-1", batch_controller=controller)
+
+        await asyncio.gather(*[handler.handle(("new event", {"id": idx + 1})) for idx in range(20)])
+        await handler.shutdown()
+
+        assert controller.batches_sent == 2
+        assert controller.events_sent == 20
+        messages = sqs.receive_message(QueueUrl=queue["QueueUrl"], MaxNumberOfMessages=10)["Messages"]
+        assert len(messages) == 10
+
+
+def test_aws_sqs_handler_batch_controller_limit():
+    with pytest.raises(ConfigurationError):
+        SQSForwardHandler(queue_url="test-queue", region_name="eu-central-1",
+                          batch_controller=AdaptiveBatchController(max_batch_size=20))
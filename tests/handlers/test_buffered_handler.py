@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.handlers.buffered import BufferedHandler
+from fastapi_events.typing import Event
+
+
+class SlowHandler(BaseEventHandler):
+    def __init__(self, fail_times: int = 0):
+        self.fail_times = fail_times
+        self.is_open = asyncio.Event()
+        self.event_processed = []
+
+    async def handle_many(self, events) -> None:
+        await self.is_open.wait()
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError
+
+        self.event_processed.extend(events)
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+
+@pytest.mark.asyncio
+async def test_buffered_handler_spills_to_disk(tmp_path):
+    """
+    Test if events are spilled to disk while the wrapped handler is slow, and handed over in order once it catches up
+    """
+    wrapped_handler = SlowHandler(fail_times=1)
+    handler = BufferedHandler(handler=wrapped_handler,
+                              memory_limit=10,
+                              spill_directory=str(tmp_path),
+                              batch_size=20,
+                              retry_interval=0.01)
+    await handler.startup()
+
+    for idx in range(100):
+        await handler.handle(("event", {"id": idx}))
+
+    assert handler.queue.disk_count > 0
+
+    wrapped_handler.is_open.set()
+    await handler.shutdown()
+
+    assert wrapped_handler.event_processed == [("event", {"id": idx}) for idx in range(100)]
+    assert handler.handled_count == 100
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_buffered_handler_shutdown_timeout(tmp_path, caplog):
+    handler = BufferedHandler(handler=SlowHandler(), spill_directory=str(tmp_path), shutdown_timeout=0.01)
+    await handler.handle_many([("event", {"id": idx}) for idx in range(3)])
+    await handler.shutdown()
+
+    assert "Discarding 3 event(s)" in caplog.text
+    assert handler.pending == 0
+
+
+class LifecycleHandler(BaseEventHandler):
+    def __init__(self):
+        self.calls = []
+
+    async def handle(self, event: Event) -> None:
+        self.calls.append(event[0])
+
+    async def startup(self) -> None:
+        self.calls.append("startup")
+
+    async def shutdown(self) -> None:
+        self.calls.append("shutdown")
+
+
+@pytest.mark.asyncio
+async def test_buffered_handler_forwards_lifecycle(tmp_path):
+    """
+    Test if the wrapped handler is started up, and shut down once the events held are handed over
+    """
+    wrapped_handler = LifecycleHandler()
+    handler = BufferedHandler(handler=wrapped_handler, spill_directory=str(tmp_path))
+    await handler.startup()
+    await handler.handle(("new event", {"id": 1}))
+    await handler.shutdown()
+
+    assert wrapped_handler.calls == ["startup", "new event", "shutdown"]
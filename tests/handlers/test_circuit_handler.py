@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from fastapi_events.circuit import CircuitState
+from fastapi_events.errors import CircuitOpenError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.handlers.circuit import CircuitBreakerHandler
+from fastapi_events.typing import Event
+
+
+class HangingHandler(BaseEventHandler):
+    def __init__(self):
+        self.call_count = 0
+
+    async def handle(self, event: Event) -> None:
+        self.call_count += 1
+        await asyncio.sleep(10)
+
+
+class DummyHandler(BaseEventHandler):
+    def __init__(self):
+        self.event_processed = []
+
+    async def handle(self, event: Event) -> None:
+        self.event_processed.append(event)
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_handler_fails_fast():
+    wrapped_handler = HangingHandler()
+    handler = CircuitBreakerHandler(handler=wrapped_handler, timeout=0.01, failure_threshold=2)
+
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            await handler.handle(("event", {}))
+
+    assert handler.state is CircuitState.OPEN
+    with pytest.raises(CircuitOpenError):
+        await handler.handle(("event", {}))
+    assert wrapped_handler.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_handler_with_fallback():
+    fallback_handler = DummyHandler()
+    handler = CircuitBreakerHandler(handler=HangingHandler(),
+                                    timeout=0.01,
+                                    failure_threshold=1,
+                                    fallback_handler=fallback_handler)
+
+    await handler.handle(("event", {"id": 1}))  # times out, opens the circuit
+    await handler.handle(("event", {"id": 2}))  # rejected
+
+    assert fallback_handler.event_processed == [("event", {"id": 1}), ("event", {"id": 2})]
+    assert handler.breaker.rejected_count == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_handler_cancelled_trial_call():
+    wrapped_handler = HangingHandler()
+    handler = CircuitBreakerHandler(handler=wrapped_handler, timeout=None, failure_threshold=1, recovery_timeout=0)
+    handler.breaker.record_failure()
+    assert handler.state is CircuitState.HALF_OPEN
+
+    # a cancelled trial call gives its slot back
+    task = asyncio.create_task(handler.handle(("event", {})))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert handler.state is CircuitState.HALF_OPEN
+    assert handler.breaker.allow()
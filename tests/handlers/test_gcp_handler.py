@@ -1,11 +1,15 @@
+import asyncio
+from concurrent.futures import Future
 from unittest.mock import Mock, patch
 
+import pytest
 from starlette.applications import Starlette
 from starlette.middleware import Middleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 from starlette.testclient import TestClient
 
+from fastapi_events.adaptive import AdaptiveBatchController
 from fastapi_events.dispatcher import dispatch
 from fastapi_events.handlers.gcp import GoogleCloudSimplePubSubHandler
 from fastapi_events.middleware import EventHandlerASGIMiddleware
@@ -46,3 +50,25 @@ def test_gcp_pubsub_handler(mock_publisher_client: Mock):
     client.get("/")
 
     assert mock_publisher_client.return_value.publish.call_count == 50
+
+
+@pytest.mark.asyncio
+@patch("google.cloud.pubsub_v1.PublisherClient")
+async def test_gcp_pubsub_handler_with_batch_controller(mock_publisher_client: Mock):
+    def publish(topic_path, data):
+        future = Future()
+        future.set_result("message-id")
+        return future
+
+    mock_publisher_client.return_value.publish.side_effect = publish
+
+    controller = AdaptiveBatchController(max_batch_size=100, min_linger=0.01)
+    handler = GoogleCloudSimplePubSubHandler(project_id="gcp-project-id",
+                                             topic_id="gcp-topic-id",
+                                             batch_controller=controller)
+
+    await asyncio.gather(*[handler.handle(("event", {"idx": idx + 1})) for idx in range(50)])
+
+    assert mock_publisher_client.return_value.publish.call_count == 50
+    assert controller.batches_sent == 1
+    assert controller.metrics["avg_batch_size"] == 50
@@ -1,5 +1,8 @@
+import asyncio
+import logging
+import tracemalloc
 from enum import Enum
-from typing import Callable, Tuple
+from typing import Callable, List, Tuple
 from unittest.mock import MagicMock
 
 import pytest
@@ -10,16 +13,32 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 from starlette.testclient import TestClient
 
+import fastapi_events.handlers.local as local_handler_module
 from fastapi_events.dispatcher import dispatch
 from fastapi_events.handlers.local import LocalHandler
 from fastapi_events.middleware import EventHandlerASGIMiddleware
 from fastapi_events.otel.attributes import SpanAttributes
+from fastapi_events.profiling import HandlerProfiler
 from fastapi_events.typing import Event
 
 pytest_plugins = (
     "tests.fixtures.otel",
 )
 
+late_handler = LocalHandler()
+late_connections = []
+
+
+# registered before the dependency it refers to is defined
+@late_handler.register(event_name="order_placed")
+async def handle_order_placed_late(event: Event, connection: "LateConnection" = Depends()):
+    late_connections.append(connection)
+
+
+class LateConnection:
+    def __init__(self, event: Event):
+        self.event = event
+
 
 @pytest.fixture
 def setup_test() -> Callable:
@@ -242,3 +261,220 @@ def test_local_handler_with_nested_dependencies(
 
     client = TestClient(app)
     client.get("/events?event=TEST_EVENT")
+
+
+def test_local_handler_with_profiler(
+    caplog
+):
+    """
+    Test if profiling hooks are invoked around each registered handler,
+    and slow handlers are reported with a sampled stack
+    """
+    before_calls, invocations = [], []
+    profiler = HandlerProfiler(slow_threshold=0.05,
+                               capture_stack=True,
+                               sampling_interval=2,
+                               before_hooks=[lambda handler, event_name: before_calls.append(event_name)],
+                               after_hooks=[invocations.append])
+    handler = LocalHandler(profiler=profiler)
+    app = Starlette(middleware=[Middleware(EventHandlerASGIMiddleware, handlers=[handler])])
+
+    @handler.register(event_name="fast_event")
+    async def handle_fast_event(event: Event):
+        pass
+
+    @handler.register(event_name="slow_event")
+    async def handle_slow_event(event: Event):
+        await asyncio.sleep(0.1)
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        dispatch("fast_event")
+        dispatch("slow_event")
+        return JSONResponse([])
+
+    client = TestClient(app)
+    with caplog.at_level(logging.WARNING, logger="fastapi_events.profiling"):
+        client.get("/")
+
+    assert sorted(before_calls) == ["fast_event", "slow_event"]
+    assert {invocation.handler for invocation in invocations} == {handle_fast_event, handle_slow_event}
+
+    slow_invocation = next(invocation for invocation in invocations if invocation.event_name == "slow_event")
+    assert slow_invocation.wall_time >= 0.1
+    assert "handle_slow_event" in slow_invocation.stack
+    assert "Slow handler detected" in caplog.text
+    assert "handle_slow_event" in caplog.text
+
+    # one invocation in every 2 is sampled
+    assert len([invocation for invocation in invocations if invocation.snapshot is not None]) == 1
+
+
+@pytest.mark.asyncio
+async def test_profiler_with_overlapping_tracemalloc_samples():
+    """
+    Test if overlapping sampled invocations share tracemalloc, and all get a snapshot
+    """
+    invocations = []
+    profiler = HandlerProfiler(sampling_interval=1, sampling_mode="tracemalloc", after_hooks=[invocations.append])
+
+    async def invoke(delay: float):
+        with profiler.profile(handler=invoke, event_name="event"):
+            await asyncio.sleep(delay)
+
+    await asyncio.gather(invoke(0.01), invoke(0.05))
+
+    assert len(invocations) == 2
+    assert all(invocation.snapshot is not None for invocation in invocations)
+    assert not tracemalloc.is_tracing()
+
+
+def test_local_handler_in_partitioned_mode():
+    """
+    Test if events sharing a partition key are handled in order, while partitions are handled concurrently
+    """
+    handler = LocalHandler(partition_key=lambda event: event[1]["order_id"], partitions=4, partition_queue_size=2)
+    app = Starlette(middleware=[Middleware(EventHandlerASGIMiddleware, handlers=[handler])])
+
+    events_handled = []
+    in_progress = {"current": 0, "max": 0}
+
+    @handler.register(event_name="order_updated")
+    async def handle_order_updated(event: Event):
+        in_progress["current"] += 1
+        in_progress["max"] = max(in_progress["max"], in_progress["current"])
+        # earlier events take longer, to make sure they are not overtaken
+        await asyncio.sleep(0.01 * (5 - event[1]["seq"]))
+        events_handled.append(event[1])
+        in_progress["current"] -= 1
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        for seq in range(5):
+            for order_id in (1, 2, 3):
+                dispatch("order_updated", {"order_id": order_id, "seq": seq})
+        return JSONResponse([])
+
+    client = TestClient(app)
+    client.get("/")
+
+    assert len(events_handled) == 15
+    for order_id in (1, 2, 3):
+        assert [event["seq"] for event in events_handled if event["order_id"] == order_id] == list(range(5))
+    assert in_progress["max"] > 1
+
+
+def test_local_handler_with_batch_handlers(mocker):
+    """
+    Test if batch handlers receive the events of the same name in a single call,
+    with their dependencies resolved once per call
+    """
+    handler = LocalHandler()
+    app = Starlette(middleware=[Middleware(EventHandlerASGIMiddleware, handlers=[handler])])
+
+    batches, events_handled = [], []
+    _mock_db = MagicMock()
+    get_db = MagicMock(side_effect=lambda events: _mock_db)
+    spy = mocker.spy(local_handler_module, "get_dependant")
+
+    @handler.register(event_name="order_*", batch=True)
+    def save_orders(events: List[Event], db=Depends(get_db)):
+        batches.append(events)
+
+    @handler.register(event_name="order_placed")
+    async def handle_order_placed(event: Event):
+        events_handled.append(event)
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        for idx in range(3):
+            dispatch("order_placed", {"id": idx})
+            dispatch("order_cancelled", {"id": idx})
+        dispatch("user_created", {"id": 1})
+        return JSONResponse([])
+
+    client = TestClient(app)
+    client.get("/")
+    dependant_count = spy.call_count
+    client.get("/")
+    batches, events_handled = batches[:2], events_handled[:3]
+
+    assert sorted(batches, key=lambda batch: batch[0][0]) == [[("order_cancelled", {"id": idx}) for idx in range(3)],
+                                                              [("order_placed", {"id": idx}) for idx in range(3)]]
+    assert len(events_handled) == 3
+    assert get_db.call_count == 4
+    # dependencies are inspected on the first call only, including the dependency of save_orders
+    assert dependant_count == spy.call_count == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("partition_key", (None, lambda event: event[1]["id"]))
+async def test_local_handler_handle_with_batch_handlers(partition_key):
+    """
+    Test if a single event is handed over to both batch handlers and handlers of single events
+    """
+    handler = LocalHandler(partition_key=partition_key)
+    batches, events_handled = [], []
+
+    @handler.register(event_name="order_placed", batch=True)
+    async def save_orders(events: List[Event]):
+        batches.append(events)
+
+    @handler.register(event_name="order_placed")
+    async def handle_order_placed(event: Event):
+        events_handled.append(event)
+
+    await handler.handle(("order_placed", {"id": 1}))
+    await handler.shutdown()
+
+    assert batches == [[("order_placed", {"id": 1})]]
+    assert events_handled == [("order_placed", {"id": 1})]
+
+
+@pytest.mark.asyncio
+async def test_local_handler_with_payload_conditions(mocker):
+    """
+    Test if handlers registered with `where` only receive the events matching their conditions
+    """
+    handler = LocalHandler()
+    calls, batches = [], []
+
+    @handler.register(event_name="payment_*", where={"type": "refund", "currency": ["EUR", "USD"]})
+    async def handle_refund(event: Event):
+        calls.append(("refund", event[1]["id"]))
+
+    @handler.register(event_name="payment_*", where={"type": "charge"})
+    def handle_charge(event: Event):
+        calls.append(("charge", event[1]["id"]))
+
+    @handler.register(event_name="payment_*")
+    async def handle_payment(event: Event):
+        calls.append(("payment", event[1]["id"]))
+
+    @handler.register(event_name="payment_made", batch=True, where={"type": "refund"})
+    async def save_refunds(events: List[Event]):
+        batches.append([payload["id"] for _, payload in events])
+
+    spy = mocker.spy(local_handler_module, "solve_dependencies")
+    await handler.handle_many([
+        ("payment_made", {"id": 1, "type": "refund", "currency": "EUR"}),
+        ("payment_made", {"id": 2, "type": "refund", "currency": "JPY"}),
+        ("payment_made", {"id": 3, "type": "charge", "currency": "EUR"}),
+        ("payment_made", {"id": 4, "type": ["unhashable"]}),
+    ])
+
+    assert sorted(calls) == [("charge", 3), ("payment", 1), ("payment", 2), ("payment", 3), ("payment", 4),
+                             ("refund", 1)]
+    assert batches == [[1, 2]]
+    # handlers whose conditions do not pass are not called at all: 6 single events calls and 1 batch call
+    assert spy.call_count == 7
+
+
+@pytest.mark.asyncio
+async def test_local_handler_with_dependency_defined_after_registration():
+    """
+    Test if dependencies referring to names defined after the handler is registered are resolved
+    """
+    await late_handler.handle(("order_placed", {"id": 1}))
+
+    assert [connection.event for connection in late_connections] == [("order_placed", {"id": 1})]
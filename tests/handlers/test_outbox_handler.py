@@ -0,0 +1,141 @@
+import asyncio
+import sqlite3
+
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.testclient import TestClient
+
+from fastapi_events.dispatcher import dispatch
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.handlers.outbox import OutboxHandler
+from fastapi_events.middleware import EventHandlerASGIMiddleware
+from fastapi_events.typing import Event
+
+
+class DummyHandler(BaseEventHandler):
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.event_processed = []
+
+    async def handle(self, event: Event) -> None:
+        if self.fail:
+            raise ConnectionError
+
+        self.event_processed.append(event)
+
+
+def test_outbox_handler(tmp_path):
+    """
+    Test if events are written to the outbox and relayed to the wrapped handler
+    """
+    wrapped_handler = DummyHandler()
+    outbox_handler = OutboxHandler(handler=wrapped_handler, path=str(tmp_path / "outbox.db"))
+
+    app = Starlette(middleware=[Middleware(EventHandlerASGIMiddleware, handlers=[outbox_handler])])
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        for idx in range(50):
+            dispatch(event_name="new event", payload={"id": idx + 1})
+
+        return JSONResponse([])
+
+    # the lifespan shutdown drains the outbox
+    with TestClient(app) as client:
+        client.get("/")
+
+    assert wrapped_handler.event_processed == [("new event", {"id": idx + 1}) for idx in range(50)]
+    assert outbox_handler.relayed_count == 50
+
+
+@pytest.mark.asyncio
+async def test_outbox_handler_replays_on_startup(tmp_path):
+    """
+    Test if events not relayed are replayed from the last committed offset on startup
+    """
+    path = str(tmp_path / "outbox.db")
+
+    failing_handler = DummyHandler(fail=True)
+    outbox_handler = OutboxHandler(handler=failing_handler, path=path, shutdown_timeout=0.1, retry_interval=0.01)
+    await outbox_handler.startup()
+    await outbox_handler.handle_many([("event", {"id": idx}) for idx in range(3)])
+    assert await outbox_handler.pending_count() == 3
+    await outbox_handler.shutdown()
+
+    wrapped_handler = DummyHandler()
+    outbox_handler = OutboxHandler(handler=wrapped_handler, path=path)
+    await outbox_handler.startup()
+    await outbox_handler.handle(("event", {"id": 3}))
+    await outbox_handler.shutdown()
+
+    assert wrapped_handler.event_processed == [("event", {"id": idx}) for idx in range(4)]
+
+
+@pytest.mark.asyncio
+async def test_outbox_handler_group_commit(tmp_path):
+    """
+    Test if concurrent writes are committed together
+    """
+    outbox_handler = OutboxHandler(handler=DummyHandler(), path=str(tmp_path / "outbox.db"))
+    await outbox_handler.startup()
+
+    await asyncio.gather(*[outbox_handler.handle(("event", {"id": idx})) for idx in range(100)])
+    await outbox_handler.shutdown()
+
+    assert outbox_handler.commit_count < 100
+    assert outbox_handler.relayed_count == 100
+
+
+@pytest.mark.asyncio
+async def test_outbox_handler_restarts_relay(tmp_path, caplog):
+    """
+    Test if a relay failing to read the outbox is logged, and restarted on the next event
+    """
+    wrapped_handler = DummyHandler()
+    outbox_handler = OutboxHandler(handler=wrapped_handler, path=str(tmp_path / "outbox.db"))
+
+    fetch = outbox_handler._fetch
+
+    def failing_fetch(limit):
+        outbox_handler._fetch = fetch
+        raise sqlite3.OperationalError("disk I/O error")
+
+    outbox_handler._fetch = failing_fetch
+    await outbox_handler.startup()
+    await asyncio.sleep(0.05)
+    assert "Outbox relay stopped unexpectedly" in caplog.text
+
+    await outbox_handler.handle(("event", {"id": 1}))
+    await outbox_handler.shutdown()
+    assert wrapped_handler.event_processed == [("event", {"id": 1})]
+
+
+class LifecycleHandler(BaseEventHandler):
+    def __init__(self):
+        self.calls = []
+
+    async def handle(self, event: Event) -> None:
+        self.calls.append(event[0])
+
+    async def startup(self) -> None:
+        self.calls.append("startup")
+
+    async def shutdown(self) -> None:
+        self.calls.append("shutdown")
+
+
+@pytest.mark.asyncio
+async def test_outbox_handler_forwards_lifecycle(tmp_path):
+    """
+    Test if the wrapped handler is started up, and shut down once the events held are handed over
+    """
+    wrapped_handler = LifecycleHandler()
+    handler = OutboxHandler(handler=wrapped_handler, path=str(tmp_path / "outbox.db"))
+    await handler.startup()
+    await handler.handle(("new event", {"id": 1}))
+    await handler.shutdown()
+
+    assert wrapped_handler.calls == ["startup", "new event", "shutdown"]
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.testclient import TestClient
+
+from fastapi_events.dispatcher import dispatch
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.handlers.priority import PriorityHandler
+from fastapi_events.middleware import EventHandlerASGIMiddleware
+from fastapi_events.priority import Priority
+from fastapi_events.typing import Event
+
+
+class SlowHandler(BaseEventHandler):
+    def __init__(self):
+        self.event_processed = []
+
+    async def handle_many(self, events) -> None:
+        await asyncio.sleep(0.01)
+        self.event_processed.extend(events)
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+
+def test_priority_handler():
+    """
+    Test if higher priorities are served first, and the lowest priorities are shed first once overloaded
+    """
+    wrapped_handler = SlowHandler()
+    priority_handler = PriorityHandler(handler=wrapped_handler,
+                                       priorities={"billing_*": Priority.CRITICAL, "analytics_*": Priority.LOW},
+                                       max_pending=30,
+                                       batch_size=10)
+
+    app = Starlette(middleware=[Middleware(EventHandlerASGIMiddleware, handlers=[priority_handler])])
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        for idx in range(20):
+            dispatch(event_name="analytics_viewed", payload={"id": idx})
+            dispatch(event_name="user_logged_in", payload={"id": idx}, priority=Priority.HIGH)
+        for idx in range(5):
+            dispatch(event_name="billing_charged", payload={"id": idx})
+
+        return JSONResponse([])
+
+    # the lifespan shutdown drains the queue
+    with TestClient(app) as client:
+        client.get("/")
+
+    assert priority_handler.shed_counts[Priority.LOW] == 15
+    assert priority_handler.handled_counts == {Priority.CRITICAL: 5,
+                                               Priority.HIGH: 20,
+                                               Priority.NORMAL: 0,
+                                               Priority.LOW: 5}
+    first_batch = [event_name for event_name, _ in wrapped_handler.event_processed[:10]]
+    assert first_batch.count("billing_charged") == 5
+
+
+class LifecycleHandler(BaseEventHandler):
+    def __init__(self):
+        self.calls = []
+
+    async def handle(self, event: Event) -> None:
+        self.calls.append(event[0])
+
+    async def startup(self) -> None:
+        self.calls.append("startup")
+
+    async def shutdown(self) -> None:
+        self.calls.append("shutdown")
+
+
+@pytest.mark.asyncio
+async def test_priority_handler_forwards_lifecycle():
+    """
+    Test if the wrapped handler is started up, and shut down once the events held are handed over
+    """
+    wrapped_handler = LifecycleHandler()
+    handler = PriorityHandler(handler=wrapped_handler)
+    await handler.startup()
+    await handler.handle(("new event", {"id": 1}))
+    await handler.shutdown()
+
+    assert wrapped_handler.calls == ["startup", "new event", "shutdown"]
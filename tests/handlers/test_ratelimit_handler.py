@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.handlers.ratelimit import RateLimitedHandler
+from fastapi_events.typing import Event
+
+
+class DummyHandler(BaseEventHandler):
+    def __init__(self):
+        self.batches = []
+
+    async def handle_many(self, events) -> None:
+        self.batches.append(list(events))
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_handler_paces_batches():
+    """
+    Test if batches are paced as a whole, and split into chunks fitting the burst allowance
+    """
+    wrapped_handler = DummyHandler()
+    handler = RateLimitedHandler(handler=wrapped_handler, events_per_second=100, burst_events=10)
+
+    started_at = time.monotonic()
+    await handler.handle_many([("event", {"id": idx}) for idx in range(30)])
+
+    assert time.monotonic() - started_at >= 0.19
+    assert [len(batch) for batch in wrapped_handler.batches] == [10, 10, 10]
+    assert handler.forwarded_count == 30
+    # the first chunk is covered by the burst allowance
+    assert handler.throttled_time == pytest.approx(0.2, abs=0.02)
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_handler_bytes_per_second():
+    wrapped_handler = DummyHandler()
+    handler = RateLimitedHandler(handler=wrapped_handler,
+                                 bytes_per_second=1000,
+                                 burst_bytes=25,
+                                 size_of=lambda event: 10)
+
+    await handler.handle_many([("event", {"id": idx}) for idx in range(5)])
+
+    assert [len(batch) for batch in wrapped_handler.batches] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_handler_sheds():
+    wrapped_handler = DummyHandler()
+    handler = RateLimitedHandler(handler=wrapped_handler, events_per_second=1, burst_events=5, on_limit="shed")
+
+    await handler.handle_many([("event", {"id": idx}) for idx in range(8)])
+    await handler.handle(("event", {"id": 8}))
+
+    assert wrapped_handler.batches == [[("event", {"id": idx}) for idx in range(5)]]
+    assert handler.shed_count == 4
+
+
+def test_rate_limited_handler_invalid_config():
+    with pytest.raises(ConfigurationError):
+        RateLimitedHandler(handler=DummyHandler())
+
+    with pytest.raises(ConfigurationError):
+        RateLimitedHandler(handler=DummyHandler(), events_per_second=1, on_limit="drop")
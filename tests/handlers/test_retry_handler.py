@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.handlers.retry import FileDeadLetterHandler, RetryHandler
+from fastapi_events.retry import RetryPolicy
+from fastapi_events.typing import Event
+
+
+class FlakyHandler(BaseEventHandler):
+    def __init__(self, fail_times: int, exc: Exception = ConnectionError()):
+        self.fail_times = fail_times
+        self.exc = exc
+        self.attempts = 0
+        self.event_processed = []
+
+    async def handle_many(self, events) -> None:
+        self.attempts += 1
+        if self.attempts <= self.fail_times:
+            raise self.exc
+
+        self.event_processed.extend(events)
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+
+def test_retry_policy_backoff():
+    policy = RetryPolicy(max_attempts=4, initial_backoff=1, max_backoff=3, jitter=False, retry_on=(ConnectionError,))
+
+    assert [policy.backoff(attempt) for attempt in (1, 2, 3)] == [1, 2, 3]
+    assert policy.is_retryable(ConnectionError(), attempt=3)
+    assert not policy.is_retryable(ConnectionError(), attempt=4)
+    assert not policy.is_retryable(ValueError(), attempt=1)
+
+    jittered_policy = RetryPolicy(initial_backoff=1)
+    assert all(0 <= jittered_policy.backoff(1) <= 1 for _ in range(100))
+
+
+@pytest.mark.asyncio
+async def test_retry_handler_retries_in_background():
+    wrapped_handler = FlakyHandler(fail_times=2)
+    handler = RetryHandler(handler=wrapped_handler, policy=RetryPolicy(initial_backoff=0.01))
+
+    # the first failure does not hold back the caller
+    await handler.handle(("event", {"id": 1}))
+    assert wrapped_handler.event_processed == []
+    assert handler.pending == 1
+
+    await asyncio.sleep(0.1)
+    assert wrapped_handler.event_processed == [("event", {"id": 1})]
+    assert handler.retried_count == 2
+    assert handler.pending == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "wrapped_handler",
+    (FlakyHandler(fail_times=5),
+     FlakyHandler(fail_times=1, exc=ValueError())),
+)
+async def test_retry_handler_dead_letters(wrapped_handler, tmp_path):
+    path = tmp_path / "dead-letters.jsonl"
+    handler = RetryHandler(handler=wrapped_handler,
+                           policy=RetryPolicy(max_attempts=3, initial_backoff=0.01, retry_on=(ConnectionError,)),
+                           dead_letter_handler=FileDeadLetterHandler(path=str(path)))
+
+    await handler.handle_many([("event", {"id": 1}), ("event", {"id": 2})])
+    await asyncio.sleep(0.1)
+
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [
+        {"event_name": "event", "payload": {"id": 1}},
+        {"event_name": "event", "payload": {"id": 2}},
+    ]
+    assert handler.dead_lettered_count == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_handler_dead_letters_on_shutdown():
+    dead_letter_handler = FlakyHandler(fail_times=0)
+    handler = RetryHandler(handler=FlakyHandler(fail_times=1),
+                           policy=RetryPolicy(initial_backoff=10),
+                           dead_letter_handler=dead_letter_handler)
+
+    await handler.handle(("event", {"id": 1}))
+    await handler.shutdown()
+
+    assert dead_letter_handler.event_processed == [("event", {"id": 1})]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fail_times,expected_processed,expected_dead_lettered", [
+    (1, [("event", {"id": 1})], []),
+    (2, [], [("event", {"id": 1})]),
+])
+async def test_retry_handler_completes_retry_in_flight_on_shutdown(fail_times, expected_processed,
+                                                                   expected_dead_lettered):
+    retrying = asyncio.Event()
+
+    class SlowHandler(FlakyHandler):
+        async def handle_many(self, events) -> None:
+            if self.attempts:
+                retrying.set()
+                await asyncio.sleep(0.05)
+            await super().handle_many(events)
+
+    wrapped_handler = SlowHandler(fail_times=fail_times)
+    dead_letter_handler = FlakyHandler(fail_times=0)
+    handler = RetryHandler(handler=wrapped_handler,
+                           policy=RetryPolicy(initial_backoff=0.01, jitter=False),
+                           dead_letter_handler=dead_letter_handler)
+
+    await handler.handle(("event", {"id": 1}))
+    await retrying.wait()
+    await handler.shutdown()
+
+    assert wrapped_handler.event_processed == expected_processed
+    assert dead_letter_handler.event_processed == expected_dead_lettered
+    assert handler.pending == 0
@@ -0,0 +1,99 @@
+import pytest
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.handlers.router import Route, RouterHandler
+from fastapi_events.typing import Event
+
+
+class DummyHandler(BaseEventHandler):
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = []
+        self.started = False
+
+    async def startup(self) -> None:
+        self.started = True
+
+    async def handle_many(self, events) -> None:
+        if self.fail:
+            raise ConnectionError()
+        self.batches.append(list(events))
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+
+@pytest.mark.asyncio
+async def test_router_handler():
+    sqs_handler, analytics_handler, default_handler = DummyHandler(), DummyHandler(), DummyHandler()
+    router = RouterHandler(routes=[
+        Route(sqs_handler, event_name="order_*", where={"visibility": "public"}),
+        Route(sqs_handler, event_name="order_cancelled", name="cancellations"),
+        Route(analytics_handler, event_name="*", predicate=lambda event: event[1].get("amount", 0) > 100),
+    ], default_handler=default_handler)
+
+    await router.startup()
+    assert sqs_handler.started and analytics_handler.started and default_handler.started
+
+    await router.handle_many([
+        ("order_placed", {"id": 1, "visibility": "public", "amount": 500}),
+        ("order_placed", {"id": 2, "visibility": "internal"}),
+        ("order_cancelled", {"id": 3, "visibility": "public"}),
+        ("user_created", {"id": 4}),
+    ])
+
+    # each handler receives a single batch, with the events it needs only
+    assert [[payload["id"] for _, payload in batch] for batch in sqs_handler.batches] == [[1, 3]]
+    assert [[payload["id"] for _, payload in batch] for batch in analytics_handler.batches] == [[1]]
+    assert [[payload["id"] for _, payload in batch] for batch in default_handler.batches] == [[2, 4]]
+
+    assert {name: stats.routed for name, stats in router.stats.items()} == {"order_*": 2, "cancellations": 1, "*": 1}
+    assert router.unrouted_count == 2
+
+
+@pytest.mark.asyncio
+async def test_router_handler_first_match():
+    first_handler, second_handler = DummyHandler(), DummyHandler()
+    router = RouterHandler(routes=[Route(first_handler, event_name="order_*"), Route(second_handler)],
+                           first_match=True)
+
+    await router.handle_many([("order_placed", {"id": 1}), ("user_created", {"id": 2})])
+
+    assert first_handler.batches == [[("order_placed", {"id": 1})]]
+    assert second_handler.batches == [[("user_created", {"id": 2})]]
+
+
+@pytest.mark.asyncio
+async def test_router_handler_failures():
+    failing_handler, handler = DummyHandler(fail=True), DummyHandler()
+    router = RouterHandler(routes=[Route(failing_handler, name="failing"), Route(handler, name="working")])
+
+    # a failing handler does not hold back the others
+    with pytest.raises(ConnectionError):
+        await router.handle(("event", {"id": 1}))
+
+    assert handler.batches == [[("event", {"id": 1})]]
+    assert router.stats["failing"].failed == 1
+    assert router.stats["working"].failed == 0
+
+
+@pytest.mark.asyncio
+async def test_router_handler_failures_of_handler_shared_by_routes():
+    failing_handler = DummyHandler(fail=True)
+    router = RouterHandler(routes=[Route(failing_handler, event_name="order_*", name="orders"),
+                                   Route(failing_handler, where={"priority": "high"}, name="high_priority")])
+
+    with pytest.raises(ConnectionError):
+        await router.handle_many([("order_placed", {"priority": "high"}), ("order_placed", {"priority": "low"})])
+
+    assert router.stats["orders"].failed == 2
+    assert router.stats["high_priority"].failed == 1
+
+
+def test_router_handler_invalid_config():
+    with pytest.raises(ConfigurationError):
+        RouterHandler(routes=[Route(DummyHandler(), event_name="order_*"), Route(DummyHandler(), event_name="order_*")])
+
+    with pytest.raises(ConfigurationError):
+        Route(DummyHandler(), predicate="not callable")
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.handlers.sampling import SamplingHandler
+from fastapi_events.priority import PrioritizedEvent, Priority
+from fastapi_events.typing import Event
+
+
+class DummyHandler(BaseEventHandler):
+    def __init__(self):
+        self.event_processed = []
+
+    async def handle_many(self, events) -> None:
+        self.event_processed.extend(events)
+
+    async def handle(self, event: Event) -> None:
+        await self.handle_many([event])
+
+
+@pytest.mark.asyncio
+async def test_sampling_handler():
+    wrapped_handler = DummyHandler()
+    handler = SamplingHandler(handler=wrapped_handler, rates={"page_*": 0.1})
+
+    await handler.handle_many([("page_viewed", {"id": idx}) for idx in range(10_000)])
+    await handler.handle(("order_placed", {"id": 1}))
+
+    page_views = [payload for event_name, payload in wrapped_handler.event_processed if event_name == "page_viewed"]
+    assert 800 < len(page_views) < 1200
+    assert all(payload["sample_rate"] == 0.1 for payload in page_views)
+    assert handler.dropped_count == 10_000 - len(page_views)
+
+    # events of a rate of 1 are handed over as is
+    assert wrapped_handler.event_processed[-1] == ("order_placed", {"id": 1})
+
+
+@pytest.mark.asyncio
+async def test_sampling_handler_with_key():
+    events = [PrioritizedEvent("api_called", {"user_id": idx % 100}, priority=Priority.LOW) for idx in range(1_000)]
+    samples = []
+    for _ in range(2):
+        wrapped_handler = DummyHandler()
+        handler = SamplingHandler(handler=wrapped_handler, rate=0.5, key=lambda event: event[1]["user_id"])
+        await handler.handle_many(events)
+        samples.append(wrapped_handler.event_processed)
+
+    # the events of a user are either all kept or all dropped, consistently
+    kept_users = {payload["user_id"] for _, payload in samples[0]}
+    assert 0 < len(kept_users) < 100
+    assert len(samples[0]) == len(kept_users) * 10
+    assert samples[0] == samples[1]
+    assert all(event.priority == Priority.LOW for event in samples[0])
+
+
+@pytest.mark.asyncio
+async def test_sampling_handler_with_reservoir():
+    wrapped_handler = DummyHandler()
+    handler = SamplingHandler(handler=wrapped_handler, reservoir_size=5, window=0.05)
+
+    await handler.handle_many([("api_called", {"id": idx}) for idx in range(100)])
+    await handler.handle_many([("page_viewed", {"id": idx}) for idx in range(2)])
+    assert wrapped_handler.event_processed == []
+
+    # a sample is handed over at the end of the window
+    await asyncio.sleep(0.1)
+    api_calls = [payload for event_name, payload in wrapped_handler.event_processed if event_name == "api_called"]
+    page_views = [payload for event_name, payload in wrapped_handler.event_processed if event_name == "page_viewed"]
+    assert len(api_calls) == 5 and len({payload["id"] for payload in api_calls}) == 5
+    assert all(payload["sample_rate"] == 0.05 for payload in api_calls)
+    assert page_views == [{"id": 0}, {"id": 1}]
+
+    # the sample of the current window is handed over on shutdown
+    handler = SamplingHandler(handler=wrapped_handler, reservoir_size=5, window=10)
+    await handler.handle(("api_called", {"id": 100}))
+    await handler.shutdown()
+    assert wrapped_handler.event_processed[-1] == ("api_called", {"id": 100})
+
+
+def test_sampling_handler_invalid_config():
+    with pytest.raises(ConfigurationError):
+        SamplingHandler(handler=DummyHandler(), rate=1.5)
+
+    with pytest.raises(ConfigurationError):
+        SamplingHandler(handler=DummyHandler(), rates={"page_*": -0.1})
+
+    with pytest.raises(ConfigurationError):
+        SamplingHandler(handler=DummyHandler(), reservoir_size=0)
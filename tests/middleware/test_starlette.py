@@ -1,5 +1,7 @@
 import asyncio
+import time
 from contextlib import suppress
+from datetime import datetime, timedelta, timezone
 
 import pytest
 from starlette.applications import Starlette
@@ -8,9 +10,17 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 from starlette.testclient import TestClient
 
+from fastapi_events import timer_store
+from fastapi_events.coalescing import CoalescingPolicy
+from fastapi_events.commit import (CommitAction, always_process,
+                                   commit_on_success)
 from fastapi_events.dispatcher import dispatch
+from fastapi_events.errors import (ConfigurationError,
+                                   MultipleSchedulesDetectedDuringDispatch)
+from fastapi_events.fairness import FairScheduler
 from fastapi_events.handlers.base import BaseEventHandler
 from fastapi_events.middleware import EventHandlerASGIMiddleware
+from fastapi_events.profiling import HandlerProfiler
 from fastapi_events.typing import Event
 
 
@@ -98,7 +108,7 @@ async def test_event_handling_without_request(middleware_id):
     _app.build_middleware_stack()
 
     if middleware_id is None:
-        with pytest.raises(LookupError, match=r"^<ContextVar name='fastapi_middleware_identifier' at"):
+        with pytest.raises(LookupError, match=r"^<ContextVar name='fastapi_event_context' at"):
             dispatch(event_name="new event", payload={"id": "fail"}, middleware_id=middleware_id)
     else:
         for idx in range(5):
@@ -108,3 +118,597 @@ async def test_event_handling_without_request(middleware_id):
         await asyncio.sleep(0.1)
 
         assert len(dummy_handler_1.event_processed) == len(dummy_handler_2.event_processed) == 5
+
+
+def test_event_handling_with_profiler():
+    """
+    Making sure profiling hooks are invoked around each handler's handle_many()
+    """
+
+    class DummyHandler(BaseEventHandler):
+        async def handle(self, event: Event) -> None:
+            pass
+
+    dummy_handler_1 = DummyHandler()
+    dummy_handler_2 = DummyHandler()
+    invocations = []
+
+    app = Starlette(middleware=[
+        Middleware(EventHandlerASGIMiddleware,
+                   handlers=[dummy_handler_1, dummy_handler_2],
+                   profiler=HandlerProfiler(after_hooks=[invocations.append]))])
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        for idx in range(5):
+            dispatch(event_name="new event", payload={"id": idx + 1})
+
+        return JSONResponse([])
+
+    client = TestClient(app)
+    client.get("/")
+
+    assert [invocation.handler for invocation in invocations] == [dummy_handler_1, dummy_handler_2]
+    assert all(invocation.event_count == 5 for invocation in invocations)
+
+
+def test_event_handling_without_events_dispatched(mocker):
+    """
+    Making sure events are not processed for requests that dispatch nothing
+    """
+
+    class DummyHandler(BaseEventHandler):
+        async def handle(self, event: Event) -> None:
+            pass
+
+    dummy_handler = DummyHandler()
+    spy_handle_many = mocker.spy(dummy_handler, "handle_many")
+
+    app = Starlette(middleware=[
+        Middleware(EventHandlerASGIMiddleware,
+                   handlers=[dummy_handler])])
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        return JSONResponse([])
+
+    @app.route("/events")
+    async def events(request: Request) -> JSONResponse:
+        dispatch(event_name="new event")
+        return JSONResponse([])
+
+    client = TestClient(app)
+    client.get("/")
+    assert not spy_handle_many.called
+
+    client.get("/events")
+    assert spy_handle_many.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "scope,should_be_handled_in_request",
+    (({"type": "http", "method": "GET", "path": "/orders"}, True),
+     ({"type": "http", "method": "POST", "path": "/orders/1"}, True),
+     ({"type": "http", "method": "GET", "path": "/health"}, False),
+     ({"type": "http", "method": "GET", "path": "/static/app.js"}, False),
+     ({"type": "http", "method": "OPTIONS", "path": "/orders"}, False),
+     ({"type": "http", "method": "GET", "path": "/users"}, False),
+     ({"type": "websocket", "path": "/orders/ws"}, True))
+)
+@pytest.mark.asyncio
+async def test_event_handling_with_scoped_activation(scope, should_be_handled_in_request):
+    """
+    Making sure requests out of scope are passed straight to the app, and events dispatched
+    from them are handled as if they were dispatched outside of a request
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.event_processed = []
+            self.handle_many_called = False
+
+        async def handle_many(self, events) -> None:
+            self.handle_many_called = True
+            await super().handle_many(events)
+
+        async def handle(self, event: Event) -> None:
+            self.event_processed.append(event)
+
+    async def app(scope, receive, send):
+        dispatch(event_name="new event")
+
+    dummy_handler = DummyHandler()
+    middleware = EventHandlerASGIMiddleware(app,
+                                            handlers=[dummy_handler],
+                                            include_paths=["/orders*"],
+                                            exclude_paths=["/health", "/static/*"],
+                                            exclude_methods=["options"])
+
+    await middleware(scope, None, None)
+    await asyncio.sleep(0.01)
+
+    assert len(dummy_handler.event_processed) == 1
+    assert dummy_handler.handle_many_called == should_be_handled_in_request
+
+
+@pytest.mark.parametrize(
+    "flush_kwargs",
+    ({"flush_threshold": 4},
+     {"flush_on_message": True})
+)
+@pytest.mark.asyncio
+async def test_incremental_event_flushing_for_websockets(flush_kwargs):
+    """
+    Making sure events are processed while a WebSocket connection is still open
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.event_processed = []
+
+        async def handle(self, event: Event) -> None:
+            self.event_processed.append(event)
+
+    dummy_handler = DummyHandler()
+    processed_on_receive = []
+
+    async def app(scope, receive, send):
+        for _ in range(3):
+            await receive()
+            for idx in range(4):
+                dispatch(event_name="new message", payload={"id": idx})
+            await send({"type": "websocket.send", "text": "OK"})
+
+    async def receive():
+        await asyncio.sleep(0.01)
+        processed_on_receive.append(len(dummy_handler.event_processed))
+        return {"type": "websocket.receive", "text": "hello"}
+
+    async def send(message):
+        pass
+
+    middleware = EventHandlerASGIMiddleware(app, handlers=[dummy_handler], **flush_kwargs)
+    await middleware({"type": "websocket", "path": "/ws"}, receive, send)
+
+    assert processed_on_receive == [0, 4, 8]
+    assert len(dummy_handler.event_processed) == 12
+
+
+@pytest.mark.asyncio
+async def test_incremental_event_flushing_by_interval():
+    """
+    Making sure events are processed periodically while a long response is still being sent
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.event_processed = []
+
+        async def handle(self, event: Event) -> None:
+            self.event_processed.append(event)
+
+    dummy_handler = DummyHandler()
+    processed_before_response_ends = []
+
+    async def app(scope, receive, send):
+        dispatch(event_name="new event")
+        await asyncio.sleep(0.1)
+        processed_before_response_ends.append(len(dummy_handler.event_processed))
+
+    middleware = EventHandlerASGIMiddleware(app, handlers=[dummy_handler], flush_interval=0.02)
+    await middleware({"type": "http", "method": "GET", "path": "/"}, None, None)
+
+    assert processed_before_response_ends == [1]
+    assert len(dummy_handler.event_processed) == 1
+
+
+@pytest.mark.parametrize(
+    "early_flush_on,expected_processed_per_chunk",
+    (("http.response.start", [1, 1, 2]),
+     ("http.response.body", [0, 1, 2]))
+)
+@pytest.mark.asyncio
+async def test_early_event_processing_for_streaming_responses(early_flush_on, expected_processed_per_chunk):
+    """
+    Making sure events are processed as soon as a streaming response has started to go out
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.event_processed = []
+
+        async def handle(self, event: Event) -> None:
+            self.event_processed.append(event)
+
+    dummy_handler = DummyHandler()
+    processed_per_chunk = []
+
+    async def app(scope, receive, send):
+        dispatch(event_name="stream started")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for idx in range(3):
+            await asyncio.sleep(0.01)
+            processed_per_chunk.append(len(dummy_handler.event_processed))
+            if idx == 1:
+                dispatch(event_name="stream halfway")
+            await send({"type": "http.response.body", "body": b"chunk", "more_body": idx < 2})
+
+    async def send(message):
+        pass
+
+    middleware = EventHandlerASGIMiddleware(app, handlers=[dummy_handler], early_flush_on=early_flush_on)
+    await middleware({"type": "http", "method": "GET", "path": "/"}, None, send)
+
+    assert processed_per_chunk == expected_processed_per_chunk
+    assert [event for event, _ in dummy_handler.event_processed] == ["stream started", "stream halfway"]
+
+
+def test_early_event_processing_with_invalid_message_type():
+    with pytest.raises(ConfigurationError):
+        EventHandlerASGIMiddleware(None, handlers=[], early_flush_on="websocket.send")
+
+
+@pytest.mark.parametrize(
+    "status_code,raise_error,expected_processed,expected_diverted",
+    ((200, False, ["order_created", "audit_logged", "cache_invalidated"], []),
+     (500, False, ["audit_logged"], ["order_created"]),
+     (400, False, ["audit_logged"], ["order_created"]),
+     (None, True, ["audit_logged"], ["order_created"]))
+)
+def test_event_handling_with_commit_policy(
+    status_code, raise_error, expected_processed, expected_diverted
+):
+    """
+    Making sure events are processed, dropped or diverted according to the response status
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.event_processed = []
+
+        async def handle(self, event: Event) -> None:
+            self.event_processed.append(event[0])
+
+    dummy_handler = DummyHandler()
+    divert_handler = DummyHandler()
+
+    app = Starlette(middleware=[
+        Middleware(EventHandlerASGIMiddleware,
+                   handlers=[dummy_handler],
+                   commit_policy=commit_on_success(otherwise=CommitAction.DIVERT),
+                   commit_policies={"audit_*": always_process,
+                                    "cache_*": commit_on_success()},
+                   divert_handlers=[divert_handler])])
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        dispatch(event_name="order_created")
+        dispatch(event_name="audit_logged")
+        dispatch(event_name="cache_invalidated")
+
+        if raise_error:
+            raise ValueError
+
+        return JSONResponse([], status_code=status_code)
+
+    client = TestClient(app)
+    with suppress(ValueError):
+        client.get("/")
+
+    assert dummy_handler.event_processed == expected_processed
+    assert divert_handler.event_processed == expected_diverted
+
+
+def test_handler_lifecycle_on_lifespan_events():
+    """
+    Making sure handlers are started up and shut down on ASGI lifespan events
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.lifecycle = []
+
+        async def handle(self, event: Event) -> None:
+            pass
+
+        async def startup(self) -> None:
+            self.lifecycle.append("startup")
+
+        async def shutdown(self) -> None:
+            self.lifecycle.append("shutdown")
+
+    dummy_handler = DummyHandler()
+    divert_handler = DummyHandler()
+
+    app = Starlette(
+        middleware=[Middleware(EventHandlerASGIMiddleware,
+                               handlers=[dummy_handler],
+                               divert_handlers=[divert_handler])],
+        on_startup=[lambda: dummy_handler.lifecycle.append("app startup")],
+        on_shutdown=[lambda: dummy_handler.lifecycle.append("app shutdown")])
+
+    with TestClient(app):
+        pass
+
+    assert dummy_handler.lifecycle == ["startup", "app startup", "app shutdown", "shutdown"]
+    assert divert_handler.lifecycle == ["startup", "shutdown"]
+
+
+def test_event_coalescing_in_request():
+    """
+    Making sure events sharing a key are coalesced before being processed
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.event_processed = []
+
+        async def handle(self, event: Event) -> None:
+            self.event_processed.append(event)
+
+    dummy_handler = DummyHandler()
+
+    app = Starlette(middleware=[
+        Middleware(EventHandlerASGIMiddleware,
+                   handlers=[dummy_handler],
+                   coalescing_policies={
+                       "order_updated": CoalescingPolicy(key=lambda payload: payload["id"]),
+                       "cart_*": CoalescingPolicy(key=lambda payload: payload["id"],
+                                                  merge=lambda old, new: {**old, **new}),
+                   })])
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        for status in ("created", "paid", "shipped"):
+            dispatch(event_name="order_updated", payload={"id": 1, "status": status})
+        dispatch(event_name="order_updated", payload={"id": 2, "status": "created"})
+        dispatch(event_name="cart_updated", payload={"id": 1, "item": "apple"})
+        dispatch(event_name="user_logged_in", payload={"id": 1})
+        dispatch(event_name="cart_updated", payload={"id": 1, "coupon": "SALE"})
+
+        return JSONResponse([])
+
+    client = TestClient(app)
+    client.get("/")
+
+    assert dummy_handler.event_processed == [
+        ("order_updated", {"id": 1, "status": "shipped"}),
+        ("order_updated", {"id": 2, "status": "created"}),
+        ("user_logged_in", {"id": 1}),
+        ("cart_updated", {"id": 1, "item": "apple", "coupon": "SALE"}),
+    ]
+
+
+def test_event_coalescing_with_failing_key(caplog):
+    """
+    Making sure an event whose coalescing key fails is passed through, without dropping the other events
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.event_processed = []
+
+        async def handle(self, event: Event) -> None:
+            self.event_processed.append(event)
+
+    dummy_handler = DummyHandler()
+
+    app = Starlette(middleware=[
+        Middleware(EventHandlerASGIMiddleware,
+                   handlers=[dummy_handler],
+                   coalescing_policies={"order_updated": CoalescingPolicy(key=lambda payload: payload["id"])})])
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        dispatch(event_name="order_updated", payload={"id": 1, "status": "created"})
+        dispatch(event_name="order_updated", payload={"status": "unknown"})
+        dispatch(event_name="order_updated", payload={"id": 1, "status": "paid"})
+        dispatch(event_name="user_logged_in", payload={"id": 1})
+
+        return JSONResponse([])
+
+    client = TestClient(app)
+    client.get("/")
+
+    assert dummy_handler.event_processed == [
+        ("order_updated", {"status": "unknown"}),
+        ("order_updated", {"id": 1, "status": "paid"}),
+        ("user_logged_in", {"id": 1}),
+    ]
+    assert "Failed to get the coalescing key of event order_updated" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_event_coalescing_in_batch_window():
+    """
+    Making sure events dispatched outside of a request are processed in micro-batches, and coalesced
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.batches = []
+
+        async def handle_many(self, events) -> None:
+            self.batches.append(list(events))
+
+        async def handle(self, event: Event) -> None:
+            pass
+
+    dummy_handler = DummyHandler()
+
+    _app = Starlette(middleware=[
+        Middleware(EventHandlerASGIMiddleware,
+                   handlers=[dummy_handler],
+                   middleware_id=4444,
+                   coalescing_policies={"order_updated": CoalescingPolicy(key=lambda payload: payload["id"])},
+                   batch_window=0.05)])
+    _app.build_middleware_stack()
+
+    for idx in range(10):
+        dispatch(event_name="order_updated", payload={"id": idx % 2, "seq": idx}, middleware_id=4444)
+
+    assert dummy_handler.batches == []
+
+    # allow time for the batch window to close
+    await asyncio.sleep(0.1)
+
+    assert dummy_handler.batches == [[("order_updated", {"id": 0, "seq": 8}),
+                                      ("order_updated", {"id": 1, "seq": 9})]]
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduling_across_tenants():
+    """
+    Making sure events of requests and of the batch window are scheduled fairly across tenants
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.batches = []
+
+        async def handle_many(self, events) -> None:
+            self.batches.append([payload["tenant"] for _, payload in events])
+
+        async def handle(self, event: Event) -> None:
+            pass
+
+    dummy_handler = DummyHandler()
+    scheduler = FairScheduler(tenant_key=lambda event: event[1]["tenant"], quantum=1, batch_size=4)
+
+    app = Starlette(middleware=[
+        Middleware(EventHandlerASGIMiddleware,
+                   handlers=[dummy_handler],
+                   middleware_id=5555,
+                   fair_scheduler=scheduler,
+                   batch_window=0.01)])
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        for _ in range(6):
+            dispatch(event_name="new event", payload={"tenant": "noisy"})
+        dispatch(event_name="new event", payload={"tenant": "quiet"})
+        return JSONResponse([])
+
+    client = TestClient(app)
+    client.get("/")
+
+    assert dummy_handler.batches == [["noisy", "quiet", "noisy", "noisy"], ["noisy", "noisy", "noisy"]]
+
+    dummy_handler.batches.clear()
+    dispatch(event_name="new event", payload={"tenant": "noisy"}, middleware_id=5555)
+    dispatch(event_name="new event", payload={"tenant": "quiet"}, middleware_id=5555)
+    await asyncio.sleep(0.05)
+
+    assert dummy_handler.batches == [["noisy", "quiet"]]
+    assert scheduler.stats["noisy"].processed == 7
+    assert scheduler.stats["quiet"].processed == 2
+
+
+def test_handler_failures_are_isolated(caplog):
+    """
+    Making sure a failing handler does not prevent the other handlers from handling events
+    """
+
+    class FailingHandler(BaseEventHandler):
+        async def handle(self, event: Event) -> None:
+            raise ConnectionError
+
+    class SlowHandler(BaseEventHandler):
+        def __init__(self):
+            self.event_processed = []
+
+        async def handle(self, event: Event) -> None:
+            await asyncio.sleep(0.05)
+            self.event_processed.append(event)
+
+    slow_handler = SlowHandler()
+    app = Starlette(middleware=[Middleware(EventHandlerASGIMiddleware, handlers=[FailingHandler(), slow_handler])])
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        dispatch(event_name="new event")
+        return JSONResponse([])
+
+    client = TestClient(app)
+    response = client.get("/")
+
+    assert response.status_code == 200
+    assert slow_handler.event_processed == [("new event", None)]
+    assert "FailingHandler failed to handle 1 event(s)" in caplog.text
+
+
+def test_delayed_dispatch():
+    """
+    Making sure delayed events are processed once due, in a batch, unless cancelled
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.batches = []
+
+        async def handle_many(self, events) -> None:
+            self.batches.append(list(events))
+
+        async def handle(self, event: Event) -> None:
+            pass
+
+    dummy_handler = DummyHandler()
+    app = Starlette(middleware=[Middleware(EventHandlerASGIMiddleware, handlers=[dummy_handler], timer_tick=0.01)])
+
+    @app.route("/")
+    async def root(request: Request) -> JSONResponse:
+        dispatch(event_name="reminder_due", payload={"id": 1}, delay=0.05)
+        dispatch(event_name="reminder_due", payload={"id": 2}, delay=timedelta(seconds=0.05))
+        dispatch(event_name="reminder_due", payload={"id": 3}, delay=0.05).cancel()
+        return JSONResponse([])
+
+    with TestClient(app) as client:
+        client.get("/")
+        assert dummy_handler.batches == []
+
+        time.sleep(0.2)
+        assert dummy_handler.batches == [[("reminder_due", {"id": 1}), ("reminder_due", {"id": 2})]]
+
+
+def test_delayed_dispatch_survives_restart(tmp_path):
+    """
+    Making sure delayed events not due on shutdown are saved, and scheduled again on startup
+    """
+
+    class DummyHandler(BaseEventHandler):
+        def __init__(self):
+            self.events = []
+
+        async def handle(self, event: Event) -> None:
+            self.events.append(event)
+
+    path = str(tmp_path / "delayed.jsonl")
+
+    def create_app(handler: BaseEventHandler) -> Starlette:
+        app = Starlette(middleware=[Middleware(EventHandlerASGIMiddleware,
+                                               handlers=[handler],
+                                               middleware_id=6666,
+                                               delayed_events_path=path)])
+
+        @app.route("/")
+        async def root(request: Request) -> JSONResponse:
+            dispatch(event_name="past_due", at=time.time() - 1)
+            dispatch(event_name="reminder_due", payload={"id": 1}, at=datetime(2100, 1, 1, tzinfo=timezone.utc))
+            return JSONResponse([])
+
+        return app
+
+    dummy_handler = DummyHandler()
+    with TestClient(create_app(dummy_handler)) as client:
+        client.get("/")
+
+    # events past due are processed on shutdown
+    assert dummy_handler.events == [("past_due", None)]
+
+    with TestClient(create_app(DummyHandler())):
+        assert timer_store[6666].pending == 1
+
+
+def test_delayed_dispatch_with_delay_and_at():
+    with pytest.raises(MultipleSchedulesDetectedDuringDispatch):
+        dispatch(event_name="reminder_due", delay=1, at=time.time() + 1, middleware_id=6666)
@@ -110,7 +110,7 @@ async def test_event_handling_without_request(middleware_id):
     )
 
     if middleware_id is None:
-        with pytest.raises(LookupError, match=r"^<ContextVar name='fastapi_middleware_identifier' at"):
+        with pytest.raises(LookupError, match=r"^<ContextVar name='fastapi_event_context' at"):
             dispatch(event_name="new event", payload={"id": "fail"}, middleware_id=middleware_id)
     else:
         for idx in range(5):
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from fastapi_events.adaptive import AdaptiveBatchController, AdaptiveBatcher
+from fastapi_events.errors import ConfigurationError
+
+
+def test_adaptive_batch_controller_batch_size():
+    now = 0.0
+    controller = AdaptiveBatchController(min_batch_size=2, max_batch_size=100, latency_target=0.1,
+                                         smoothing=1, clock=lambda: now)
+    assert controller.batch_size == 100
+
+    # slow sends shrink batches, down to min_batch_size
+    for _ in range(10):
+        controller.record_send(size=controller.batch_size, latency=0.5)
+    assert controller.batch_size == 2
+
+    # fast full batches grow them back, step by step
+    controller.record_send(size=2, latency=0.01)
+    assert controller.batch_size == 12
+
+    # failures shrink them
+    controller.record_send(size=12, latency=0.01, failed=True)
+    assert controller.batch_size == 6
+
+    metrics = controller.metrics
+    assert metrics["batch_size"] == 6
+    assert metrics["batches_sent"] == 12
+    assert metrics["batches_failed"] == 1
+    assert metrics["decreases"] == 7
+    assert metrics["increases"] == 1
+
+
+def test_adaptive_batch_controller_linger():
+    now = 0.0
+    controller = AdaptiveBatchController(max_batch_size=10, max_linger=0.05, latency_target=0.1,
+                                         smoothing=1, clock=lambda: now)
+
+    # busy: linger just long enough to fill a batch
+    now = 1.0
+    controller.record_arrivals(1000)
+    controller.record_send(size=10, latency=0.01)
+    assert controller.arrival_rate == 1000
+    assert controller.linger == pytest.approx(0.009)
+
+    # quiet: events are sent right away
+    now = 11.0
+    controller.record_arrivals(5)
+    controller.record_send(size=1, latency=0.01)
+    assert controller.linger == 0
+
+    # the linger time is capped by the latency budget left
+    now = 12.0
+    controller.record_arrivals(100)
+    controller.record_send(size=10, latency=0.08)
+    assert controller.linger == pytest.approx(0.02)
+
+
+def test_adaptive_batch_controller_invalid_config():
+    with pytest.raises(ConfigurationError):
+        AdaptiveBatchController(max_batch_size=10, min_batch_size=20)
+
+    with pytest.raises(ConfigurationError):
+        AdaptiveBatchController(max_batch_size=10, min_linger=1, max_linger=0.5)
+
+
+@pytest.mark.asyncio
+async def test_adaptive_batcher():
+    batches = []
+
+    async def send(batch):
+        if batch[0][1]["id"] < 0:
+            raise ConnectionError()
+        batches.append(batch)
+
+    controller = AdaptiveBatchController(max_batch_size=4, min_linger=0.05, max_linger=0.05)
+    batcher = AdaptiveBatcher(send=send, controller=controller)
+
+    # concurrent submissions share batches of up to batch_size events
+    await asyncio.gather(*[batcher.submit([("event", {"id": idx})]) for idx in range(6)])
+    assert [len(batch) for batch in batches] == [4, 2]
+    assert controller.events_sent == 6
+
+    # failures are raised to the submitters
+    with pytest.raises(ConnectionError):
+        await batcher.submit([("event", {"id": -1})])
+    assert controller.batches_failed == 1
+
+
+@pytest.mark.asyncio
+async def test_adaptive_batcher_close():
+    sent = []
+
+    async def send(batch):
+        sent.extend(batch)
+
+    batcher = AdaptiveBatcher(send=send, controller=AdaptiveBatchController(max_batch_size=10, min_linger=10,
+                                                                            max_linger=10))
+    task = asyncio.create_task(batcher.submit([("event", {"id": 1})]))
+    await asyncio.sleep(0.01)
+    assert batcher.pending == 1
+
+    await batcher.close()
+    await task
+    assert sent == [("event", {"id": 1})]
+
+
+@pytest.mark.asyncio
+async def test_adaptive_batcher_close_completes_batch_in_flight():
+    sending = asyncio.Event()
+    sent = []
+
+    async def send(batch):
+        sending.set()
+        await asyncio.sleep(0.05)
+        sent.extend(batch)
+
+    batcher = AdaptiveBatcher(send=send, controller=AdaptiveBatchController(max_batch_size=10))
+    task = asyncio.create_task(batcher.submit([("event", {"id": 1})]))
+    await sending.wait()
+
+    await batcher.close()
+    await task
+    assert sent == [("event", {"id": 1})]
@@ -0,0 +1,30 @@
+from fastapi_events.circuit import CircuitBreaker, CircuitState
+
+
+def test_circuit_breaker_states():
+    now = 0.0
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10, clock=lambda: now)
+
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state is CircuitState.CLOSED
+    breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN
+    assert not breaker.allow()
+
+    # a single trial call is let through once the recovery timeout has elapsed
+    now = 10.0
+    assert breaker.state is CircuitState.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # a failed trial call opens the circuit again
+    breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN
+
+    now = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.opened_count == 2
+    assert breaker.rejected_count == 2
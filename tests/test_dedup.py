@@ -0,0 +1,47 @@
+import pytest
+
+from fastapi_events.dedup import BloomDeduplicator, WindowDeduplicator
+from fastapi_events.errors import ConfigurationError
+
+
+def key(event_name, payload):
+    return event_name, payload["id"]
+
+
+def test_window_deduplicator_evicts_least_recently_seen_keys():
+    deduplicator = WindowDeduplicator(key=key, max_size=2)
+
+    assert [deduplicator.is_duplicate("event", {"id": idx}) for idx in (1, 2, 1, 3, 1, 2)] == \
+        [False, False, True, False, True, False]
+    assert deduplicator.duplicate_count == 2
+    assert len(deduplicator) == 2
+
+
+def test_window_deduplicator_ttl():
+    now = 0.0
+    deduplicator = WindowDeduplicator(key=key, ttl=10, clock=lambda: now)
+
+    assert not deduplicator.is_duplicate("event", {"id": 1})
+    now = 5.0
+    assert deduplicator.is_duplicate("event", {"id": 1})
+    now = 16.0
+    assert not deduplicator.is_duplicate("event", {"id": 1})
+
+
+def test_bloom_deduplicator():
+    deduplicator = BloomDeduplicator(key=key, capacity=1000, error_rate=0.01)
+
+    # unique keys are wrongly flagged with a probability of about error_rate
+    assert sum(deduplicator.is_duplicate("event", {"id": idx}) for idx in range(1000)) < 30
+    assert all(deduplicator.is_duplicate("event", {"id": idx}) for idx in range(1000))
+
+    # keys are forgotten after two generations
+    for idx in range(1000, 3001):
+        deduplicator.is_duplicate("event", {"id": idx})
+    false_positives = sum(deduplicator.is_duplicate("event", {"id": idx}) for idx in range(100))
+    assert false_positives < 10
+
+
+def test_bloom_deduplicator_invalid_config():
+    with pytest.raises(ConfigurationError):
+        BloomDeduplicator(key=key, error_rate=1)
@@ -9,11 +9,15 @@ from typing import Optional
 import pydantic
 import pytest
 
+import fastapi_events
 import fastapi_events.dispatcher as dispatcher_module
 from fastapi_events import BaseEventHandler, handler_store
 from fastapi_events.constants import FASTAPI_EVENTS_DISABLE_DISPATCH_ENV_VAR
-from fastapi_events.dispatcher import dispatch
-from fastapi_events.errors import MultiplePayloadsDetectedDuringDispatch
+from fastapi_events.context import EventContext
+from fastapi_events.dedup import WindowDeduplicator
+from fastapi_events.dispatcher import dispatch, dispatch_many
+from fastapi_events.errors import (MissingEventNameDuringDispatch,
+                                   MultiplePayloadsDetectedDuringDispatch)
 from fastapi_events.registry.payload_schema import EventPayloadSchemaRegistry
 from fastapi_events.typing import Event
 
@@ -31,9 +35,8 @@ def setup_mocks_for_events_in_req_res_cycle(mocker):
         if disable_dispatch:
             mocker.patch.dict(os.environ, {FASTAPI_EVENTS_DISABLE_DISPATCH_ENV_VAR: "1"})
 
-        mocker.patch("fastapi_events.dispatcher.in_req_res_cycle").get.return_value = in_req_res_cycle
-
-        spy_event_store_ctx_var = mocker.spy(dispatcher_module, "event_store")
+        event_ctx = EventContext(middleware_id=0, in_req_res_cycle=in_req_res_cycle)
+        mocker.patch("fastapi_events.dispatcher.event_context").get.return_value = event_ctx
 
         return locals()
 
@@ -58,7 +61,7 @@ async def test_suppression_of_events_in_req_res_cycle(
 
     dispatch("TEST_EVENT")
 
-    assert mocks["spy_event_store_ctx_var"].get.called != suppress_events
+    assert mocks["event_ctx"].has_events() != suppress_events
 
 
 @pytest.mark.asyncio
@@ -101,7 +104,7 @@ async def test_payload_validation_with_pydantic_in_req_res_cycle(
 
     else:
         dispatch_fn()
-        assert mocks["spy_event_store_ctx_var"].get.called
+        assert mocks["event_ctx"].has_events()
 
 
 @pytest.mark.asyncio
@@ -127,10 +130,11 @@ async def test_dispatching_with_pydantic_model(
     expected_payload = {"username": "USER_ABC"} if payload_schema_dump else event
     dispatch(event, payload_schema_dump=payload_schema_dump)
 
-    assert mocks["spy_event_store_ctx_var"].get.called
+    assert mocks["event_ctx"].has_events()
     spy__dispatch.assert_called_with(
         event_name="USER_SIGNED_UP",
-        payload=expected_payload
+        payload=expected_payload,
+        priority=None
     )
 
 
@@ -145,7 +149,7 @@ async def test_dispatching_without_payload_schema_in_req_res_cycle(
 
     dispatch("TEST_EVENT", {"id": uuid.uuid4()})
 
-    assert mocks["spy_event_store_ctx_var"].get.called
+    assert mocks["event_ctx"].has_events()
 
 
 @pytest.fixture
@@ -159,18 +163,15 @@ def setup_mocks_for_events_outside_req_res_cycle(mocker):
         if disable_dispatch:
             mocker.patch.dict(os.environ, {FASTAPI_EVENTS_DISABLE_DISPATCH_ENV_VAR: "1"})
 
-        mocker.patch("fastapi_events.dispatcher.in_req_res_cycle").get.return_value = in_req_res_cycle
+        event_ctx = EventContext(middleware_id=middleware_id, in_req_res_cycle=in_req_res_cycle)
+        mocker.patch("fastapi_events.dispatcher.event_context").get.return_value = event_ctx
 
-        spy_event_store_ctx_var = mocker.spy(dispatcher_module, "event_store")
         spy__list_handlers = mocker.spy(dispatcher_module, "_list_handlers")
         spy__dispatch_as_task = mocker.spy(dispatcher_module, "_dispatch_as_task")
 
         if mock__dispatch_as_task:
             mock__dispatch_as_task = mocker.patch("fastapi_events.dispatcher._dispatch_as_task")
 
-        if middleware_id:
-            mocker.patch("fastapi_events.dispatcher.middleware_identifier").get.return_value = middleware_id
-
         return locals()
 
     return setup
@@ -195,7 +196,7 @@ async def test_suppression_of_events_outside_req_res_cycle(
     dispatch("TEST_EVENT")
 
     assert mocks["mock__dispatch_as_task"].called != suppress_events
-    assert not mocks["spy_event_store_ctx_var"].get.called
+    assert not mocks["event_ctx"].has_events()
 
 
 @pytest.mark.asyncio
@@ -274,3 +275,177 @@ async def test_dispatch_calls(
     with pytest.raises(MultiplePayloadsDetectedDuringDispatch):
         dispatch(SchemaA(username="USER_ABC"),
                  payload={"username": "USER_ABC"})
+
+
+@pytest.mark.asyncio
+async def test_dispatching_with_deduplicator(setup_mocks_for_events_in_req_res_cycle, mocker):
+    """
+    Test if duplicates are dropped before their payload is validated
+    """
+    mocks = setup_mocks_for_events_in_req_res_cycle(disable_dispatch=False)
+    spy = mocker.spy(dispatcher_module, "_validate_payload")
+    deduplicator = WindowDeduplicator(key=lambda event_name, payload: (event_name, payload["id"]))
+
+    for idx in (1, 2, 1, 1, 3):
+        dispatch("TEST_EVENT", {"id": idx}, deduplicator=deduplicator)
+
+    assert list(mocks["event_ctx"].events) == [("TEST_EVENT", {"id": idx}) for idx in (1, 2, 3)]
+    assert deduplicator.duplicate_count == 2
+    assert spy.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_dispatch_many(setup_mocks_for_events_in_req_res_cycle, mocker):
+    """
+    Test if dispatch_many() has the same effect as calling dispatch() once per event,
+    with payloads of the same event name validated in one pass
+    """
+    payload_schema = EventPayloadSchemaRegistry()
+    mocks = setup_mocks_for_events_in_req_res_cycle(disable_dispatch=False)
+    spy = mocker.spy(dispatcher_module, "_validate_payloads")
+
+    @payload_schema.register(event_name="USER_SIGNED_UP")
+    class _SignUpEventSchema(pydantic.BaseModel):
+        user_id: int
+        username: Optional[str] = None
+
+    class UserActivated(pydantic.BaseModel):
+        __event_name__ = "USER_ACTIVATED"
+
+        user_id: int
+
+    def make_events():
+        return [("USER_SIGNED_UP", {"user_id": "1"}),
+                ("UNKNOWN_EVENT", {"id": 1}),
+                UserActivated(user_id=1),
+                ("USER_SIGNED_UP", {"user_id": 2, "username": "ABC"}),
+                ("USER_SIGNED_UP", {"user_id": "1"})]
+
+    deduplicator = WindowDeduplicator(key=lambda event_name, payload: event_name)
+    for event_name_or_model, *payload in (event if isinstance(event, tuple) else (event,) for event in make_events()):
+        dispatch(event_name_or_model, *payload, payload_schema_registry=payload_schema, deduplicator=deduplicator)
+    expected_events = list(mocks["event_ctx"].events)
+    mocks["event_ctx"].events.clear()
+
+    dispatch_many(make_events(), payload_schema_registry=payload_schema,
+                  deduplicator=WindowDeduplicator(key=lambda event_name, payload: event_name))
+
+    assert list(mocks["event_ctx"].events) == expected_events == [
+        ("USER_SIGNED_UP", {"user_id": 1}),
+        ("UNKNOWN_EVENT", {"id": 1}),
+        ("USER_ACTIVATED", {"user_id": 1}),
+    ]
+
+    mocks["event_ctx"].events.clear()
+    spy.reset_mock()
+    dispatch_many(make_events(), payload_schema_registry=payload_schema)
+
+    assert len(mocks["event_ctx"].events) == 5
+    assert spy.call_count == 2  # once per event name validated
+
+    # payloads are all validated before any event is dispatched
+    mocks["event_ctx"].events.clear()
+    with pytest.raises(pydantic.ValidationError):
+        dispatch_many([("USER_SIGNED_UP", {"user_id": 1}), ("USER_SIGNED_UP", {})],
+                      payload_schema_registry=payload_schema)
+    assert not mocks["event_ctx"].has_events()
+
+
+@pytest.mark.asyncio
+async def test_dispatch_many_outside_req_res_cycle(setup_mocks_for_events_outside_req_res_cycle, mocker):
+    class FakeEventHandler(BaseEventHandler):
+        def __init__(self):
+            self.event_processed = []
+
+        async def handle(self, event: Event) -> None:
+            self.event_processed.append(event)
+
+    middleware_id, handler = uuid.uuid4().int, FakeEventHandler()
+    handler_store[middleware_id] = [handler]
+    setup_mocks_for_events_outside_req_res_cycle(disable_dispatch=False, middleware_id=middleware_id)
+    spy = mocker.spy(dispatcher_module, "_dispatch_many_as_task")
+
+    dispatch_many([("TEST_EVENT", {"id": idx}) for idx in range(3)])
+    await asyncio.sleep(0.1)
+
+    assert spy.call_count == 1
+    assert handler.event_processed == [("TEST_EVENT", {"id": idx}) for idx in range(3)]
+
+
+@pytest.mark.asyncio
+async def test_dispatch_many_otel_support(otel_test_manager, setup_mocks_for_events_in_req_res_cycle):
+    """
+    Test if a single OTEL span is created for all events
+    """
+    setup_mocks_for_events_in_req_res_cycle(disable_dispatch=True)
+
+    dispatch_many([("TEST_EVENT", {"id": 1}), ("TEST_EVENT", {"id": 2})])
+
+    spans_created = otel_test_manager.get_finished_spans()
+    assert [span.name for span in spans_created] == ["2 events dispatched"]
+
+
+def test_dispatch_many_without_event_name(setup_mocks_for_events_in_req_res_cycle):
+    """
+    Test if no event is dispatched when the name of one of them cannot be determined
+    """
+    mocks = setup_mocks_for_events_in_req_res_cycle(disable_dispatch=False)
+
+    class _NamelessEvent(pydantic.BaseModel):
+        user_id: int
+
+    with pytest.raises(MissingEventNameDuringDispatch):
+        dispatch_many([("TEST_EVENT", {"id": 1}), _NamelessEvent(user_id=1)])
+
+    assert len(mocks["event_ctx"].events) == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatching_with_deduplicator_after_failed_validation(setup_mocks_for_events_in_req_res_cycle):
+    """
+    Test if an event failing validation is not remembered by the deduplicator, so that it can be dispatched again
+    """
+    payload_schema = EventPayloadSchemaRegistry()
+    mocks = setup_mocks_for_events_in_req_res_cycle(disable_dispatch=False)
+    deduplicator = WindowDeduplicator(key=lambda event_name, payload: (event_name, payload["id"]))
+
+    @payload_schema.register(event_name="TEST_EVENT")
+    class _TestEventSchema(pydantic.BaseModel):
+        id: int
+        name: str
+
+    for dispatch_fn in (
+        functools.partial(dispatch, "TEST_EVENT", {"id": 1}),
+        functools.partial(dispatch_many, [("TEST_EVENT", {"id": 2, "name": "A"}), ("TEST_EVENT", {"id": 3})]),
+    ):
+        with pytest.raises(pydantic.ValidationError):
+            dispatch_fn(payload_schema_registry=payload_schema, deduplicator=deduplicator)
+
+    dispatch("TEST_EVENT", {"id": 1, "name": "A"}, payload_schema_registry=payload_schema, deduplicator=deduplicator)
+    dispatch_many([("TEST_EVENT", {"id": 2, "name": "A"}), ("TEST_EVENT", {"id": 3, "name": "B"})],
+                  payload_schema_registry=payload_schema, deduplicator=deduplicator)
+
+    assert [payload["id"] for _, payload in mocks["event_ctx"].events] == [1, 2, 3]
+    assert deduplicator.duplicate_count == 0
+
+
+def test_deprecated_context_vars():
+    """
+    Test if the ContextVars replaced by `event_context` remain importable, and read from the event context
+    """
+    with pytest.warns(DeprecationWarning):
+        from fastapi_events import (event_store, in_req_res_cycle,
+                                    middleware_identifier)
+
+    assert in_req_res_cycle.get() is None
+    with pytest.raises(LookupError):
+        middleware_identifier.get()
+
+    token = fastapi_events.event_context.set(EventContext(middleware_id=1))
+    try:
+        dispatch("TEST_EVENT")
+        assert list(event_store.get()) == [("TEST_EVENT", None)]
+        assert in_req_res_cycle.get() is True
+        assert middleware_identifier.get() == 1
+    finally:
+        fastapi_events.event_context.reset(token)
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.fairness import FairScheduler
+
+
+def tenant_key(event):
+    return event[1]["tenant"]
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_deficit_round_robin():
+    """
+    Test if a noisy tenant cannot starve the others
+    """
+    batches = []
+
+    async def process(events):
+        batches.append([event[1]["tenant"] for event in events])
+
+    scheduler = FairScheduler(tenant_key=tenant_key, quantum=2, weights={"premium": 2}, batch_size=10)
+    scheduler.bind(process=process)
+
+    await asyncio.gather(
+        scheduler.submit([("event", {"tenant": "noisy"}) for _ in range(50)]),
+        scheduler.submit([("event", {"tenant": "quiet"}) for _ in range(3)]),
+        scheduler.submit([("event", {"tenant": "premium"}) for _ in range(8)]),
+    )
+
+    assert batches[0] == ["noisy"] * 2 + ["quiet"] * 2 + ["premium"] * 4 + ["noisy"] * 2
+    assert batches[1][:3] == ["quiet"] + ["premium"] * 2
+    assert scheduler.stats["noisy"].processed == 50
+    assert scheduler.stats["quiet"].processed == 3
+    assert scheduler.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_tenant_queue_limit():
+    processed = []
+
+    async def process(events):
+        processed.extend(events)
+
+    scheduler = FairScheduler(tenant_key=tenant_key, max_queued_per_tenant=10)
+    scheduler.bind(process=process)
+
+    await asyncio.gather(
+        scheduler.submit([("event", {"tenant": "noisy"}) for _ in range(15)]),
+        scheduler.submit([("event", {"tenant": "quiet"}) for _ in range(5)]),
+    )
+
+    assert len(processed) == 15
+    assert scheduler.stats["noisy"].shed == 5
+    assert scheduler.stats["noisy"].max_queued == 10
+    assert scheduler.stats["quiet"].shed == 0
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_failure():
+    async def process(events):
+        raise ConnectionError
+
+    scheduler = FairScheduler(tenant_key=tenant_key)
+    scheduler.bind(process=process)
+
+    with pytest.raises(ConnectionError):
+        await scheduler.submit([("event", {"tenant": "a"})])
+    assert scheduler.stats["a"].failed == 1
+
+
+def test_fair_scheduler_invalid_config():
+    with pytest.raises(ConfigurationError):
+        FairScheduler(tenant_key=tenant_key, weights={"a": 0})
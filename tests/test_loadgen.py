@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.loadgen import MODES, main, read_events, run
+from fastapi_events.typing import Event
+
+
+class CountingHandler(BaseEventHandler):
+    instances: list = []
+
+    def __init__(self):
+        self.events_handled = []
+        CountingHandler.instances.append(self)
+
+    async def handle(self, event: Event) -> None:
+        self.events_handled.append(event)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "mode,events_per_request",
+    (("request", 1),
+     ("request", 10),
+     ("task", 1))
+)
+async def test_run(mode, events_per_request):
+    """
+    Test if all events are pushed through dispatch() into the handlers
+    """
+    handler_1, handler_2 = CountingHandler(), CountingHandler()
+    events = [("loadgen_event", {"id": idx}) for idx in range(50)]
+
+    report = await run(events=events,
+                       handlers=[handler_1, handler_2],
+                       mode=mode,
+                       events_per_request=events_per_request,
+                       trace_memory=True)
+
+    assert report.events == 50
+    assert report.errors == 0
+    assert len(handler_1.events_handled) == len(handler_2.events_handled) == 50
+    assert set(report.latency) == {"p50", "p90", "p99", "max"}
+    assert report.peak_traced_memory > 0
+
+
+class FailingHandler(BaseEventHandler):
+    async def handle(self, event: Event) -> None:
+        raise ConnectionError
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", MODES)
+async def test_run_with_failing_handler(mode):
+    """
+    Test if handler failures are reported as errors in both modes
+    """
+    events = [("loadgen_event", {"id": idx}) for idx in range(20)]
+
+    report = await run(events=events, handlers=[FailingHandler(), CountingHandler()], mode=mode)
+
+    assert report.events == 20
+    assert report.errors == 20
+
+
+@pytest.mark.asyncio
+async def test_run_at_target_rate():
+    """
+    Test if events are paced to the target rate
+    """
+    handler = CountingHandler()
+    events = [("loadgen_event", {"id": idx}) for idx in range(20)]
+
+    report = await run(events=events, handlers=[handler], rate=200)
+
+    assert report.duration >= 19 / 200
+    assert report.throughput <= 200 * 1.1
+
+
+def test_replay_from_jsonl(tmp_path, capsys):
+    """
+    Test if events are replayed from a JSONL file through the CLI
+    """
+    replay_file = tmp_path / "events.jsonl"
+    replay_file.write_text("\n".join((
+        json.dumps(["user_created", {"id": 1}]),
+        json.dumps({"event_name": "user_updated", "payload": {"id": 1}}),
+        "",
+        json.dumps(["user_deleted", None]),
+    )))
+    replayed_events = list(read_events(str(replay_file)))
+    assert [event_name for event_name, _ in replayed_events] == ["user_created", "user_updated", "user_deleted"]
+
+    CountingHandler.instances.clear()
+    exit_code = main(["--replay", str(replay_file),
+                      "--handler", "tests.test_loadgen:CountingHandler",
+                      "--mode", "task",
+                      "--json"])
+
+    report = json.loads(capsys.readouterr().out)
+    assert exit_code == 0
+    assert report["events"] == 3
+    assert [event for event, _ in CountingHandler.instances[0].events_handled] == ["user_created",
+                                                                                   "user_updated",
+                                                                                   "user_deleted"]
@@ -0,0 +1,45 @@
+import pytest
+from pydantic import BaseModel
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.predicates import PredicateIndex, compile_where
+
+
+class Payment(BaseModel):
+    type: str
+    currency: str
+
+
+def test_predicate_index():
+    index = PredicateIndex()
+    index.add("refund", compile_where({"type": "refund", "currency": ["EUR", "USD"]}))
+    index.add("all")
+    index.add("charge_or_refund", compile_where({"type": {"charge", "refund"}}))
+    index.add("euro", compile_where({"currency": "EUR"}))
+
+    # matches are returned in the order targets were added
+    assert index.match({"type": "refund", "currency": "EUR"}) == ["refund", "all", "charge_or_refund", "euro"]
+    assert index.match({"type": "refund", "currency": "JPY"}) == ["all", "charge_or_refund"]
+    assert index.match({"type": "charge"}) == ["all", "charge_or_refund"]
+    assert index.match({"currency": ["EUR"]}) == ["all"]
+    assert index.match(None) == ["all"]
+
+    # fields of objects, e.g. pydantic models, are matched too
+    assert index.match(Payment(type="refund", currency="USD")) == ["refund", "all", "charge_or_refund"]
+
+
+def test_compile_where():
+    assert compile_where(None) is None
+    assert compile_where({"type": "refund", "currency": ("EUR", "USD")}) == {
+        "type": frozenset({"refund"}),
+        "currency": frozenset({"EUR", "USD"}),
+    }
+
+    with pytest.raises(ConfigurationError):
+        compile_where({"tags": [["unhashable"]]})
+
+    with pytest.raises(ConfigurationError):
+        compile_where({"type": []})
+
+    with pytest.raises(ConfigurationError):
+        compile_where([("type", "refund")])
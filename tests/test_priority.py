@@ -0,0 +1,63 @@
+import pickle
+
+from fastapi_events.coalescing import Coalescer, CoalescingPolicy
+from fastapi_events.priority import PrioritizedEvent, Priority, PriorityLanes
+
+
+def test_prioritized_event():
+    event = PrioritizedEvent("billing_charged", {"id": 1}, priority=Priority.CRITICAL)
+    event_name, payload = event
+
+    assert event == ("billing_charged", {"id": 1})
+    assert pickle.loads(pickle.dumps(event)).priority is Priority.CRITICAL
+
+
+def test_priority_lanes_weighted_scheduling():
+    """
+    Test if batches are shared between priorities by weight, without starving lower priorities
+    """
+    lanes = PriorityLanes(priorities={"billing_*": Priority.CRITICAL, "analytics_*": Priority.LOW},
+                          weights={Priority.CRITICAL: 3, Priority.LOW: 1})
+    for idx in range(100):
+        lanes.put(("analytics_viewed", {"id": idx}))
+    for idx in range(100):
+        lanes.put(("billing_charged", {"id": idx}))
+    lanes.put(PrioritizedEvent("analytics_viewed", {"id": "urgent"}, priority=Priority.CRITICAL))
+
+    batch = lanes.get_batch(20)
+    event_names = [event_name for event_name, _ in batch]
+
+    assert event_names.count("billing_charged") == 15
+    assert event_names.count("analytics_viewed") == 5
+    # events of a lane are kept in order
+    assert batch[:2] == [("billing_charged", {"id": 0}), ("billing_charged", {"id": 1})]
+
+    # the priority passed to dispatch() takes precedence
+    assert lanes.pending(Priority.CRITICAL) == 86
+
+
+def test_priority_lanes_shedding():
+    lanes = PriorityLanes(priorities={"billing_*": Priority.CRITICAL, "analytics_*": Priority.LOW}, max_size=3)
+    lanes.put(("billing_charged", {"id": 1}))
+    lanes.put(("analytics_viewed", {"id": 1}))
+    lanes.put(("user_logged_in", {"id": 1}))
+
+    assert lanes.put(("billing_charged", {"id": 2})) == ("analytics_viewed", {"id": 1})
+    assert lanes.put(("billing_charged", {"id": 3})) == ("user_logged_in", {"id": 1})
+    assert lanes.shed_counts[Priority.LOW] == lanes.shed_counts[Priority.NORMAL] == 1
+    assert len(lanes) == 3
+
+
+def test_coalesced_events_keep_their_priority():
+    coalescer = Coalescer({"order_updated": CoalescingPolicy(key=lambda payload: payload["id"],
+                                                             merge=lambda old, new: {**old, **new}),
+                           "cart_updated": CoalescingPolicy(key=lambda payload: payload["id"])})
+
+    events = coalescer.coalesce([PrioritizedEvent("order_updated", {"id": 1, "a": 1}, priority=Priority.CRITICAL),
+                                 ("cart_updated", {"id": 1}),
+                                 PrioritizedEvent("order_updated", {"id": 1, "b": 2}, priority=Priority.NORMAL),
+                                 ("cart_updated", {"id": 1})])
+
+    assert list(events) == [("order_updated", {"id": 1, "a": 1, "b": 2}), ("cart_updated", {"id": 1})]
+    assert events[0].priority is Priority.CRITICAL
+    assert not isinstance(events[1], PrioritizedEvent)
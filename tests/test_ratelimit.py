@@ -0,0 +1,27 @@
+import pytest
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.ratelimit import TokenBucket
+
+
+def test_token_bucket():
+    now = 0.0
+    bucket = TokenBucket(rate=10, capacity=5, clock=lambda: now)
+
+    assert bucket.try_acquire(5)
+    assert not bucket.try_acquire(1)
+
+    now = 0.2
+    assert bucket.tokens == pytest.approx(2)
+
+    # reservations go into debt, and wait behind each other
+    assert bucket.reserve(4) == pytest.approx(0.2)
+    assert bucket.reserve(1) == pytest.approx(0.3)
+
+    now = 10.0
+    assert bucket.tokens == 5
+
+
+def test_token_bucket_invalid_config():
+    with pytest.raises(ConfigurationError):
+        TokenBucket(rate=0)
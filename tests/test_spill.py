@@ -0,0 +1,40 @@
+import os
+
+from fastapi_events.spill import SpilloverQueue
+
+
+def test_spillover_queue_preserves_order(tmp_path):
+    """
+    Test if events past the memory limit are spilled to disk, and read back in order
+    """
+    queue = SpilloverQueue(memory_limit=10, directory=str(tmp_path), segment_size=256)
+    queue.extend(("event", {"id": idx}) for idx in range(100))
+
+    assert len(queue) == 100
+    assert queue.disk_count == 90
+    assert queue.spilled_count == 90
+    # segments are rotated once they reach segment_size
+    assert len(os.listdir(next(tmp_path.iterdir()))) > 1
+
+    events = queue.get_batch(25)
+    # events put while spilled events are pending are spilled too
+    queue.extend(("event", {"id": idx}) for idx in range(100, 110))
+    while len(queue):
+        events.extend(queue.get_batch(7))
+
+    assert events == [("event", {"id": idx}) for idx in range(110)]
+    # segments are removed once read
+    assert os.listdir(next(tmp_path.iterdir())) == []
+
+    # events are held in memory again once the disk is drained
+    queue.put(("event", {"id": 110}))
+    assert queue.disk_count == 0
+
+
+def test_spillover_queue_close(tmp_path):
+    queue = SpilloverQueue(memory_limit=1, directory=str(tmp_path))
+    queue.extend(("event", {"id": idx}) for idx in range(5))
+    queue.close()
+
+    assert len(queue) == 0
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,240 @@
+import logging
+import os
+import random
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from enum import Enum
+
+import pytest
+
+from fastapi_events.errors import ConfigurationError
+from fastapi_events.priority import PrioritizedEvent, Priority
+from fastapi_events.timers import DelayedDispatcher, TimerWheel
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_timers_expire_once_due():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=1, clock=clock)
+    for deadline in (3, 1, 2.5, 10):
+        wheel.schedule(deadline, item=deadline)
+
+    assert len(wheel) == 4
+    assert wheel.advance(now=0.9) == []
+    assert wheel.advance(now=3) == [1, 2.5, 3]
+    assert wheel.advance(now=9.99) == []
+    assert wheel.advance(now=10) == [10]
+    assert len(wheel) == 0
+    assert wheel.next_tick_at() is None
+
+
+def test_timers_cascade_across_levels():
+    """
+    Making sure timers placed in higher levels, or beyond the span of the wheel, expire on time
+    """
+    clock = FakeClock()
+    wheel = TimerWheel(tick=1, slots=4, levels=3, clock=clock)  # spans 64 ticks
+    deadlines = [2, 5, 17, 40, 63, 64, 100, 300]
+    for deadline in reversed(deadlines):
+        wheel.schedule(deadline, item=deadline)
+
+    expired = []
+    for now in range(0, 301):
+        for item in wheel.advance(now=now):
+            assert item == now
+            expired.append(item)
+
+    assert expired == deadlines
+    assert len(wheel) == 0
+
+
+@pytest.mark.parametrize("slots,levels", ((2, 2), (4, 2), (8, 3)))
+def test_timers_beyond_span_of_wheel_do_not_expire_early(slots, levels):
+    clock = FakeClock()
+    wheel = TimerWheel(tick=1, slots=slots, levels=levels, clock=clock)
+    span = slots ** levels
+    rng = random.Random(42)
+    deadlines = [rng.randint(1, span * 5) for _ in range(2000)]
+    for deadline in deadlines:
+        wheel.schedule(deadline, item=deadline)
+
+    expired = []
+    for now in range(span * 5 + 1):
+        for item in wheel.advance(now=now):
+            assert item == now
+            expired.append(item)
+
+    assert expired == sorted(deadlines)
+
+
+def test_cancelled_timers_do_not_expire():
+    wheel = TimerWheel(tick=1, clock=FakeClock())
+    timers = [wheel.schedule(deadline, item=deadline) for deadline in range(1, 1001)]
+
+    assert all(timer.cancel() for timer in timers[::2])
+    assert not timers[0].cancel()
+    assert not timers[0].pending and timers[1].pending
+    assert len(wheel) == 500
+
+    assert wheel.advance(now=1000) == list(range(2, 1001, 2))
+    assert not timers[1].cancel()
+
+
+def test_timers_past_due_expire_on_next_tick():
+    clock = FakeClock(now=100)
+    wheel = TimerWheel(tick=1, clock=clock)
+    wheel.schedule(50, item="late")
+
+    assert wheel.next_tick_at() == 101
+    assert wheel.advance(now=101) == ["late"]
+
+
+def test_pop_all_timers():
+    wheel = TimerWheel(tick=1, slots=4, levels=2, clock=FakeClock())
+    timers = [wheel.schedule(deadline, item=deadline) for deadline in (100, 3, 10)]
+
+    assert [timer.item for timer in wheel.pop_all()] == [3, 10, 100]
+    assert len(wheel) == 0
+    assert not any(timer.pending for timer in timers)
+
+
+def test_timer_wheel_with_invalid_config():
+    with pytest.raises(ConfigurationError):
+        TimerWheel(tick=0)
+
+    with pytest.raises(ConfigurationError):
+        TimerWheel(slots=1)
+
+    with pytest.raises(ConfigurationError):
+        TimerWheel(levels=1)
+
+
+@pytest.mark.asyncio
+async def test_delayed_dispatcher_processes_due_events_in_batches():
+    batches = []
+
+    async def process(events: deque) -> None:
+        batches.append(list(events))
+
+    dispatcher = DelayedDispatcher(process=process, tick=0.01)
+    dispatcher.schedule(("a", 1), due_at=0)  # already due
+    dispatcher.schedule(("b", 2), due_at=0)
+    timer = dispatcher.schedule(("c", 3), due_at=0)
+    timer.cancel()
+
+    await dispatcher.shutdown()
+
+    assert batches == [[("a", 1), ("b", 2)]]
+
+
+class Events(Enum):
+    REMINDER_DUE = "reminder_due"
+
+
+@pytest.mark.asyncio
+async def test_delayed_dispatcher_saves_pending_events(tmp_path, caplog):
+    """
+    Test if pending events are saved on shutdown, and restored as dispatched on the next startup
+    """
+    caplog.set_level(logging.INFO)
+    path = str(tmp_path / "delayed_events")
+    processed = []
+
+    async def process(events: deque) -> None:
+        processed.extend(events)
+
+    payload = {"user_id": uuid.uuid4(), "remind_at": datetime(2100, 1, 1, tzinfo=timezone.utc)}
+    dispatcher = DelayedDispatcher(process=process, path=path)
+    dispatcher.schedule((Events.REMINDER_DUE, payload), due_at=4102444800)
+    dispatcher.schedule(PrioritizedEvent("order_expired", {"order_id": 2}, priority=Priority.HIGH), due_at=4102444900)
+    await dispatcher.shutdown()
+
+    assert processed == []
+    assert len(os.listdir(tmp_path)) == 1
+
+    restored = DelayedDispatcher(process=process, path=path)
+    await restored.startup()
+    timers = restored._wheel.pop_all()
+
+    assert [(timer.deadline, timer.item) for timer in timers] == [
+        (4102444800, (Events.REMINDER_DUE, payload)),
+        (4102444900, ("order_expired", {"order_id": 2})),
+    ]
+    assert timers[0].item[0] is Events.REMINDER_DUE
+    assert timers[1].item.priority == Priority.HIGH
+    assert os.listdir(tmp_path) == []
+    assert "2 delayed event(s) restored" in caplog.text
+
+    await restored.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_delayed_dispatcher_path_shared_by_processes(tmp_path):
+    """
+    Test if processes sharing a path keep each other's events, and if each saved event is restored once
+    """
+    path = str(tmp_path / "delayed_events")
+
+    async def process(events: deque) -> None:
+        pass
+
+    for idx in range(2):
+        dispatcher = DelayedDispatcher(process=process, path=path)
+        dispatcher.schedule(("reminder_due", {"id": idx}), due_at=4102444800 + idx)
+        await dispatcher.shutdown()
+
+    assert len(os.listdir(tmp_path)) == 2
+
+    first, second = DelayedDispatcher(process=process, path=path), DelayedDispatcher(process=process, path=path)
+    await first.startup()
+    await second.startup()
+
+    assert [timer.item for timer in first._wheel.pop_all()] == [("reminder_due", {"id": 0}),
+                                                                ("reminder_due", {"id": 1})]
+    assert second.pending == 0
+    assert os.listdir(tmp_path) == []
+
+    await first.shutdown()
+    await second.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_delayed_dispatcher_discards_events_which_cannot_be_serialized(tmp_path, caplog):
+    path = str(tmp_path / "delayed_events")
+
+    async def process(events: deque) -> None:
+        pass
+
+    dispatcher = DelayedDispatcher(process=process, path=path)
+    dispatcher.schedule(("reminder_due", {"callback": lambda: None}), due_at=4102444800)
+    dispatcher.schedule(("reminder_due", {"id": 1}), due_at=4102444800)
+    await dispatcher.shutdown()
+
+    assert "Discarding delayed event reminder_due, which cannot be serialized" in caplog.text
+
+    restored = DelayedDispatcher(process=process, path=path)
+    await restored.startup()
+
+    assert [timer.item for timer in restored._wheel.pop_all()] == [("reminder_due", {"id": 1})]
+    await restored.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_delayed_dispatcher_discards_pending_events_without_path(caplog):
+    async def process(events: deque) -> None:
+        pass
+
+    dispatcher = DelayedDispatcher(process=process)
+    dispatcher.schedule(("reminder_due", None), due_at=4102444800)
+    await dispatcher.shutdown()
+
+    assert dispatcher.pending == 0
+    assert "Discarding 1 delayed event(s)" in caplog.text